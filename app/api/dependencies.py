@@ -4,18 +4,93 @@ Central place for all Depends() callables.
 """
 
 from functools import lru_cache
+from typing import Optional
 
+from app.core.config import get_settings
 from app.services.ai_service import RoutineGenerator
+from app.services.chat_context import ChatContextAssembler
 from app.services.image_analysis_service import ImageAnalyzer
+from app.services.image_cache import ImageAnalysisCache
+from app.services.job_queue import RoutineJobQueue
+from app.services.routine_cache import RoutineCache
+from app.services.semantic_cache import SemanticModificationCache
+
+
+@lru_cache
+def get_routine_cache() -> Optional[RoutineCache]:
+    """Singleton routine generation cache (None when disabled)."""
+    settings = get_settings()
+    if not settings.ROUTINE_CACHE_ENABLED:
+        return None
+    return RoutineCache(
+        max_entries=settings.ROUTINE_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.ROUTINE_CACHE_TTL_SECONDS,
+        use_db=not settings.is_vercel,
+    )
+
+
+@lru_cache
+def get_semantic_cache() -> Optional[SemanticModificationCache]:
+    """Singleton semantic cache for chat modifications (None when disabled)."""
+    settings = get_settings()
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    return SemanticModificationCache(
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        dim=settings.SEMANTIC_CACHE_DIM,
+    )
 
 
 @lru_cache
 def get_routine_generator() -> RoutineGenerator:
     """Singleton routine generator."""
-    return RoutineGenerator()
+    return RoutineGenerator(cache=get_routine_cache(), semantic_cache=get_semantic_cache())
+
+
+@lru_cache
+def get_chat_context() -> Optional[ChatContextAssembler]:
+    """Singleton chat history assembler for modification prompts (None when disabled)."""
+    settings = get_settings()
+    if not settings.CHAT_CONTEXT_ENABLED:
+        return None
+    generator = get_routine_generator()
+    return ChatContextAssembler(
+        summarizer=generator.summarize_chat if generator.is_configured else None,
+        token_budget=settings.CHAT_CONTEXT_TOKEN_BUDGET,
+        summary_tokens=settings.CHAT_SUMMARY_TOKEN_BUDGET,
+        max_message_tokens=settings.CHAT_MESSAGE_MAX_TOKENS,
+        min_summary_messages=settings.CHAT_SUMMARY_MIN_MESSAGES,
+    )
+
+
+@lru_cache
+def get_job_queue() -> RoutineJobQueue:
+    """Singleton routine generation job queue (workers are started in the app lifespan)."""
+    settings = get_settings()
+    return RoutineJobQueue(
+        get_routine_generator(),
+        workers=settings.JOB_WORKERS,
+        stale_seconds=settings.JOB_STALE_SECONDS,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        poll_interval=settings.JOB_POLL_INTERVAL,
+    )
+
+
+@lru_cache
+def get_image_cache() -> Optional[ImageAnalysisCache]:
+    """Singleton perceptual-hash cache for image analysis results (None when disabled)."""
+    settings = get_settings()
+    if not settings.IMAGE_CACHE_ENABLED:
+        return None
+    return ImageAnalysisCache(
+        max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+        max_distance=settings.IMAGE_CACHE_MAX_DISTANCE,
+        use_db=not settings.is_vercel,
+    )
 
 
 @lru_cache
 def get_image_analyzer() -> ImageAnalyzer:
     """Singleton image analyzer."""
-    return ImageAnalyzer()
+    return ImageAnalyzer(cache=get_image_cache())
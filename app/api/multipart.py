@@ -0,0 +1,248 @@
+"""
+Streaming ``multipart/form-data`` parsing for image uploads.
+
+``request.form()`` buffers every part before the handler runs and cannot
+stop a body that is too large. Here the request stream is fed chunk by
+chunk to python-multipart's push parser: file parts are written to a
+``SpooledFile`` as they arrive (memory up to a threshold, a temporary file
+beyond it) and the size limit is checked on every chunk, so an oversized
+upload is cut off as soon as it crosses the limit. The parser callbacks are
+synchronous, so data past the threshold is queued and written to disk with
+``aiofiles`` after each chunk, keeping file I/O off the event loop.
+"""
+
+import asyncio
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import aiofiles
+import aiofiles.os
+from fastapi import Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+MAX_FIELDS = 16
+MAX_FIELD_BYTES = 4096
+FORM_OVERHEAD_BYTES = 64 * 1024  # part headers, boundaries and text fields
+
+
+class MultipartError(Exception):
+    """Malformed or unexpected form; the message is shown to the user."""
+
+
+class UploadTooLarge(MultipartError):
+    """A file part (or the declared body) exceeds the size limit."""
+
+
+class SpooledFile:
+    """
+    Upload bytes kept in memory up to ``spool_bytes``, then in a temporary file.
+
+    Unlike ``tempfile.SpooledTemporaryFile`` the rolled-over file has a
+    path, which the preprocessing worker processes open directly. ``write``
+    only queues data past the threshold; ``flush`` writes it asynchronously
+    and ``finish`` closes the file so ``source`` can hand out its path.
+    """
+
+    def __init__(self, spool_bytes: int = 1024 * 1024):
+        self._spool_bytes = spool_bytes
+        self._buffer: Optional[BytesIO] = BytesIO()
+        self._pending = bytearray()  # Rolled-over data not yet on disk
+        self._file = None
+        self._path: Optional[str] = None
+        self.size = 0
+
+    @property
+    def rolled(self) -> bool:
+        return self._buffer is None
+
+    def write(self, data: bytes) -> None:
+        if self._buffer is not None and self.size + len(data) > self._spool_bytes:
+            self._pending += self._buffer.getbuffer()
+            self._buffer = None
+        if self._buffer is None:
+            self._pending += data
+        else:
+            self._buffer.write(data)
+        self.size += len(data)
+
+    async def flush(self) -> None:
+        """Write queued rolled-over data to the temporary file."""
+        if not self._pending:
+            return
+        if self._file is None:
+            fd, self._path = await asyncio.to_thread(tempfile.mkstemp, prefix="gymai-upload-")
+            self._file = await aiofiles.open(fd, "wb")
+        await self._file.write(bytes(self._pending))
+        self._pending.clear()
+
+    async def finish(self) -> None:
+        """Flush and close the temporary file once the part is complete."""
+        await self.flush()
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+
+    def source(self) -> Union[bytes, Path]:
+        """What the analyzer takes: the bytes while small, the file path once spilled (after ``finish``)."""
+        if self._path is None:
+            return self._buffer.getvalue()
+        return Path(self._path)
+
+    async def close(self) -> None:
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+        if self._path is not None:
+            try:
+                await aiofiles.os.remove(self._path)
+            except FileNotFoundError:
+                pass
+            self._path = None
+        self._buffer = None
+        self._pending.clear()
+
+
+class UploadedFile:
+    """One file part of the form."""
+
+    def __init__(self, field_name: str, filename: str, content_type: str, spool: SpooledFile):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.spool = spool
+
+
+class MultipartForm:
+    """Text fields and spooled file parts of a parsed form."""
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.files: List[UploadedFile] = []
+
+    async def flush(self) -> None:
+        for upload in self.files:
+            await upload.spool.flush()
+
+    async def finish(self) -> None:
+        for upload in self.files:
+            await upload.spool.finish()
+
+    async def close(self) -> None:
+        for upload in self.files:
+            await upload.spool.close()
+
+
+class _FormBuilder:
+    """python-multipart callbacks that build a ``MultipartForm`` with limits."""
+
+    def __init__(self, form: MultipartForm, max_file_size: int, max_files: int, spool_bytes: int):
+        self.form = form
+        self._max_file_size = max_file_size
+        self._max_files = max_files
+        self._spool_bytes = spool_bytes
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._name = ""
+        self._file: Optional[UploadedFile] = None
+        self._data = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._file = None
+        self._data = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            if len(self.form.fields) >= MAX_FIELDS:
+                raise MultipartError("El formulario tiene demasiados campos")
+            return
+
+        if len(self.form.files) >= self._max_files:
+            raise MultipartError(f"Se admiten como máximo {self._max_files} archivos")
+        content_type = self._headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+        self._file = UploadedFile(
+            self._name, filename.decode("utf-8", "replace"), content_type, SpooledFile(self._spool_bytes)
+        )
+        self.form.files.append(self._file)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._file is None:
+            if len(self._data) + end - start > MAX_FIELD_BYTES:
+                raise MultipartError(f"El campo {self._name} es demasiado largo")
+            self._data += data[start:end]
+            return
+
+        if self._file.spool.size + end - start > self._max_file_size:
+            raise UploadTooLarge(
+                f"La imagen supera el tamaño máximo de {self._max_file_size // (1024 * 1024)} MB"
+            )
+        self._file.spool.write(data[start:end])
+
+    def on_part_end(self) -> None:
+        if self._file is None:
+            self.form.fields[self._name] = self._data.decode("utf-8", "replace")
+
+
+async def parse_multipart(
+    request: Request, max_file_size: int, max_files: int = 1, spool_bytes: int = 1024 * 1024
+) -> MultipartForm:
+    """
+    Stream a ``multipart/form-data`` request body into a ``MultipartForm``.
+
+    Raises ``UploadTooLarge`` as soon as a file part (or the declared
+    ``Content-Length``) exceeds the limits and ``MultipartError`` for
+    malformed forms; the caller must ``await form.close()``.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise MultipartError("Se esperaba un formulario multipart/form-data")
+
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_file_size * max_files + FORM_OVERHEAD_BYTES:
+        raise UploadTooLarge(f"La imagen supera el tamaño máximo de {max_file_size // (1024 * 1024)} MB")
+
+    form = MultipartForm()
+    builder = _FormBuilder(form, max_file_size, max_files, spool_bytes)
+    parser = MultipartParser(boundary, builder.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await form.flush()
+        parser.finalize()
+        await form.finish()
+    except MultipartParseError as e:
+        await form.close()
+        raise MultipartError(f"Formulario mal formado: {e}") from e
+    except BaseException:
+        await form.close()
+        raise
+    return form
@@ -5,6 +5,7 @@ Health check endpoint.
 from datetime import datetime
 
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
 
 from app.core.logging import get_logger
 
@@ -16,8 +17,11 @@ router = APIRouter(tags=["Health"])
 @router.get("/health")
 async def health_check():
     """Application health check endpoint for monitoring / Render."""
-    from app.api.dependencies import get_routine_generator
+    from app.api.dependencies import (
+        get_image_cache, get_job_queue, get_routine_cache, get_routine_generator, get_semantic_cache,
+    )
     from app.db.session import engine
+    from app.services.groq_scheduler import get_groq_scheduler
     from sqlalchemy import text
 
     generator = get_routine_generator()
@@ -26,13 +30,45 @@ async def health_check():
         "status": "ok",
         "server_time": datetime.now().isoformat(),
         "ai_available": generator.is_configured,
+        "offline_mode": generator.is_available and not generator.is_configured,
     }
 
+    health_status["groq_scheduler"] = get_groq_scheduler().metrics()
+
+    cache = get_routine_cache()
+    if cache is not None:
+        health_status["routine_cache"] = cache.stats()
+
+    health_status["jobs"] = get_job_queue().stats()
+
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        health_status["semantic_cache"] = semantic_cache.stats()
+
+    image_cache = get_image_cache()
+    if image_cache is not None:
+        health_status["image_cache"] = image_cache.stats()
+
     try:
         async with engine.connect() as conn:
             await conn.execute(text("SELECT 1"))
         health_status["database"] = "connected"
+        health_status["database_pool"] = engine.pool.status()
     except Exception as e:
         health_status["database"] = f"error: {str(e)[:100]}"
 
     return health_status
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for this worker process (Groq calls, caches, scheduler)."""
+    from app.core import metrics as app_metrics
+    from app.services.groq_scheduler import get_groq_scheduler
+
+    scheduler = get_groq_scheduler().metrics()
+    for priority, depth in scheduler["queue_depth_by_priority"].items():
+        app_metrics.SCHEDULER_QUEUE_DEPTH.set(depth, priority=priority)
+    app_metrics.SCHEDULER_ACTIVE.set(scheduler["active"])
+
+    return PlainTextResponse(app_metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,91 @@
+"""
+API routes for exercise image analysis over HTTP.
+
+The chat WebSocket remains the main channel; this is the equivalent for
+clients without one (the dashboard's HTTP fallback mode, Vercel).
+"""
+
+from fastapi import APIRouter, Request, Depends, status
+from fastapi.responses import JSONResponse
+
+from app.api.dependencies import get_image_analyzer
+from app.api.multipart import MultipartError, UploadTooLarge, parse_multipart
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.repositories import routine_repository, chat_repository
+from app.services.image_analysis_service import ImageAnalyzer
+from app.websocket.uploads import ACTIONS, ALLOWED_MIME_PREFIX, CLIP_MIME_TYPES
+
+logger = get_logger("routes.images")
+
+router = APIRouter(prefix="/api", tags=["Images"])
+
+
+@router.post("/routine/{routine_id}/analyze_image")
+async def analyze_image(
+    routine_id: int,
+    request: Request,
+    analyzer: ImageAnalyzer = Depends(get_image_analyzer),
+):
+    """
+    Analyze an exercise photo or clip sent as ``multipart/form-data``.
+
+    Fields: ``image`` (the file; up to ``VISION_MAX_IMAGES`` of them with
+    ``analyze_form``, analyzed together as views of the same exercise),
+    ``action`` (``analyze_form``, ``analyze_clip`` or ``suggest_variations``)
+    and ``exercise_name``. The body is streamed to a spooled file with the
+    size limit enforced per chunk; preprocessing runs in the worker pool.
+    """
+    settings = get_settings()
+    try:
+        form = await parse_multipart(
+            request,
+            max_file_size=settings.max_image_size_bytes,
+            max_files=settings.VISION_MAX_IMAGES,
+            spool_bytes=settings.IMAGE_UPLOAD_SPOOL_BYTES,
+        )
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, content={"error": str(e)})
+    except MultipartError as e:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"error": str(e)})
+
+    try:
+        action = form.fields.get("action") or "analyze_form"
+        exercise_name = form.fields.get("exercise_name") or None
+        images = [upload for upload in form.files if upload.field_name == "image"]
+
+        if action not in ACTIONS:
+            return JSONResponse(status_code=400, content={"error": f"Acción no reconocida: {action}"})
+        if not images:
+            return JSONResponse(status_code=400, content={"error": "Datos de imagen no proporcionados"})
+        if len(images) > 1 and action != "analyze_form":
+            return JSONResponse(status_code=400, content={"error": "Esta acción admite una sola imagen"})
+        for upload in images:
+            mime_type = upload.content_type.lower()
+            if not (mime_type.startswith(ALLOWED_MIME_PREFIX) or (action == "analyze_clip" and mime_type in CLIP_MIME_TYPES)):
+                return JSONResponse(status_code=400, content={"error": "Solo se admiten archivos de imagen"})
+
+        if not await routine_repository.get_routine(routine_id):
+            return JSONResponse(status_code=404, content={"error": "Rutina no encontrada"})
+
+        sources = [upload.spool.source() for upload in images]
+        if len(sources) > 1:
+            analysis = await analyzer.analyze_exercise_images(sources, exercise_name)
+        elif action == "analyze_form":
+            analysis = await analyzer.analyze_exercise_image(sources[0], exercise_name)
+        elif action == "analyze_clip":
+            analysis = await analyzer.analyze_exercise_clip(sources[0], exercise_name)
+        else:
+            analysis = await analyzer.suggest_exercise_variations(sources[0])
+
+        await chat_repository.save_chat_message(routine_id, "assistant", analysis)
+        return {"analysis": analysis}
+
+    except Exception as e:
+        logger.error("Image analysis failed: %s", e, exc_info=True)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"error": "Error interno al analizar la imagen"},
+        )
+    finally:
+        await form.close()
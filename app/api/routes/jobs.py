@@ -0,0 +1,56 @@
+"""
+API routes for asynchronous routine generation jobs.
+"""
+
+from fastapi import APIRouter, Request, Depends, status
+from fastapi.responses import JSONResponse
+
+from app.core.logging import get_logger
+from app.schemas.routines import RoutineRequest
+from app.services.job_queue import RoutineJobQueue
+from app.api.dependencies import get_job_queue
+
+logger = get_logger("routes.jobs")
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+
+@router.post("/routines", status_code=status.HTTP_202_ACCEPTED)
+async def submit_routine_job(
+    request: Request,
+    job_queue: RoutineJobQueue = Depends(get_job_queue),
+):
+    """
+    Queue a routine generation and return its job ID immediately.
+
+    Follow it with ``GET /api/jobs/{job_id}`` or the ``/ws/jobs/{job_id}``
+    WebSocket, which pushes a ``job_update`` message when it finishes.
+    """
+    if not job_queue.started:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"error": "La cola de trabajos no está disponible."},
+        )
+
+    try:
+        routine_request = RoutineRequest(**(await request.json()))
+    except Exception as e:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"error": str(e)})
+
+    job_id = await job_queue.submit(routine_request)
+    logger.info("Queued routine job %s", job_id)
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/jobs/{job_id}",
+        "ws_url": f"/ws/jobs/{job_id}",
+    }
+
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str, job_queue: RoutineJobQueue = Depends(get_job_queue)):
+    """Current state of a job (``routine_id`` is set once it completes)."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"error": "Trabajo no encontrado"})
+    return job
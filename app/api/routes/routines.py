@@ -2,20 +2,44 @@
 API routes for routine CRUD operations.
 """
 
+import asyncio
+import json
+from typing import Optional
+
 from fastapi import APIRouter, Request, Form, Depends, HTTPException, status
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 
 from app.core.logging import get_logger
-from app.schemas.routines import RoutineRequest
+from app.models.models import Routine
+from app.core.config import get_settings
+from app.schemas.routines import BulkRoutineRequest, RoutineRequest
 from app.services.ai_service import RoutineGenerator
+from app.services.chat_context import ChatContextAssembler
+from app.services.bulk_routines import generate_routines_bulk, initial_chat_messages
+from app.services.exercise_catalog import get_exercise_catalog, parse_equipment
+from app.services.offline_routines import OfflineRoutine, synthesize_routine
 from app.repositories import routine_repository, chat_repository
-from app.api.dependencies import get_routine_generator
+from app.api.dependencies import get_routine_generator, get_chat_context
 
 logger = get_logger("routes.routines")
 
 router = APIRouter(prefix="/api", tags=["Routines"])
 
 
+async def _persist_new_routine(routine: Routine, routine_request: RoutineRequest) -> int:
+    """Save a freshly generated routine plus its initial chat messages."""
+    routine_id = await routine_repository.save_routine(routine, user_id=routine_request.user_id)
+
+    # Save initial chat messages (non-critical)
+    try:
+        for sender, content in initial_chat_messages(routine_request):
+            await chat_repository.save_chat_message(routine_id, sender, content)
+    except Exception as e:
+        logger.warning("Failed to save initial chat messages: %s", e)
+
+    return routine_id
+
+
 @router.post("/create_routine")
 async def create_routine(
     request: Request,
@@ -23,7 +47,7 @@ async def create_routine(
 ):
     """Create a new AI-generated routine."""
     try:
-        if not generator.is_configured:
+        if not generator.is_available:
             return JSONResponse(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 content={"error": "El servicio de IA no está disponible."},
@@ -36,29 +60,13 @@ async def create_routine(
         routine = await generator.create_initial_routine(routine_request)
         logger.info("Routine generated: %s", routine.routine_name)
 
-        # Persist
-        routine_id = await routine_repository.save_routine(routine, user_id=routine_request.user_id)
+        routine_id = await _persist_new_routine(routine, routine_request)
 
-        # Save initial chat messages (non-critical)
-        try:
-            if routine_request.days:
-                user_msg = f"Quiero una rutina para {routine_request.goals} con una intensidad de {routine_request.days} días a la semana."
-            else:
-                user_msg = routine_request.goals
-            await chat_repository.save_chat_message(
-                routine_id,
-                "user",
-                user_msg,
-            )
-            await chat_repository.save_chat_message(
-                routine_id,
-                "assistant",
-                "¡He creado una rutina personalizada para ti! Puedes verla en el panel principal.",
-            )
-        except Exception as e:
-            logger.warning("Failed to save initial chat messages: %s", e)
-
-        return {"routine_id": routine_id, "routine": routine.model_dump()}
+        return {
+            "routine_id": routine_id,
+            "routine": routine.model_dump(),
+            "offline": isinstance(routine, OfflineRoutine),
+        }
 
     except ValueError as e:
         logger.warning("Validation error creating routine: %s", e)
@@ -74,12 +82,146 @@ async def create_routine(
         )
 
 
+@router.post("/create_routines/bulk")
+async def create_routines_bulk(
+    request: Request,
+    generator: RoutineGenerator = Depends(get_routine_generator),
+):
+    """
+    Create many routines at once (gym onboarding) and stream per-item status as NDJSON.
+
+    Emits one ``{"type": "item"}`` line per request as it is generated and
+    saved, then a ``{"type": "summary"}`` line with the totals.
+    """
+    if not generator.is_available:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"error": "El servicio de IA no está disponible."},
+        )
+
+    try:
+        bulk_request = BulkRoutineRequest(**(await request.json()))
+    except Exception as e:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"error": str(e)})
+
+    max_items = get_settings().BULK_MAX_ITEMS
+    if len(bulk_request.requests) > max_items:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": f"Máximo {max_items} rutinas por lote."},
+        )
+
+    async def events():
+        async for event in generate_routines_bulk(
+            generator, bulk_request.requests, concurrency=bulk_request.concurrency
+        ):
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.post("/create_routine/draft")
+async def create_routine_draft(request: Request):
+    """Instant, unsaved routine draft built from the local exercise catalog (no AI)."""
+    try:
+        routine_request = RoutineRequest(**(await request.json()))
+    except Exception as e:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"error": str(e)})
+    return {"routine": synthesize_routine(routine_request).model_dump()}
+
+
+@router.get("/exercises/substitutes")
+async def exercise_substitutes(name: str, equipment: str = "", limit: int = 5):
+    """Replacement candidates for an exercise from the local catalog."""
+    catalog = get_exercise_catalog()
+    original = catalog.lookup(name)
+    if original is None:
+        raise HTTPException(status_code=404, detail="Ejercicio no encontrado en el catálogo")
+    available = parse_equipment(equipment) if equipment else None
+    return {
+        "exercise": original.name,
+        "substitutes": [
+            {"name": e.name, "muscle": e.muscle, "equipment": e.equipment_label, "kind": e.kind}
+            for e in catalog.substitutes(name, available, limit=max(1, min(limit, 20)))
+        ],
+    }
+
+
+@router.post("/create_routine/stream")
+async def create_routine_stream(
+    request: Request,
+    generator: RoutineGenerator = Depends(get_routine_generator),
+):
+    """
+    Create a routine and stream progress as NDJSON.
+
+    Emits one ``{"type": "day"}`` line per day as soon as the model finishes
+    it, then ``{"type": "complete"}`` with the routine ID (or ``{"type": "error"}``).
+    ``offline`` in the final line is true when the routine came from the
+    local catalog instead of the model. If the model fails after some days
+    were sent, a ``{"type": "fallback"}`` line comes first: the days before
+    it are discarded and the catalog days follow from index 0.
+    """
+    if not generator.is_available:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"error": "El servicio de IA no está disponible."},
+        )
+
+    try:
+        routine_request = RoutineRequest(**(await request.json()))
+    except Exception as e:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"error": str(e)})
+
+    async def events():
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def on_day(index: int, day):
+            await queue.put({"type": "day", "index": index, "day": day.model_dump()})
+
+        async def on_fallback():
+            await queue.put({"type": "fallback", "offline": True})
+
+        async def generate():
+            try:
+                routine = await generator.create_initial_routine(
+                    routine_request, on_day=on_day, on_fallback=on_fallback
+                )
+                routine_id = await _persist_new_routine(routine, routine_request)
+                await queue.put({
+                    "type": "complete",
+                    "routine_id": routine_id,
+                    "routine": routine.model_dump(),
+                    "offline": isinstance(routine, OfflineRoutine),
+                })
+            except ValueError as e:
+                logger.warning("Validation error creating routine: %s", e)
+                await queue.put({"type": "error", "error": str(e)})
+            except Exception as e:
+                logger.error("Failed to create routine: %s", e, exc_info=True)
+                await queue.put({"type": "error", "error": "Error interno al generar la rutina"})
+
+        task = asyncio.create_task(generate())
+        try:
+            while True:
+                event = await queue.get()
+                yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+                if event["type"] in ("complete", "error"):
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @router.post("/modify_routine/{routine_id}")
 @router.post("/routine/modify/{routine_id}")
 async def modify_routine(
     routine_id: int,
     request: Request,
     generator: RoutineGenerator = Depends(get_routine_generator),
+    chat_context: Optional[ChatContextAssembler] = Depends(get_chat_context),
 ):
     """HTTP fallback for modifying routines (when WebSocket is unavailable)."""
     try:
@@ -93,10 +235,12 @@ async def modify_routine(
         if not current_routine:
             return JSONResponse(status_code=404, content={"error": "Rutina no encontrada"})
 
+        history = (await chat_context.build(routine_id)).render() if chat_context else ""
         await chat_repository.save_chat_message(routine_id, "user", message)
 
-        modified_routine = await generator.modify_routine(current_routine, message)
-        explanation = await generator.explain_routine_changes(current_routine, modified_routine, message)
+        modified_routine, explanation = await generator.modify_and_explain(
+            current_routine, message, history=history
+        )
 
         await routine_repository.save_routine(modified_routine, routine_id=routine_id)
         await chat_repository.save_chat_message(routine_id, "assistant", explanation)
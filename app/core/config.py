@@ -5,6 +5,8 @@ Single source of truth for all application settings.
 
 import os
 from functools import lru_cache
+from typing import Dict
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -21,23 +23,103 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str = ""
     GROQ_MODEL: str = "llama-3.3-70b-versatile"
     GROQ_VISION_MODEL: str = "meta-llama/llama-4-scout-17b-16e-instruct"
+    GROQ_BASE_URL: str = ""  # e.g. http://localhost:8100 for scripts/fake_groq_server.py
+    AI_STREAMING_ENABLED: bool = True
+    AI_PATCH_MODE_ENABLED: bool = True
+    LOCAL_EDITS_ENABLED: bool = True
+    # Offline catalog-based routines when Groq is unavailable or too slow
+    OFFLINE_FALLBACK_ENABLED: bool = True
+    AI_GENERATION_TIMEOUT_SECONDS: float = 45.0  # per Groq call; time queued in the scheduler is not counted
+
+    # --- Groq HTTP connection pool ---
+    GROQ_MAX_CONNECTIONS: int = 20
+    GROQ_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    GROQ_KEEPALIVE_EXPIRY: float = 30.0
+    GROQ_CONNECT_TIMEOUT: float = 5.0
+    GROQ_READ_TIMEOUT: float = 60.0
+    GROQ_HTTP2: bool = True  # used only if the 'h2' package is installed
+
+    # --- Groq scheduler (outbound rate limiting) ---
+    GROQ_MAX_CONCURRENCY: int = 8
+    # 0 = unlimited. Opt in to match your Groq plan (free tier: 30 RPM / 12000 TPM);
+    # with a TPM limit, requests without max_tokens reserve 1500 completion tokens.
+    GROQ_RPM_LIMIT: int = 0
+    GROQ_TPM_LIMIT: int = 0
+    GROQ_MODEL_LIMITS: Dict[str, Dict[str, int]] = Field(default_factory=dict)  # {"model": {"rpm": .., "tpm": ..}}
+    GROQ_MAX_RETRIES: int = 3
+
+    # --- Bulk routine generation ---
+    BULK_MAX_ITEMS: int = 500
+    BULK_BATCH_SIZE: int = 25  # routines per INSERT transaction
+    BULK_CONCURRENCY: int = 0  # 0 = GROQ_MAX_CONCURRENCY
+
+    # --- Asynchronous generation jobs ---
+    JOB_WORKERS: int = 4
+    JOB_STALE_SECONDS: int = 300  # running jobs without a heartbeat for this long are requeued
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_WAIT_TIMEOUT: float = 180.0  # max time a WebSocket waits for a job
+
+    # --- Routine generation cache ---
+    ROUTINE_CACHE_ENABLED: bool = True
+    ROUTINE_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    ROUTINE_CACHE_MAX_ENTRIES: int = 256
+
+    # --- Semantic cache for chat modifications ---
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1024
+    SEMANTIC_CACHE_THRESHOLD: float = 0.9
+    SEMANTIC_CACHE_DIM: int = 1024
+
+    # --- Chat history context for modifications ---
+    CHAT_CONTEXT_ENABLED: bool = True
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 600  # summary + recent messages in the prompt
+    CHAT_SUMMARY_TOKEN_BUDGET: int = 200
+    CHAT_MESSAGE_MAX_TOKENS: int = 150  # longer messages are truncated in the prompt
+    CHAT_SUMMARY_MIN_MESSAGES: int = 4  # overflow needed before folding into the summary
 
     # --- Database ---
     DATABASE_URL: str = ""
     FORCE_SQLITE: bool = False
+    DB_POOL_MODE: str = "auto"  # queue, pgbouncer, null (no pooling) or auto (see app/db/engine.py)
+    DB_POOL_SIZE: int = 5  # connections kept open per worker process
+    DB_MAX_OVERFLOW: int = 5  # extra connections under bursts, closed when returned
+    DB_POOL_TIMEOUT_SECONDS: int = 10  # wait for a free connection before failing
+    DB_POOL_RECYCLE_SECONDS: int = 300  # reconnect before the server or proxy drops idle connections
+    DB_POOL_PRE_PING: bool = True  # check each connection on checkout (e.g. after Neon suspends)
 
     # --- Server ---
     HOST: str = "localhost"
     PORT: int = 8000
     CORS_ORIGINS: str = "*"
+    WS_MAX_MESSAGE_MB: int = 0  # 0 = just enough for one base64 image of MAX_IMAGE_SIZE_MB
 
     # --- Image Analysis ---
     MAX_IMAGE_SIZE_MB: int = 10
+    IMAGE_MAX_EDGE: int = 1024  # longest edge sent to the vision model, in pixels
+    IMAGE_OUTPUT_FORMAT: str = "JPEG"  # JPEG or WEBP
+    IMAGE_OUTPUT_QUALITY: int = 85
+    IMAGE_PREPROCESS_WORKERS: int = 2  # 0 = thread pool instead of worker processes
+    VISION_MAX_IMAGES: int = 5  # images per vision request (Groq limit)
+    CLIP_KEYFRAMES: int = 6  # frames of a clip tiled into the contact sheet
+    IMAGE_UPLOAD_SPOOL_BYTES: int = 1024 * 1024  # binary WebSocket and multipart HTTP uploads spill to disk beyond this
+    IMAGE_CACHE_ENABLED: bool = True
+    IMAGE_CACHE_MAX_ENTRIES: int = 512
+    IMAGE_CACHE_MAX_DISTANCE: int = 6  # max differing bits (of 64) between perceptual hashes
 
     @property
     def max_image_size_bytes(self) -> int:
         return self.MAX_IMAGE_SIZE_MB * 1024 * 1024
 
+    @property
+    def ws_max_message_bytes(self) -> int:
+        """Largest WebSocket message the server accepts (uvicorn ``ws_max_size``)."""
+        if self.WS_MAX_MESSAGE_MB:
+            return self.WS_MAX_MESSAGE_MB * 1024 * 1024
+        # One image per frame keeps the per-socket peak bounded; several
+        # full-size photos go through the binary upload protocol instead.
+        return -(-self.max_image_size_bytes * 4 // 3) + 64 * 1024  # base64 image + JSON envelope
+
     @property
     def ai_configured(self) -> bool:
         return bool(self.GROQ_API_KEY)
@@ -0,0 +1,366 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+A minimal counter / gauge / histogram registry (no external dependency),
+served at ``/metrics``. Values are per process: with several gunicorn
+workers each scrape sees the worker that answered it, so aggregate with
+``sum`` across scrapes/instances.
+
+``track_llm_call`` wraps one Groq call and records wall time,
+time-to-first-token (from slot dispatch, so queueing is not counted twice),
+scheduler queue time, retries, token usage and outcome.
+"""
+
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import groq
+
+from app.core.logging import get_logger
+
+logger = get_logger("metrics")
+
+LabelValues = Tuple[str, ...]
+
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+QUEUE_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+BYTE_BUCKETS = (16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (set at scrape time for queue depths)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = float(value)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.setdefault(key, [0] * len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def sum(self, **labels: str) -> float:
+        return self._sums.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "gymai_llm_call_duration_seconds",
+    "Wall time of a Groq call, including scheduler queueing and retries.",
+    ("operation", "model", "outcome"),
+)
+LLM_TTFT_SECONDS = REGISTRY.histogram(
+    "gymai_llm_time_to_first_token_seconds",
+    "Time from dispatching a streamed Groq call (scheduler slot granted) to its first content chunk.",
+    ("operation", "model"),
+    buckets=TTFT_BUCKETS,
+)
+LLM_QUEUE_SECONDS = REGISTRY.histogram(
+    "gymai_llm_queue_seconds",
+    "Time a Groq call waited in the scheduler for a dispatch slot.",
+    ("operation", "model"),
+    buckets=QUEUE_BUCKETS,
+)
+LLM_TOKENS = REGISTRY.counter(
+    "gymai_llm_tokens_total",
+    "Tokens reported by Groq usage, by kind (prompt or completion).",
+    ("operation", "model", "kind"),
+)
+LLM_TOKENS_PER_CALL = REGISTRY.histogram(
+    "gymai_llm_tokens_per_call",
+    "Tokens per Groq call, by kind (prompt or completion).",
+    ("operation", "kind"),
+    buckets=TOKEN_BUCKETS,
+)
+LLM_RETRIES = REGISTRY.counter(
+    "gymai_llm_retries_total",
+    "Groq call retries after rate limits, 5xx or connection errors.",
+    ("operation", "model"),
+)
+AI_CACHE_REQUESTS = REGISTRY.counter(
+    "gymai_ai_cache_requests_total",
+    "Lookups that can avoid a Groq call, by cache and result (hit or miss).",
+    ("cache", "result"),
+)
+OFFLINE_FALLBACKS = REGISTRY.counter(
+    "gymai_offline_fallbacks_total",
+    "Routines synthesized locally instead of by Groq, by reason.",
+    ("reason",),
+)
+SCHEDULER_QUEUE_DEPTH = REGISTRY.gauge(
+    "gymai_groq_scheduler_queue_depth",
+    "Groq calls waiting in the scheduler, by priority.",
+    ("priority",),
+)
+SCHEDULER_ACTIVE = REGISTRY.gauge(
+    "gymai_groq_scheduler_active",
+    "Groq calls currently holding a scheduler slot.",
+)
+IMAGE_PREPROCESS_SECONDS = REGISTRY.histogram(
+    "gymai_image_preprocess_seconds",
+    "Time to decode, orient, downscale and re-encode an uploaded image, including pool queueing.",
+    ("outcome",),
+    buckets=QUEUE_BUCKETS,
+)
+IMAGE_BYTES = REGISTRY.histogram(
+    "gymai_image_bytes",
+    "Image sizes before and after preprocessing, by stage (original or prepared).",
+    ("stage",),
+    buckets=BYTE_BUCKETS,
+)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    AI_CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _outcome(error: BaseException) -> str:
+    if isinstance(error, groq.RateLimitError):
+        return "rate_limited"
+    if isinstance(error, groq.APITimeoutError):
+        return "timeout"
+    if isinstance(error, (groq.InternalServerError, groq.APIConnectionError)):
+        return "server_error"
+    if isinstance(error, groq.APIStatusError):
+        return "client_error"
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    return "error"
+
+
+class LLMCall:
+    """Measurements of one Groq call, filled in by the caller and the scheduler."""
+
+    __slots__ = ("operation", "model", "stream", "started", "dispatched_at", "first_token_at",
+                 "queue_seconds", "retries", "prompt_tokens", "completion_tokens")
+
+    def __init__(self, operation: str, model: str, stream: bool = False):
+        self.operation = operation
+        self.model = model
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.dispatched_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.queue_seconds = 0.0
+        self.retries = 0
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+
+    def slot_granted(self, queue_seconds: float) -> None:
+        """Add scheduler wait and restart the TTFT clock (once per attempt)."""
+        self.queue_seconds += queue_seconds
+        self.dispatched_at = time.perf_counter()
+
+    def first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def record_usage(self, usage) -> None:
+        """Take token counts from a ``CompletionUsage`` (ignored when missing)."""
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if isinstance(prompt_tokens, int):
+            self.prompt_tokens = prompt_tokens
+        if isinstance(completion_tokens, int):
+            self.completion_tokens = completion_tokens
+
+    def record_chunk(self, chunk) -> None:
+        """Track a streamed chunk: first content token and final usage (``x_groq.usage``)."""
+        x_groq = getattr(chunk, "x_groq", None)
+        self.record_usage(getattr(x_groq, "usage", None) or getattr(chunk, "usage", None))
+        choices = getattr(chunk, "choices", None)
+        if choices and choices[0].delta.content:
+            self.first_token()
+
+    def finish(self, outcome: str) -> None:
+        duration = time.perf_counter() - self.started
+        operation, model = self.operation, self.model
+        LLM_CALL_SECONDS.observe(duration, operation=operation, model=model, outcome=outcome)
+        LLM_QUEUE_SECONDS.observe(self.queue_seconds, operation=operation, model=model)
+        ttft = None
+        if self.first_token_at is not None:
+            ttft = self.first_token_at - (self.dispatched_at or self.started)
+            LLM_TTFT_SECONDS.observe(ttft, operation=operation, model=model)
+        if self.retries:
+            LLM_RETRIES.inc(self.retries, operation=operation, model=model)
+        for kind, tokens in (("prompt", self.prompt_tokens), ("completion", self.completion_tokens)):
+            if isinstance(tokens, int):
+                LLM_TOKENS.inc(tokens, operation=operation, model=model, kind=kind)
+                LLM_TOKENS_PER_CALL.observe(tokens, operation=operation, kind=kind)
+
+        logger.info(
+            "llm_call operation=%s model=%s stream=%s outcome=%s duration=%.3f ttft=%s "
+            "queue=%.3f retries=%d prompt_tokens=%s completion_tokens=%s",
+            operation, model, self.stream, outcome, duration,
+            f"{ttft:.3f}" if ttft is not None else "-", self.queue_seconds, self.retries,
+            self.prompt_tokens if self.prompt_tokens is not None else "-",
+            self.completion_tokens if self.completion_tokens is not None else "-",
+        )
+
+
+@contextmanager
+def track_llm_call(operation: str, model: str, stream: bool = False) -> Iterator[LLMCall]:
+    """Time a Groq call and record its metrics when the block exits."""
+    call = LLMCall(operation, model, stream)
+    try:
+        yield call
+    except BaseException as e:
+        call.finish(_outcome(e))
+        raise
+    call.finish("ok")
@@ -1,15 +1,32 @@
 """
 Database engine configuration.
 Handles SQLite vs PostgreSQL selection and connection setup.
+
+PostgreSQL connections are pooled according to ``DB_POOL_MODE``:
+
+- ``queue``: a persistent ``AsyncAdaptedQueuePool``, so repository calls and
+  health probes reuse open connections instead of paying a TCP + TLS
+  handshake to Neon each time.
+- ``pgbouncer``: the same pool in front of a transaction-mode PgBouncer
+  (Neon's ``-pooler`` endpoints). asyncpg's prepared statement caches are
+  disabled and statements get unique names, since consecutive transactions
+  may run on different server connections.
+- ``null``: no pooling (``NullPool``), for serverless deployments where the
+  process does not outlive the request.
+- ``auto`` (default): ``null`` on Vercel, ``pgbouncer`` for ``-pooler``
+  hosts, ``queue`` otherwise.
+
+The statement caches are disabled for ``-pooler`` hosts whatever the mode.
 """
 
 import os
+from uuid import uuid4
 from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
 
 from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from app.core.config import get_settings
 from app.core.logging import get_logger
@@ -70,6 +87,54 @@ def _resolve_database_url(settings) -> tuple[str, bool]:
     return final_url, True
 
 
+POOL_MODES = ("auto", "queue", "pgbouncer", "null")
+
+
+def _is_pgbouncer_host(db_url: str) -> bool:
+    return "-pooler" in (urlparse(db_url).hostname or "")
+
+
+def _resolve_pool_mode(settings, db_url: str) -> str:
+    """Pooling mode for a PostgreSQL URL (``auto`` resolved)."""
+    mode = settings.DB_POOL_MODE.lower()
+    if mode not in POOL_MODES:
+        raise ValueError(f"Unsupported DB_POOL_MODE: {settings.DB_POOL_MODE}")
+    if mode != "auto":
+        return mode
+    if settings.is_vercel:
+        return "null"
+    if _is_pgbouncer_host(db_url):
+        return "pgbouncer"
+    return "queue"
+
+
+def _postgres_engine_options(settings, db_url: str) -> dict:
+    """``create_async_engine`` keyword arguments for PostgreSQL."""
+    mode = _resolve_pool_mode(settings, db_url)
+    connect_args = {"server_settings": {"statement_timeout": "10000"}}
+    if mode == "pgbouncer" or _is_pgbouncer_host(db_url):
+        connect_args.update(
+            statement_cache_size=0,  # asyncpg
+            prepared_statement_cache_size=0,  # SQLAlchemy dialect
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+
+    options = {"echo": False, "connect_args": connect_args}
+    if mode == "null":
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+    logger.info("PostgreSQL pool mode: %s", mode)
+    return options
+
+
 def create_engine_and_session():
     """
     Create and return SQLAlchemy async engine + session factory.
@@ -92,12 +157,7 @@ def create_engine_and_session():
             cursor.execute("PRAGMA foreign_keys = ON")
             cursor.close()
     else:
-        engine = create_async_engine(
-            db_url,
-            echo=False,
-            poolclass=NullPool,
-            connect_args={"server_settings": {"statement_timeout": "10000"}},
-        )
+        engine = create_async_engine(db_url, **_postgres_engine_options(settings, db_url))
 
     session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
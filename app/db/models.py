@@ -32,3 +32,52 @@ class ChatMessageModel(Base):
     sender = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime, nullable=False)
+
+
+class ChatSummaryModel(Base):
+    """ORM model for the 'chat_summaries' table (rolling summary of older chat turns)."""
+
+    __tablename__ = "chat_summaries"
+
+    routine_id = Column(Integer, ForeignKey("routines.id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(Text, nullable=False)
+    last_message_id = Column(Integer, nullable=False)  # newest chat message folded into the summary
+    updated_at = Column(DateTime, nullable=False)
+
+
+class RoutineCacheModel(Base):
+    """ORM model for the 'routine_cache' table (generated routines keyed by request fingerprint)."""
+
+    __tablename__ = "routine_cache"
+
+    fingerprint = Column(String, primary_key=True)
+    routine_data = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+class ImageAnalysisCacheModel(Base):
+    """ORM model for the 'image_analysis_cache' table (vision results keyed by perceptual hash)."""
+
+    __tablename__ = "image_analysis_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    context_key = Column(String, nullable=False)  # action + exercise + difficulty
+    image_hash = Column(String(16), nullable=False)  # 64-bit dHash, hex
+    result = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    last_used_at = Column(DateTime, nullable=False)
+
+
+class RoutineJobModel(Base):
+    """ORM model for the 'routine_jobs' table (asynchronous routine generation jobs)."""
+
+    __tablename__ = "routine_jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False)  # queued | running | completed | failed
+    request_data = Column(Text, nullable=False)
+    routine_id = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
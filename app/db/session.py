@@ -19,6 +19,11 @@ async def get_db_session():
     return async_session()
 
 
+async def close_db():
+    """Close the pooled database connections (called from the app lifespan)."""
+    await engine.dispose()
+
+
 async def table_exists(table_name: str) -> bool:
     """Check if a table exists in the database."""
     try:
@@ -30,14 +35,74 @@ async def table_exists(table_name: str) -> bool:
         return False
 
 
+# Direct DDL for PostgreSQL (avoids event loop issues in serverless)
+_POSTGRES_TABLES = {
+    "routines": """
+        CREATE TABLE IF NOT EXISTS routines (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            routine_name VARCHAR NOT NULL,
+            routine_data TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+    """,
+    "chat_messages": """
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id SERIAL PRIMARY KEY,
+            routine_id INTEGER REFERENCES routines(id) ON DELETE CASCADE,
+            sender VARCHAR NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP NOT NULL
+        )
+    """,
+    "chat_summaries": """
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            routine_id INTEGER PRIMARY KEY REFERENCES routines(id) ON DELETE CASCADE,
+            summary TEXT NOT NULL,
+            last_message_id INTEGER NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+    """,
+    "routine_cache": """
+        CREATE TABLE IF NOT EXISTS routine_cache (
+            fingerprint VARCHAR PRIMARY KEY,
+            routine_data TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL
+        )
+    """,
+    "image_analysis_cache": """
+        CREATE TABLE IF NOT EXISTS image_analysis_cache (
+            id SERIAL PRIMARY KEY,
+            context_key VARCHAR NOT NULL,
+            image_hash VARCHAR(16) NOT NULL,
+            result TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            last_used_at TIMESTAMP NOT NULL
+        )
+    """,
+    "routine_jobs": """
+        CREATE TABLE IF NOT EXISTS routine_jobs (
+            id VARCHAR PRIMARY KEY,
+            status VARCHAR NOT NULL,
+            request_data TEXT NOT NULL,
+            routine_id INTEGER,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+    """,
+}
+
+
 async def init_db() -> None:
     """Initialize database tables if they don't exist."""
     try:
         logger.info("Checking database tables...")
-        routines_ok = await table_exists("routines")
-        chat_ok = await table_exists("chat_messages")
+        missing = [name for name in _POSTGRES_TABLES if not await table_exists(name)]
 
-        if routines_ok and chat_ok:
+        if not missing:
             logger.info("All tables already exist — skipping creation")
 
             # One-time cleanup: remove orphaned chat messages left by
@@ -55,33 +120,13 @@ async def init_db() -> None:
 
             return
 
-        logger.info("Creating database tables...")
+        logger.info("Creating database tables: %s", ", ".join(missing))
 
         if not is_sqlite:
-            # Direct SQL for PostgreSQL (avoids event loop issues in serverless)
             try:
                 async with engine.connect() as conn:
-                    if not routines_ok:
-                        await conn.execute(text("""
-                            CREATE TABLE IF NOT EXISTS routines (
-                                id SERIAL PRIMARY KEY,
-                                user_id INTEGER NOT NULL,
-                                routine_name VARCHAR NOT NULL,
-                                routine_data TEXT NOT NULL,
-                                created_at TIMESTAMP NOT NULL,
-                                updated_at TIMESTAMP NOT NULL
-                            )
-                        """))
-                    if not chat_ok:
-                        await conn.execute(text("""
-                            CREATE TABLE IF NOT EXISTS chat_messages (
-                                id SERIAL PRIMARY KEY,
-                                routine_id INTEGER REFERENCES routines(id) ON DELETE CASCADE,
-                                sender VARCHAR NOT NULL,
-                                content TEXT NOT NULL,
-                                timestamp TIMESTAMP NOT NULL
-                            )
-                        """))
+                    for name in missing:
+                        await conn.execute(text(_POSTGRES_TABLES[name]))
                     await conn.commit()
                 logger.info("Tables created with direct SQL (PostgreSQL)")
                 return
@@ -12,9 +12,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import get_settings
 from app.core.logging import setup_logging, get_logger
-from app.db.session import init_db
-from app.api.dependencies import get_routine_generator, get_image_analyzer
-from app.api.routes import health, pages, routines
+from app.db.session import close_db, init_db
+from app.api.dependencies import get_routine_generator, get_image_analyzer, get_job_queue, get_chat_context
+from app.api.routes import health, images, jobs, pages, routines
+from app.services.groq_client import close_groq_client
 from app.websocket.manager import ConnectionManager
 from app.websocket.routes import WebSocketRoutes
 
@@ -42,9 +43,21 @@ async def lifespan(app: FastAPI):
     generator = get_routine_generator()
     logger.info("AI service available: %s", generator.is_configured)
 
+    # Background generation jobs need a persistent DB and a long-lived process
+    job_queue = get_job_queue()
+    if not settings.is_vercel:
+        await job_queue.start()
+
     yield  # Application runs here
 
     logger.info("GymAI shutting down")
+    await job_queue.stop()
+    chat_context = get_chat_context()
+    if chat_context is not None:
+        await chat_context.close()
+    get_image_analyzer().close()
+    await close_groq_client()
+    await close_db()
 
 
 def create_app() -> FastAPI:
@@ -79,6 +92,8 @@ def create_app() -> FastAPI:
     application.include_router(pages.router)
     application.include_router(routines.router)
     application.include_router(routines.delete_router)
+    application.include_router(jobs.router)
+    application.include_router(images.router)
 
     # --- WebSocket ---
     manager = ConnectionManager()
@@ -86,12 +101,18 @@ def create_app() -> FastAPI:
         manager=manager,
         routine_generator=get_routine_generator(),
         image_analyzer=get_image_analyzer(),
+        job_queue=get_job_queue(),
+        chat_context=get_chat_context(),
     )
 
     @application.websocket("/ws/chat/{routine_id}")
     async def websocket_endpoint(websocket: WebSocket, routine_id: int):
         await ws_routes.handle_websocket(websocket, routine_id)
 
+    @application.websocket("/ws/jobs/{job_id}")
+    async def job_websocket_endpoint(websocket: WebSocket, job_id: str):
+        await ws_routes.handle_job_websocket(websocket, job_id)
+
     return application
 
 
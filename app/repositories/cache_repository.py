@@ -0,0 +1,49 @@
+"""
+Repository for the shared routine generation cache.
+Lets every gunicorn worker reuse routines generated by the others.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import select, delete
+
+from app.core.logging import get_logger
+from app.db.session import async_session
+from app.db.models import RoutineCacheModel
+
+logger = get_logger("repositories.cache")
+
+
+async def get_cached_routine(fingerprint: str, ttl_seconds: int) -> Optional[str]:
+    """Return the cached routine JSON for a fingerprint, or None if missing/expired."""
+    cutoff = datetime.now() - timedelta(seconds=ttl_seconds)
+
+    async with async_session() as session:
+        stmt = select(RoutineCacheModel.routine_data).where(
+            RoutineCacheModel.fingerprint == fingerprint,
+            RoutineCacheModel.created_at >= cutoff,
+        )
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+
+async def save_cached_routine(fingerprint: str, routine_data: str, ttl_seconds: int) -> None:
+    """Insert or refresh a cache entry and drop expired ones."""
+    now = datetime.now()
+    cutoff = now - timedelta(seconds=ttl_seconds)
+
+    async with async_session() as session:
+        try:
+            await session.execute(
+                delete(RoutineCacheModel).where(RoutineCacheModel.created_at < cutoff)
+            )
+            await session.merge(
+                RoutineCacheModel(fingerprint=fingerprint, routine_data=routine_data, created_at=now)
+            )
+            await session.commit()
+        except IntegrityError:
+            # Another worker stored the same fingerprint concurrently — keep theirs.
+            await session.rollback()
+            logger.debug("Cache entry %s already stored by another worker", fingerprint[:12])
@@ -3,13 +3,13 @@ Repository for chat message CRUD operations.
 """
 
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from sqlalchemy.sql import select
 
 from app.core.logging import get_logger
 from app.db.session import async_session
-from app.db.models import ChatMessageModel
+from app.db.models import ChatMessageModel, ChatSummaryModel
 
 logger = get_logger("repositories.chat")
 
@@ -42,3 +42,65 @@ async def get_chat_history(routine_id: int) -> List[Dict[str, Any]]:
         messages = result.scalars().all()
 
         return [{"sender": msg.sender, "content": msg.content} for msg in messages]
+
+
+async def get_recent_messages(routine_id: int, after_id: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest ``limit`` messages with ID greater than ``after_id``, in chronological order."""
+    async with async_session() as session:
+        stmt = (
+            select(ChatMessageModel)
+            .where(ChatMessageModel.routine_id == routine_id, ChatMessageModel.id > after_id)
+            .order_by(ChatMessageModel.id.desc())
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        messages = result.scalars().all()
+
+        return [
+            {"id": msg.id, "sender": msg.sender, "content": msg.content}
+            for msg in reversed(messages)
+        ]
+
+
+async def get_messages_between(
+    routine_id: int, after_id: int, before_id: int, limit: int
+) -> List[Dict[str, Any]]:
+    """Oldest ``limit`` messages with ``after_id < id < before_id``, in chronological order."""
+    async with async_session() as session:
+        stmt = (
+            select(ChatMessageModel)
+            .where(
+                ChatMessageModel.routine_id == routine_id,
+                ChatMessageModel.id > after_id,
+                ChatMessageModel.id < before_id,
+            )
+            .order_by(ChatMessageModel.id)
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return [
+            {"id": msg.id, "sender": msg.sender, "content": msg.content}
+            for msg in result.scalars().all()
+        ]
+
+
+async def get_chat_summary(routine_id: int) -> Optional[Dict[str, Any]]:
+    """Rolling summary of older messages (None if nothing was summarized yet)."""
+    async with async_session() as session:
+        row = await session.get(ChatSummaryModel, routine_id)
+        if row is None:
+            return None
+        return {"summary": row.summary, "last_message_id": row.last_message_id}
+
+
+async def save_chat_summary(routine_id: int, summary: str, last_message_id: int) -> None:
+    """Insert or update the rolling summary of a routine's chat."""
+    async with async_session() as session:
+        row = await session.get(ChatSummaryModel, routine_id)
+        if row is None:
+            row = ChatSummaryModel(routine_id=routine_id)
+            session.add(row)
+        row.summary = summary
+        row.last_message_id = last_message_id
+        row.updated_at = datetime.now()
+        await session.commit()
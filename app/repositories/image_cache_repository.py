@@ -0,0 +1,75 @@
+"""
+Repository for the shared image analysis cache.
+Vision results are stored with the perceptual hash of the image; the
+Hamming-distance match itself is done by the service.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy.sql import select, delete, update
+
+from app.core.logging import get_logger
+from app.db.session import async_session
+from app.db.models import ImageAnalysisCacheModel
+
+logger = get_logger("repositories.image_cache")
+
+
+async def get_hashes(context_key: str, limit: int) -> List[Tuple[int, str]]:
+    """(id, image hash) of the most recently used entries for a context."""
+    async with async_session() as session:
+        stmt = (
+            select(ImageAnalysisCacheModel.id, ImageAnalysisCacheModel.image_hash)
+            .where(ImageAnalysisCacheModel.context_key == context_key)
+            .order_by(ImageAnalysisCacheModel.last_used_at.desc())
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return [(row.id, row.image_hash) for row in result]
+
+
+async def use_entry(entry_id: int) -> Optional[str]:
+    """Return an entry's result and mark it as recently used (None if evicted meanwhile)."""
+    async with async_session() as session:
+        result = await session.execute(
+            select(ImageAnalysisCacheModel.result).where(ImageAnalysisCacheModel.id == entry_id)
+        )
+        text = result.scalar_one_or_none()
+        if text is not None:
+            await session.execute(
+                update(ImageAnalysisCacheModel)
+                .where(ImageAnalysisCacheModel.id == entry_id)
+                .values(last_used_at=datetime.now())
+            )
+            await session.commit()
+        return text
+
+
+async def save_entry(context_key: str, image_hash: str, result: str, max_entries: int) -> None:
+    """Store a result (replacing the same image in the same context) and evict the least recently used beyond ``max_entries``."""
+    now = datetime.now()
+
+    async with async_session() as session:
+        await session.execute(
+            delete(ImageAnalysisCacheModel).where(
+                ImageAnalysisCacheModel.context_key == context_key,
+                ImageAnalysisCacheModel.image_hash == image_hash,
+            )
+        )
+        session.add(ImageAnalysisCacheModel(
+            context_key=context_key, image_hash=image_hash, result=result, created_at=now, last_used_at=now,
+        ))
+        await session.flush()
+
+        keep = (
+            select(ImageAnalysisCacheModel.id)
+            .order_by(ImageAnalysisCacheModel.last_used_at.desc(), ImageAnalysisCacheModel.id.desc())
+            .limit(max_entries)
+        )
+        evicted = await session.execute(
+            delete(ImageAnalysisCacheModel).where(ImageAnalysisCacheModel.id.not_in(keep.scalar_subquery()))
+        )
+        await session.commit()
+        if evicted.rowcount:
+            logger.debug("Evicted %d image analysis cache entries", evicted.rowcount)
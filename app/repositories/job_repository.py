@@ -0,0 +1,158 @@
+"""
+Repository for asynchronous routine generation jobs.
+Job state lives in the database so it survives worker restarts and is
+visible to every gunicorn worker.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.sql import select, update, and_
+
+from app.core.logging import get_logger
+from app.db.session import async_session
+from app.db.models import RoutineJobModel
+
+logger = get_logger("repositories.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL_STATUSES = {COMPLETED, FAILED}
+
+MAX_ATTEMPTS_ERROR = "Se superó el número máximo de intentos"
+
+
+def _to_dict(job: RoutineJobModel) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "routine_id": job.routine_id,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+async def create_job(job_id: str, request_data: str) -> None:
+    """Insert a new queued job."""
+    now = datetime.now()
+    async with async_session() as session:
+        session.add(RoutineJobModel(
+            id=job_id,
+            status=QUEUED,
+            request_data=request_data,
+            attempts=0,
+            created_at=now,
+            updated_at=now,
+        ))
+        await session.commit()
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get a job's public state by ID."""
+    async with async_session() as session:
+        job = await session.get(RoutineJobModel, job_id)
+        return _to_dict(job) if job else None
+
+
+async def claim_job(job_id: str) -> Optional[str]:
+    """
+    Atomically move a queued job to running.
+
+    Returns the job's request JSON, or None if another worker already
+    claimed it (or it no longer exists).
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            update(RoutineJobModel)
+            .where(RoutineJobModel.id == job_id, RoutineJobModel.status == QUEUED)
+            .values(status=RUNNING, attempts=RoutineJobModel.attempts + 1, updated_at=datetime.now())
+        )
+        await session.commit()
+        if result.rowcount != 1:
+            return None
+        return await session.scalar(
+            select(RoutineJobModel.request_data).where(RoutineJobModel.id == job_id)
+        )
+
+
+async def finish_job(job_id: str, routine_id: Optional[int] = None, error: Optional[str] = None) -> None:
+    """Mark a job completed (with its routine) or failed (with an error message)."""
+    async with async_session() as session:
+        await session.execute(
+            update(RoutineJobModel)
+            .where(RoutineJobModel.id == job_id)
+            .values(
+                status=FAILED if error else COMPLETED,
+                routine_id=routine_id,
+                error=error,
+                updated_at=datetime.now(),
+            )
+        )
+        await session.commit()
+
+
+async def touch_jobs(job_ids: List[str]) -> None:
+    """Heartbeat: refresh ``updated_at`` of jobs still running in this process."""
+    if not job_ids:
+        return
+    async with async_session() as session:
+        await session.execute(
+            update(RoutineJobModel)
+            .where(RoutineJobModel.id.in_(job_ids), RoutineJobModel.status == RUNNING)
+            .values(updated_at=datetime.now())
+        )
+        await session.commit()
+
+
+async def requeue_jobs(job_ids: List[str], max_attempts: int) -> None:
+    """
+    Put running jobs back in the queue (e.g. on graceful shutdown). Jobs that
+    already used ``max_attempts`` are marked failed instead, so a job that is
+    interrupted on every deploy does not run forever.
+    """
+    if not job_ids:
+        return
+    running = and_(RoutineJobModel.id.in_(job_ids), RoutineJobModel.status == RUNNING)
+    async with async_session() as session:
+        await session.execute(
+            update(RoutineJobModel)
+            .where(running, RoutineJobModel.attempts >= max_attempts)
+            .values(status=FAILED, error=MAX_ATTEMPTS_ERROR, updated_at=datetime.now())
+        )
+        await session.execute(
+            update(RoutineJobModel).where(running).values(status=QUEUED, updated_at=datetime.now())
+        )
+        await session.commit()
+
+
+async def recover_pending_jobs(stale_seconds: int, max_attempts: int) -> List[str]:
+    """
+    Find jobs to (re)run after a restart: queued jobs, plus running jobs not
+    updated for ``stale_seconds`` (their worker died; live workers refresh
+    ``updated_at`` with ``touch_jobs`` while a job runs). Jobs that already used
+    ``max_attempts`` are marked failed instead.
+    """
+    cutoff = datetime.now() - timedelta(seconds=stale_seconds)
+    stale = and_(RoutineJobModel.status == RUNNING, RoutineJobModel.updated_at < cutoff)
+
+    async with async_session() as session:
+        await session.execute(
+            update(RoutineJobModel)
+            .where(stale, RoutineJobModel.attempts >= max_attempts)
+            .values(status=FAILED, error=MAX_ATTEMPTS_ERROR, updated_at=datetime.now())
+        )
+        await session.execute(
+            update(RoutineJobModel).where(stale).values(status=QUEUED, updated_at=datetime.now())
+        )
+        await session.commit()
+
+        result = await session.execute(
+            select(RoutineJobModel.id)
+            .where(RoutineJobModel.status == QUEUED)
+            .order_by(RoutineJobModel.created_at)
+        )
+        return list(result.scalars().all())
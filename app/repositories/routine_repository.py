@@ -5,13 +5,13 @@ Encapsulates all database access for routines.
 
 import json
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from sqlalchemy.sql import select, delete
 
 from app.core.logging import get_logger
 from app.db.session import async_session
-from app.db.models import RoutineModel, ChatMessageModel
+from app.db.models import RoutineModel, ChatMessageModel, ChatSummaryModel
 from app.models.models import Routine
 
 logger = get_logger("repositories.routine")
@@ -79,6 +79,52 @@ async def _create_routine(session, routine, routine_data, now, user_id):
     return routine_model.id
 
 
+async def save_routines_batch(
+    routines: Sequence[Routine],
+    initial_messages: Optional[Sequence[Sequence[Tuple[str, str]]]] = None,
+) -> List[int]:
+    """
+    Insert several new routines (and their initial chat messages) in one transaction.
+
+    Args:
+        routines: Routines to create; each is owned by its ``user_id``.
+        initial_messages: Optional ``(sender, content)`` pairs per routine.
+
+    Returns:
+        The new routine IDs, in input order.
+    """
+    now = datetime.now()
+
+    async with async_session() as session:
+        try:
+            models = [
+                RoutineModel(
+                    user_id=routine.user_id,
+                    routine_name=routine.routine_name,
+                    routine_data=routine.model_dump_json(),
+                    created_at=now,
+                    updated_at=now,
+                )
+                for routine in routines
+            ]
+            session.add_all(models)
+            await session.flush()  # Assigns IDs in a single round of INSERTs
+
+            if initial_messages:
+                session.add_all([
+                    ChatMessageModel(routine_id=model.id, sender=sender, content=content, timestamp=now)
+                    for model, messages in zip(models, initial_messages)
+                    for sender, content in messages
+                ])
+
+            await session.commit()
+            return [model.id for model in models]
+        except Exception as e:
+            await session.rollback()
+            logger.error("Failed to save routine batch (%d routines): %s", len(routines), e, exc_info=True)
+            raise
+
+
 async def get_routine(routine_id: int) -> Optional[Routine]:
     """Get a routine by its ID."""
     async with async_session() as session:
@@ -120,6 +166,9 @@ async def delete_routine(routine_id: int) -> bool:
             await session.execute(
                 delete(ChatMessageModel).where(ChatMessageModel.routine_id == routine_id)
             )
+            await session.execute(
+                delete(ChatSummaryModel).where(ChatSummaryModel.routine_id == routine_id)
+            )
             stmt = delete(RoutineModel).where(RoutineModel.id == routine_id)
             await session.execute(stmt)
             await session.commit()
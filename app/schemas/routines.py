@@ -3,7 +3,7 @@ API request/response schemas for routine endpoints.
 Separated from domain models to follow clean architecture.
 """
 
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -19,6 +19,14 @@ class RoutineRequest(BaseModel):
     time_per_session: str = ""
     health_conditions: str = ""
     user_id: int = 1
+    use_cache: bool = True
+
+
+class BulkRoutineRequest(BaseModel):
+    """Schema for creating many routines at once (gym onboarding)."""
+
+    requests: List[RoutineRequest] = Field(min_length=1)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=32)
 
 
 class ModifyRoutineRequest(BaseModel):
@@ -3,29 +3,84 @@ Service for generating and modifying workout routines using the Groq API
 with Llama models. Follows dependency injection — receives configuration, not global state.
 """
 
+import asyncio
 import json
-import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
-from groq import AsyncGroq
+from pydantic import ValidationError
 
 from app.core.config import get_settings
 from app.core.logging import get_logger
-from app.models.models import Routine
+from app.core.metrics import OFFLINE_FALLBACKS, record_cache_lookup, track_llm_call
+from app.models.models import Day, Routine
 from app.schemas.routines import RoutineRequest
+from app.services.groq_client import get_groq_client
+from app.services.groq_scheduler import Priority, estimate_request_tokens, get_groq_scheduler
+from app.services.json_repair import ExtractedJSON, extract_json, extract_json_object
+from app.services.json_stream import IncrementalJSONParser
+from app.services.local_edits import apply_local_edit
+from app.services.offline_routines import synthesize_routine
+from app.services.routine_cache import RoutineCache, fingerprint_request
+from app.services.routine_patch import apply_routine_patch
+from app.services.semantic_cache import SemanticModificationCache
+from app.services.single_flight import SingleFlight, request_fingerprint
 
 logger = get_logger("services.ai")
 
+DeltaCallback = Callable[[str], Awaitable[None]]
+DayCallback = Callable[[int, Day], Awaitable[None]]
+FallbackCallback = Callable[[], Awaitable[None]]
+
+_VALUE_OPS = {"add", "replace", "test"}
+
+
+def _is_routine(data: dict) -> bool:
+    """Whether a (possibly repaired) response is a complete routine."""
+    try:
+        Routine.model_validate(data)
+        return True
+    except ValidationError:
+        return False
+
+
+def _is_combined_response(data: dict) -> bool:
+    return isinstance(data.get("routine"), dict) and _is_routine(data["routine"])
+
+
+def _is_patch_response(data: dict) -> bool:
+    patch = data.get("patch")
+    if not isinstance(patch, list):
+        return _is_combined_response(data)
+    return all(
+        isinstance(op, dict) and "op" in op and "path" in op
+        and ("value" in op if op["op"] in _VALUE_OPS else True)
+        for op in patch
+    )
+
 
 class RoutineGenerator:
     """Generates and modifies workout routines via Groq AI (Llama models)."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[RoutineCache] = None,
+        semantic_cache: Optional[SemanticModificationCache] = None,
+    ):
         settings = get_settings()
         self._configured = settings.ai_configured
+        self._cache = cache
+        self._semantic_cache = semantic_cache
+        self._single_flight = SingleFlight()
+        self._scheduler = get_groq_scheduler()
+        self._patch_mode = settings.AI_PATCH_MODE_ENABLED
+        self._local_edits = settings.LOCAL_EDITS_ENABLED
+        self._offline_fallback = settings.OFFLINE_FALLBACK_ENABLED
+        self._generation_timeout = settings.AI_GENERATION_TIMEOUT_SECONDS
 
         if self._configured:
             try:
-                self._client = AsyncGroq(api_key=settings.GROQ_API_KEY)
+                self._client = get_groq_client()
                 self._model = settings.GROQ_MODEL
                 logger.info("Groq API configured with model %s", self._model)
             except Exception as e:
@@ -40,6 +95,11 @@ class RoutineGenerator:
     def is_configured(self) -> bool:
         return self._configured
 
+    @property
+    def is_available(self) -> bool:
+        """Whether routines can be generated at all (via Groq or the offline fallback)."""
+        return self._configured or self._offline_fallback
+
     # --- Prompt Builders ---
 
     @staticmethod
@@ -99,7 +159,17 @@ IMPORTANTE:
    - No uses el mismo descanso para todos los ejercicios."""
 
     @staticmethod
-    def _build_modification_prompt(current_routine: Routine, user_request: str) -> str:
+    def _history_section(history: str) -> str:
+        if not history:
+            return ""
+        return f"""Contexto de la conversación (úsalo para entender la solicitud; no repitas cambios ya hechos):
+
+{history}
+
+"""
+
+    @classmethod
+    def _build_modification_prompt(cls, current_routine: Routine, user_request: str, history: str = "") -> str:
         routine_json = current_routine.model_dump_json()
         return f"""Actúa como un entrenador personal. El usuario tiene la siguiente rutina de entrenamiento:
 
@@ -107,39 +177,74 @@ IMPORTANTE:
 {routine_json}
 ```
 
-El usuario ha solicitado: "{user_request}"
+{cls._history_section(history)}El usuario ha solicitado: "{user_request}"
 
 Modifica la rutina según esta solicitud y devuelve SOLO el JSON actualizado con el mismo formato.
 No incluyas campos como "id", "user_id", "created_at" o "updated_at" en la respuesta."""
 
-    # --- JSON Extraction ---
+    @classmethod
+    def _build_combined_prompt(cls, current_routine: Routine, user_request: str, history: str = "") -> str:
+        routine_json = current_routine.model_dump_json(
+            exclude={"id", "user_id", "created_at", "updated_at"}
+        )
+        return f"""Actúa como un entrenador personal. El usuario tiene la siguiente rutina de entrenamiento:
+
+```json
+{routine_json}
+```
+
+{cls._history_section(history)}El usuario ha solicitado: "{user_request}"
+
+Modifica la rutina según esta solicitud y devuelve SOLO un objeto JSON con exactamente estas dos claves, en este orden:
+
+{{
+    "explanation": "Explicación breve, profesional y motivadora de los cambios realizados (texto plano, sin JSON)",
+    "routine": {{ ...la rutina completa actualizada con el mismo formato... }}
+}}
+
+No incluyas campos como "id", "user_id", "created_at" o "updated_at" dentro de "routine"."""
+
+    @classmethod
+    def _build_patch_prompt(cls, current_routine: Routine, user_request: str, history: str = "") -> str:
+        routine_json = current_routine.model_dump_json(
+            exclude={"id", "user_id", "created_at", "updated_at"}
+        )
+        return f"""Actúa como un entrenador personal. El usuario tiene la siguiente rutina de entrenamiento:
+
+```json
+{routine_json}
+```
+
+{cls._history_section(history)}El usuario ha solicitado: "{user_request}"
+
+NO devuelvas la rutina completa. Devuelve SOLO un objeto JSON con exactamente estas dos claves, en este orden:
+
+{{
+    "explanation": "Explicación breve, profesional y motivadora de los cambios realizados (texto plano, sin JSON)",
+    "patch": [ ...operaciones JSON Patch (RFC 6902) sobre la rutina... ]
+}}
+
+Reglas para "patch":
+- Operaciones permitidas: "add", "remove", "replace", "move", "copy".
+- Las rutas usan índices desde 0, por ejemplo "/days/0/exercises/2/name" o "/days/1/focus".
+- Para añadir al final de una lista usa "-", por ejemplo "/days/0/exercises/-".
+- Un ejercicio nuevo debe incluir "name", "sets", "reps", "rest", "rir" y "equipment".
+- Un día nuevo debe incluir "day_name", "focus" y "exercises".
+- Incluye solo las operaciones necesarias; no modifiques lo que el usuario no pidió."""
 
     @staticmethod
-    def _extract_json_from_text(text: str) -> dict:
-        """Extract JSON content from a potentially wrapped text response."""
-        try:
-            # First try direct JSON parse
-            return json.loads(text.strip())
-        except json.JSONDecodeError:
-            pass
+    def _build_explanation_prompt(user_request: str) -> str:
+        return f"""El usuario solicitó: "{user_request}"
 
-        try:
-            # Try extracting from markdown code blocks
-            json_pattern = r"```(?:json)?\s*([\s\S]*?)\s*```"
-            json_matches = re.findall(json_pattern, text)
-            if json_matches:
-                return json.loads(json_matches[0].strip())
-        except Exception as e:
-            logger.error("JSON extraction from code block failed: %s", e)
+Explica brevemente los cambios realizados a la rutina de forma profesional y motivadora.
+No incluyas código JSON, solo texto explicando los cambios principales."""
 
-        # Last resort: find first { to last }
-        try:
-            start = text.index("{")
-            end = text.rindex("}") + 1
-            return json.loads(text[start:end])
-        except Exception as e:
-            logger.error("JSON extraction failed: %s — text: %s", e, text[:200])
-            return {}
+    # --- JSON Extraction ---
+
+    @staticmethod
+    def _extract_json_from_text(text: str, accept: Optional[Callable[[dict], bool]] = None) -> dict:
+        """Extract (and repair if needed) the JSON object in a model response; {} on failure."""
+        return extract_json_object(text, accept)
 
     # --- Public API ---
 
@@ -147,14 +252,172 @@ No incluyas campos como "id", "user_id", "created_at" o "updated_at" en la respu
         if not self._configured:
             raise ValueError("Groq API is not configured. Cannot process AI requests.")
 
-    async def create_initial_routine(self, request: RoutineRequest) -> Routine:
-        """Generate an initial routine from a user request."""
+    async def _complete(
+        self,
+        priority: Priority = Priority.INTERACTIVE,
+        operation: str = "completion",
+        upstream_timeout: Optional[float] = None,
+        **request_kwargs,
+    ):
+        """
+        Non-streaming completion through the shared scheduler, coalesced with
+        identical requests already in flight. ``operation`` labels the call's
+        metrics; ``upstream_timeout`` bounds the Groq call, not the queue wait.
+        """
+        key = request_fingerprint(request_kwargs)
+        record_cache_lookup("single_flight", self._single_flight.is_pending(key))
+
+        async def call():
+            with track_llm_call(operation, request_kwargs["model"]) as metrics:
+                response = await self._scheduler.run(
+                    request_kwargs["model"],
+                    lambda: self._client.chat.completions.create(**request_kwargs),
+                    priority=priority,
+                    tokens=estimate_request_tokens(request_kwargs),
+                    metrics=metrics,
+                    timeout=upstream_timeout,
+                )
+                metrics.record_usage(getattr(response, "usage", None))
+                return response
+
+        return await self._single_flight.do(key, call)
+
+    async def _stream_completion(
+        self,
+        request_kwargs: dict,
+        on_content: Callable[[str], Awaitable[None]],
+        priority: Priority = Priority.INTERACTIVE,
+        operation: str = "completion",
+        upstream_timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Streaming completion through the shared scheduler; awaits ``on_content`` per chunk.
+
+        Failures are retried only until the first content chunk is delivered;
+        after that the error propagates, since ``on_content`` cannot take back
+        what it has already received.
+        """
+        delivered = False
+
+        with track_llm_call(operation, request_kwargs["model"], stream=True) as metrics:
+            async def consume():
+                nonlocal delivered
+                stream = await self._client.chat.completions.create(**request_kwargs, stream=True)
+                async for chunk in stream:
+                    metrics.record_chunk(chunk)
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        delivered = True
+                        await on_content(content)
+
+            await self._scheduler.run(
+                request_kwargs["model"],
+                consume,
+                priority=priority,
+                tokens=estimate_request_tokens(request_kwargs),
+                metrics=metrics,
+                timeout=upstream_timeout,
+                retryable=lambda: not delivered,
+            )
+
+    async def create_initial_routine(
+        self,
+        request: RoutineRequest,
+        on_day: Optional[DayCallback] = None,
+        priority: Priority = Priority.INITIAL,
+        offline_fallback: Optional[bool] = None,
+        on_fallback: Optional[FallbackCallback] = None,
+    ) -> Routine:
+        """
+        Generate an initial routine from a user request (served from cache when possible).
+
+        When ``on_day`` is given the completion is streamed and each day is
+        validated and passed to it as soon as its JSON object is complete.
+        If Groq is not configured, fails or exceeds the generation timeout
+        (which bounds the upstream call, not the wait in the scheduler queue),
+        an ``OfflineRoutine`` is synthesized from the local exercise catalog
+        instead, unless the offline fallback is disabled (``offline_fallback``
+        overrides the setting per call). If Groq fails after streaming some
+        days, ``on_fallback`` is awaited before the catalog days are sent to
+        ``on_day`` from index 0, so clients can discard the days received so
+        far. Batch callers pass ``Priority.BACKGROUND`` so interactive traffic
+        is served first.
+        """
+        fallback = self._offline_fallback if offline_fallback is None else offline_fallback
+        if not self._configured and fallback:
+            return await self._offline_routine(request, on_day, reason="not_configured")
         self._ensure_configured()
+
+        fingerprint = None
+        if self._cache is not None and request.use_cache:
+            fingerprint = fingerprint_request(request, namespace=self._model)
+            cached = await self._cache.get(fingerprint)
+            record_cache_lookup("routine", cached is not None)
+            if cached is not None:
+                cached.user_id = request.user_id
+                logger.info("Routine served from cache: %s", cached.routine_name)
+                if on_day is not None:
+                    for index, day in enumerate(cached.days):
+                        await on_day(index, day)
+                return cached
+
+        streamed_days = 0
+        forward_day = None
+        if on_day is not None:
+            async def forward_day(index: int, day: Day):
+                nonlocal streamed_days
+                streamed_days += 1
+                await on_day(index, day)
+
+        try:
+            routine, repaired = await self._generate_initial_routine(request, forward_day, priority)
+        except (asyncio.TimeoutError, ValueError) as e:
+            if not fallback:
+                if isinstance(e, asyncio.TimeoutError):
+                    raise ValueError("Error generating routine: the AI service timed out")
+                raise
+            if streamed_days and on_fallback is not None:
+                await on_fallback()
+            if isinstance(e, asyncio.TimeoutError):
+                return await self._offline_routine(request, on_day, reason="timeout")
+            return await self._offline_routine(request, on_day, reason="error", detail=str(e))
+
+        if fingerprint is not None and not repaired:
+            await self._cache.set(fingerprint, routine)
+        return routine
+
+    async def _offline_routine(
+        self, request: RoutineRequest, on_day: Optional[DayCallback], reason: str, detail: str = ""
+    ) -> Routine:
+        """Degraded mode: build the routine from the local catalog (not cached)."""
+        logger.warning("Using offline routine synthesizer (%s%s)", reason, f": {detail}" if detail else "")
+        OFFLINE_FALLBACKS.inc(reason=reason)
+        routine = synthesize_routine(request)
+        if on_day is not None:
+            for index, day in enumerate(routine.days):
+                await on_day(index, day)
+        return routine
+
+    async def _generate_initial_routine(
+        self,
+        request: RoutineRequest,
+        on_day: Optional[DayCallback] = None,
+        priority: Priority = Priority.INITIAL,
+    ) -> tuple[Routine, bool]:
+        """
+        Generate an initial routine with Groq.
+
+        Returns the routine and whether it was repaired from a truncated
+        response (such routines are not cached). A routine without exactly
+        ``request.days`` days is an error.
+        """
         prompt = self._build_initial_prompt(request)
 
         try:
             logger.info("Sending initial routine request to Groq (%s)...", self._model)
-            response = await self._client.chat.completions.create(
+            request_kwargs = dict(
                 model=self._model,
                 messages=[
                     {
@@ -167,27 +430,44 @@ No incluyas campos como "id", "user_id", "created_at" o "updated_at" en la respu
                 temperature=0.7,
             )
 
-            raw_text = response.choices[0].message.content
-            routine_dict = self._extract_json_from_text(raw_text)
+            timeout = self._generation_timeout or None
+            if on_day is None:
+                response = await self._complete(priority, "initial_routine", timeout, **request_kwargs)
+                raw_text = response.choices[0].message.content
+            else:
+                raw_text = await self._stream_json(
+                    request_kwargs, on_day=on_day, days_path=("days",), priority=priority,
+                    operation="initial_routine", upstream_timeout=timeout,
+                )
+            def accept(data: dict) -> bool:
+                return _is_routine(data) and (not request.days or len(data["days"]) == request.days)
+
+            routine_dict, repaired = extract_json(raw_text, accept=accept)
             if not routine_dict:
                 raise ValueError("Could not extract valid JSON from AI response")
 
             routine_dict["user_id"] = request.user_id
             routine = Routine.model_validate(routine_dict)
-            logger.info("Routine generated: %s", routine.routine_name)
-            return routine
-
+            if request.days and len(routine.days) != request.days:
+                raise ValueError(f"Expected {request.days} days, got {len(routine.days)}")
+            logger.info("Routine generated: %s%s", routine.routine_name, " (repaired)" if repaired else "")
+            return routine, repaired
+
+        except asyncio.TimeoutError:
+            logger.warning("Groq did not finish the routine within %ss", self._generation_timeout)
+            raise
         except Exception as e:
             logger.error("Failed to create routine: %s", e, exc_info=True)
             raise ValueError(f"Error generating routine: {e}")
 
-    async def modify_routine(self, current_routine: Routine, user_request: str) -> Routine:
+    async def modify_routine(self, current_routine: Routine, user_request: str, history: str = "") -> Routine:
         """Modify an existing routine based on user instructions."""
         self._ensure_configured()
-        prompt = self._build_modification_prompt(current_routine, user_request)
+        prompt = self._build_modification_prompt(current_routine, user_request, history)
 
         try:
-            response = await self._client.chat.completions.create(
+            response = await self._complete(
+                operation="modify_routine",
                 model=self._model,
                 messages=[
                     {
@@ -201,7 +481,7 @@ No incluyas campos como "id", "user_id", "created_at" o "updated_at" en la respu
             )
 
             raw_text = response.choices[0].message.content
-            routine_dict = self._extract_json_from_text(raw_text)
+            routine_dict = self._extract_json_from_text(raw_text, accept=_is_routine)
 
             if not routine_dict:
                 raise ValueError("Could not extract valid JSON")
@@ -219,14 +499,11 @@ No incluyas campos como "id", "user_id", "created_at" o "updated_at" en la respu
     ) -> str:
         """Generate a natural-language explanation of the changes made."""
         self._ensure_configured()
-
-        prompt = f"""El usuario solicitó: "{user_request}"
-
-Explica brevemente los cambios realizados a la rutina de forma profesional y motivadora.
-No incluyas código JSON, solo texto explicando los cambios principales."""
+        prompt = self._build_explanation_prompt(user_request)
 
         try:
-            response = await self._client.chat.completions.create(
+            response = await self._complete(
+                operation="explain_changes",
                 model=self._model,
                 messages=[
                     {
@@ -242,3 +519,323 @@ No incluyas código JSON, solo texto explicando los cambios principales."""
         except Exception as e:
             logger.error("Failed to generate explanation: %s", e)
             raise ValueError(f"Error generating explanation: {e}")
+
+    async def stream_routine_explanation(self, user_request: str) -> AsyncIterator[str]:
+        """
+        Stream the explanation of the requested changes token by token.
+
+        The explanation prompt only depends on the user request, so callers can
+        consume this stream while ``modify_routine`` is still running.
+        """
+        self._ensure_configured()
+        prompt = self._build_explanation_prompt(user_request)
+
+        request_kwargs = dict(
+            model=self._model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Eres un entrenador personal profesional y motivador. Responde en español de forma clara y concisa."
+                },
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+        )
+
+        try:
+            with track_llm_call("explain_changes", self._model, stream=True) as metrics:
+                queued_at = time.monotonic()
+                async with self._scheduler.slot(
+                    self._model, Priority.INTERACTIVE, estimate_request_tokens(request_kwargs)
+                ):
+                    metrics.slot_granted(time.monotonic() - queued_at)
+                    stream = await self._client.chat.completions.create(**request_kwargs, stream=True)
+                    async for chunk in stream:
+                        metrics.record_chunk(chunk)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            yield delta
+
+        except Exception as e:
+            logger.error("Failed to stream explanation: %s", e)
+            raise ValueError(f"Error generating explanation: {e}")
+
+    async def summarize_chat(self, previous_summary: str, transcript: str, max_words: int) -> str:
+        """
+        Fold new chat messages into a routine's conversation summary.
+
+        Runs at background priority: summaries are never on the critical path.
+        """
+        self._ensure_configured()
+        previous = previous_summary or "(sin resumen previo)"
+        prompt = f"""Resumen actual de la conversación entre un usuario y su entrenador sobre su rutina:
+{previous}
+
+Mensajes nuevos:
+{transcript}
+
+Actualiza el resumen incorporando los mensajes nuevos. Conserva las preferencias, lesiones,
+objetivos y cambios pedidos por el usuario; omite saludos y detalles irrelevantes.
+Responde SOLO con el resumen en español, en viñetas, con un máximo de {max_words} palabras."""
+
+        response = await self._complete(
+            Priority.BACKGROUND,
+            "history_summary",
+            model=self._model,
+            messages=[
+                {"role": "system", "content": "Eres un asistente que resume conversaciones de forma fiel y concisa."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.2,
+            max_tokens=max_words * 2,
+        )
+        return response.choices[0].message.content.strip()
+
+    async def modify_and_explain(
+        self,
+        current_routine: Routine,
+        user_request: str,
+        on_delta: Optional[DeltaCallback] = None,
+        on_day: Optional[DayCallback] = None,
+        history: str = "",
+    ) -> tuple[Routine, str]:
+        """
+        Modify a routine and explain the changes with a single completion.
+
+        In patch mode the model only returns JSON Patch operations, which are
+        applied locally; an invalid patch falls back to a full regeneration,
+        and an unusable full response to the two-call path (``modify_routine``
+        + explanation). When ``on_delta`` is given the completion is streamed
+        and every new piece of the explanation is awaited through it; when the
+        model regenerates the full routine, ``on_day`` receives each day as
+        soon as it is complete.
+
+        Mechanical edits (rest, sets, reps, removing a day, swapping an
+        exercise) are applied locally without calling Groq at all, and
+        rephrasings of an earlier request on the same routine are answered
+        from the semantic cache. ``history`` is the rendered chat context
+        (see ``ChatContextAssembler``) added to the Groq prompts.
+        """
+        local = None
+        if self._local_edits:
+            local = apply_local_edit(current_routine, user_request)
+            record_cache_lookup("local_edit", local is not None)
+        if local is None and self._semantic_cache is not None:
+            local = self._semantic_cache.get(current_routine, user_request)
+            record_cache_lookup("semantic", local is not None)
+        if local is not None:
+            if on_delta:
+                await on_delta(local[1])
+            return local
+
+        result = await self._modify_and_explain_remote(current_routine, user_request, on_delta, on_day, history)
+        if self._semantic_cache is not None:
+            self._semantic_cache.set(current_routine, user_request, *result)
+        return result
+
+    async def _modify_and_explain_remote(
+        self,
+        current_routine: Routine,
+        user_request: str,
+        on_delta: Optional[DeltaCallback],
+        on_day: Optional[DayCallback],
+        history: str = "",
+    ) -> tuple[Routine, str]:
+        """Groq part of ``modify_and_explain``: patch, combined, then two-call attempts."""
+        self._ensure_configured()
+        streamed_any = False
+
+        async def forward(delta: str):
+            nonlocal streamed_any
+            streamed_any = True
+            await on_delta(delta)
+
+        attempts = [self._request_combined]
+        if self._patch_mode:
+            attempts.insert(0, self._request_patch)
+
+        for attempt in attempts:
+            # Deltas already shown to the client are replaced by the final frame,
+            # so only stream a fallback explanation if nothing was sent yet.
+            callback = forward if on_delta and not streamed_any else None
+            try:
+                result = await attempt(current_routine, user_request, callback, on_day, history)
+                if result is not None:
+                    return result
+            except Exception as e:
+                logger.warning("%s failed, falling back: %s", attempt.__name__, e)
+
+        return await self._modify_and_explain_two_calls(
+            current_routine, user_request, None if streamed_any else on_delta, history
+        )
+
+    async def _json_completion(
+        self,
+        prompt: str,
+        on_delta: Optional[DeltaCallback],
+        on_day: Optional[DayCallback] = None,
+        operation: str = "completion",
+        accept: Optional[Callable[[dict], bool]] = None,
+    ) -> ExtractedJSON:
+        """json_object completion whose "explanation" and routine days are streamed when requested."""
+        request_kwargs = dict(
+            model=self._model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Eres un entrenador personal profesional y motivador. Responde ÚNICAMENTE con JSON válido, sin texto adicional."
+                },
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.7,
+        )
+
+        if on_delta is None and on_day is None:
+            response = await self._complete(operation=operation, **request_kwargs)
+            raw_text = response.choices[0].message.content
+        else:
+            raw_text = await self._stream_json(
+                request_kwargs, on_delta=on_delta, on_day=on_day, days_path=("routine", "days"),
+                operation=operation,
+            )
+
+        return extract_json(raw_text, accept)
+
+    async def _stream_json(
+        self,
+        request_kwargs: dict,
+        on_delta: Optional[DeltaCallback] = None,
+        on_day: Optional[DayCallback] = None,
+        days_path: tuple = ("days",),
+        priority: Priority = Priority.INTERACTIVE,
+        operation: str = "completion",
+        upstream_timeout: Optional[float] = None,
+    ) -> str:
+        """
+        Stream a JSON completion through the incremental parser.
+
+        Forwards "explanation" text deltas and every completed day object
+        (validated on its own) as they arrive; returns the full raw text.
+        """
+        parser = IncrementalJSONParser(
+            value_paths=[days_path + ("*",)] if on_day else (),
+            string_paths=[("explanation",)] if on_delta else (),
+        )
+
+        async def on_content(content: str):
+            for event in parser.feed(content):
+                if event.kind == "string_delta":
+                    await on_delta(event.value)
+                    continue
+                try:
+                    day = Day.model_validate(event.value)
+                except ValidationError as e:
+                    logger.warning("Streamed day %s is invalid, skipping: %s", event.path[-1], e)
+                    continue
+                await on_day(event.path[-1], day)
+
+        await self._stream_completion(request_kwargs, on_content, priority, operation, upstream_timeout)
+        return parser.buffer
+
+    async def _finish_explanation(
+        self, data: dict, current_routine: Routine, modified_routine: Routine, user_request: str
+    ) -> tuple[Routine, str]:
+        explanation = data.get("explanation")
+        if not isinstance(explanation, str) or not explanation.strip():
+            explanation = await self.explain_routine_changes(
+                current_routine, modified_routine, user_request
+            )
+        return modified_routine, explanation.strip()
+
+    async def _request_patch(
+        self,
+        current_routine: Routine,
+        user_request: str,
+        on_delta: Optional[DeltaCallback],
+        on_day: Optional[DayCallback] = None,
+        history: str = "",
+    ) -> Optional[tuple[Routine, str]]:
+        """Single completion returning JSON Patch operations plus the explanation."""
+        prompt = self._build_patch_prompt(current_routine, user_request, history)
+        data, repaired = await self._json_completion(
+            prompt, on_delta, on_day, operation="modify_patch", accept=_is_patch_response
+        )
+        if repaired:
+            # Trimmed operations would no longer match the explanation
+            logger.warning("Patch response was truncated, falling back")
+            return None
+
+        if "patch" not in data and isinstance(data.get("routine"), dict):
+            # The model answered with the full routine instead — still usable.
+            return await self._routine_from_combined(data, current_routine, user_request)
+        if "patch" not in data:
+            logger.warning("Patch response has no patch operations")
+            return None
+
+        modified_routine = apply_routine_patch(current_routine, data["patch"])
+        logger.info("Applied %d patch operations to routine %s", len(data["patch"]), current_routine.id)
+        return await self._finish_explanation(data, current_routine, modified_routine, user_request)
+
+    async def _request_combined(
+        self,
+        current_routine: Routine,
+        user_request: str,
+        on_delta: Optional[DeltaCallback],
+        on_day: Optional[DayCallback] = None,
+        history: str = "",
+    ) -> Optional[tuple[Routine, str]]:
+        """Single json_object completion returning both the full routine and explanation."""
+        prompt = self._build_combined_prompt(current_routine, user_request, history)
+        data, repaired = await self._json_completion(
+            prompt, on_delta, on_day, operation="modify_combined", accept=_is_combined_response
+        )
+        if repaired:
+            logger.warning("Combined response was truncated, falling back")
+            return None
+        return await self._routine_from_combined(data, current_routine, user_request)
+
+    async def _routine_from_combined(
+        self, data: dict, current_routine: Routine, user_request: str
+    ) -> Optional[tuple[Routine, str]]:
+        routine_dict = data.get("routine")
+        if not isinstance(routine_dict, dict):
+            logger.warning("Combined response has no routine object")
+            return None
+
+        routine_dict["id"] = current_routine.id
+        routine_dict["user_id"] = current_routine.user_id
+        modified_routine = Routine.model_validate(routine_dict)
+        return await self._finish_explanation(data, current_routine, modified_routine, user_request)
+
+    async def _modify_and_explain_two_calls(
+        self,
+        current_routine: Routine,
+        user_request: str,
+        on_delta: Optional[DeltaCallback],
+        history: str = "",
+    ) -> tuple[Routine, str]:
+        """Legacy path: full modification and explanation as two separate calls."""
+        if on_delta is None:
+            modified_routine = await self.modify_routine(current_routine, user_request, history)
+            explanation = await self.explain_routine_changes(
+                current_routine, modified_routine, user_request
+            )
+            return modified_routine, explanation
+
+        # The explanation prompt does not depend on the new routine, so it
+        # can stream while the modification is still being generated.
+        modify_task = asyncio.create_task(self.modify_routine(current_routine, user_request, history))
+        try:
+            parts = []
+            async for delta in self.stream_routine_explanation(user_request):
+                parts.append(delta)
+                await on_delta(delta)
+            modified_routine = await modify_task
+        finally:
+            if not modify_task.done():
+                modify_task.cancel()
+
+        return modified_routine, "".join(parts).strip()
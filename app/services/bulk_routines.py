@@ -0,0 +1,114 @@
+"""
+Bulk routine generation for gym onboarding batches.
+
+Requests fan out through the shared ``RoutineGenerator`` with bounded
+concurrency (at background priority, so interactive users keep precedence in
+the Groq scheduler). The offline catalog fallback is disabled: a batch item
+Groq cannot generate is reported as an error, never as a catalog routine
+passed off as ``"ok"``. Finished routines are persisted in batched inserts and a
+status event is yielded per item as soon as its batch is saved.
+"""
+
+import asyncio
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.models.models import Routine
+from app.repositories import routine_repository
+from app.schemas.routines import RoutineRequest
+from app.services.ai_service import RoutineGenerator
+from app.services.groq_scheduler import Priority
+
+logger = get_logger("services.bulk_routines")
+
+
+def initial_chat_messages(request: RoutineRequest) -> List[Tuple[str, str]]:
+    """The (sender, content) messages that open a new routine's chat."""
+    if request.days:
+        user_msg = f"Quiero una rutina para {request.goals} con una intensidad de {request.days} días a la semana."
+    else:
+        user_msg = request.goals
+    return [
+        ("user", user_msg),
+        ("assistant", "¡He creado una rutina personalizada para ti! Puedes verla en el panel principal."),
+    ]
+
+
+async def generate_routines_bulk(
+    generator: RoutineGenerator,
+    requests: Sequence[RoutineRequest],
+    concurrency: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[dict]:
+    """
+    Generate and persist routines, yielding one status dict per request.
+
+    Item events (in completion order) look like
+    ``{"type": "item", "index": i, "status": "ok", "routine_id": .., "routine_name": ..}``
+    or ``{"type": "item", "index": i, "status": "error", "error": ..}``; a final
+    ``{"type": "summary"}`` event carries the totals.
+    """
+    settings = get_settings()
+    concurrency = concurrency or settings.BULK_CONCURRENCY or settings.GROQ_MAX_CONCURRENCY
+    batch_size = batch_size or settings.BULK_BATCH_SIZE
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate(index: int, request: RoutineRequest) -> Tuple[int, Optional[Routine], Optional[str]]:
+        async with semaphore:
+            try:
+                routine = await generator.create_initial_routine(
+                    request, priority=Priority.BACKGROUND, offline_fallback=False
+                )
+                return index, routine, None
+            except ValueError as e:
+                return index, None, str(e)
+            except Exception as e:
+                logger.error("Bulk item %d failed: %s", index, e, exc_info=True)
+                return index, None, "Error interno al generar la rutina"
+
+    tasks = [asyncio.create_task(generate(i, r)) for i, r in enumerate(requests)]
+    pending: List[Tuple[int, Routine]] = []
+    succeeded = failed = 0
+
+    async def flush() -> List[dict]:
+        nonlocal succeeded, failed
+        batch, pending[:] = list(pending), []
+        try:
+            ids = await routine_repository.save_routines_batch(
+                [routine for _, routine in batch],
+                [initial_chat_messages(requests[index]) for index, _ in batch],
+            )
+        except Exception:
+            failed += len(batch)
+            return [
+                {"type": "item", "index": index, "status": "error", "error": "Error al guardar la rutina"}
+                for index, _ in batch
+            ]
+        succeeded += len(batch)
+        return [
+            {"type": "item", "index": index, "status": "ok", "routine_id": routine_id,
+             "routine_name": routine.routine_name}
+            for (index, routine), routine_id in zip(batch, ids)
+        ]
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, routine, error = await next_done
+            if routine is None:
+                failed += 1
+                yield {"type": "item", "index": index, "status": "error", "error": error}
+                continue
+            pending.append((index, routine))
+            if len(pending) >= batch_size:
+                for event in await flush():
+                    yield event
+        if pending:
+            for event in await flush():
+                yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    logger.info("Bulk generation finished: %d ok, %d failed", succeeded, failed)
+    yield {"type": "summary", "total": len(requests), "succeeded": succeeded, "failed": failed}
@@ -0,0 +1,200 @@
+"""
+Token-budgeted chat history for routine modification prompts.
+
+The prompt gets the routine's rolling summary plus the most recent messages
+that fit in a fixed token budget (estimated locally), so its size stays flat
+however long the conversation runs. Messages that fall out of the window are
+folded into the summary incrementally in the background: each pass only reads
+the messages after the last one already summarized, and the summary is stored
+per routine. Summaries are written by Groq at background priority when
+available, with a local extractive fallback.
+"""
+
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from app.core.logging import get_logger
+from app.repositories import chat_repository
+
+logger = get_logger("services.chat_context")
+
+# (previous summary, transcript of new messages, max words) -> new summary
+Summarizer = Callable[[str, str, int], Awaitable[str]]
+
+# Role/formatting tokens added per message in the prompt.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+_SPEAKERS = {"user": "Usuario", "assistant": "Entrenador"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Local estimate: ~4 characters per token within words, 1 per punctuation mark."""
+    return sum(-(-len(piece) // 4) for piece in _PIECES.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` at a word boundary so it fits in ``max_tokens``."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words, kept, used = text.split(), [], 0
+    for word in words:
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens - 1:
+            break
+        kept.append(word)
+        used += cost
+    return " ".join(kept) + "…"
+
+
+def format_transcript(messages: List[Dict[str, Any]], max_message_tokens: Optional[int] = None) -> str:
+    lines = []
+    for message in messages:
+        content = " ".join(message["content"].split())
+        if max_message_tokens:
+            content = truncate_to_tokens(content, max_message_tokens)
+        lines.append(f"- {_SPEAKERS.get(message['sender'], message['sender'])}: {content}")
+    return "\n".join(lines)
+
+
+def local_summary(previous: str, messages: List[Dict[str, Any]], max_tokens: int) -> str:
+    """Extractive fallback: one line per user request, oldest lines dropped first."""
+    lines = [line for line in previous.splitlines() if line.strip()]
+    for message in messages:
+        if message["sender"] == "user":
+            lines.append(f"- Pidió: {truncate_to_tokens(' '.join(message['content'].split()), 40)}")
+    kept: List[str] = []
+    used = 0
+    for line in reversed(lines):
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(reversed(kept))
+
+
+class ChatContext(NamedTuple):
+    summary: str
+    messages: List[Dict[str, Any]]
+    tokens: int
+    max_message_tokens: Optional[int] = None
+
+    def render(self) -> str:
+        """Prompt section with the summary and recent turns ('' when there is no history)."""
+        parts = []
+        if self.summary:
+            parts.append(f"Resumen de la conversación anterior:\n{self.summary}")
+        if self.messages:
+            parts.append("Mensajes recientes:\n" + format_transcript(self.messages, self.max_message_tokens))
+        return "\n\n".join(parts)
+
+
+class ChatContextAssembler:
+    """Builds the history section of modification prompts and maintains the summaries."""
+
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        token_budget: int = 600,
+        summary_tokens: int = 200,
+        max_message_tokens: int = 150,
+        min_summary_messages: int = 4,
+        chunk_messages: int = 40,
+        fetch_limit: int = 50,
+    ):
+        self._summarizer = summarizer
+        self._token_budget = token_budget
+        self._summary_tokens = summary_tokens
+        self._max_message_tokens = max_message_tokens
+        self._min_summary_messages = min_summary_messages
+        self._chunk_messages = chunk_messages
+        self._fetch_limit = fetch_limit
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def _message_tokens(self, message: Dict[str, Any]) -> int:
+        tokens = min(estimate_tokens(message["content"]), self._max_message_tokens + 1)
+        return tokens + MESSAGE_OVERHEAD_TOKENS
+
+    async def build(self, routine_id: int) -> ChatContext:
+        """
+        Summary + newest messages within the token budget.
+
+        Older unsummarized messages beyond the window schedule a background
+        summary update once there are enough of them.
+        """
+        state = await chat_repository.get_chat_summary(routine_id)
+        summary, covered = (state["summary"], state["last_message_id"]) if state else ("", 0)
+        recent = await chat_repository.get_recent_messages(routine_id, after_id=covered, limit=self._fetch_limit)
+
+        used = estimate_tokens(summary)
+        selected: List[Dict[str, Any]] = []
+        for message in reversed(recent):
+            cost = self._message_tokens(message)
+            if used + cost > self._token_budget:
+                break
+            selected.append(message)
+            used += cost
+        selected.reverse()
+
+        overflow = len(recent) - len(selected)
+        if overflow >= self._min_summary_messages or (overflow and len(recent) == self._fetch_limit):
+            boundary = selected[0]["id"] if selected else recent[-1]["id"] + 1
+            self._schedule_summary(routine_id, boundary)
+
+        return ChatContext(summary, selected, used, self._max_message_tokens)
+
+    # --- Summaries ---
+
+    def _schedule_summary(self, routine_id: int, before_id: int) -> None:
+        task = self._tasks.get(routine_id)
+        if task is not None and not task.done():
+            return  # One update per routine at a time; the next build catches up
+        task = asyncio.create_task(self._update_summary(routine_id, before_id))
+        self._tasks[routine_id] = task
+        task.add_done_callback(lambda t: self._forget(routine_id, t))
+
+    def _forget(self, routine_id: int, task: asyncio.Task) -> None:
+        if self._tasks.get(routine_id) is task:
+            del self._tasks[routine_id]
+
+    async def _update_summary(self, routine_id: int, before_id: int) -> None:
+        """Fold every unsummarized message older than ``before_id`` into the summary."""
+        try:
+            state = await chat_repository.get_chat_summary(routine_id)
+            summary, covered = (state["summary"], state["last_message_id"]) if state else ("", 0)
+            while True:
+                chunk = await chat_repository.get_messages_between(
+                    routine_id, covered, before_id, self._chunk_messages
+                )
+                if not chunk:
+                    return
+                summary = await self._fold(summary, chunk)
+                covered = chunk[-1]["id"]
+                await chat_repository.save_chat_summary(routine_id, summary, covered)
+                logger.info("Chat summary for routine %s updated through message %s", routine_id, covered)
+        except Exception as e:
+            logger.warning("Chat summary update failed for routine %s: %s", routine_id, e)
+
+    async def _fold(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        if self._summarizer is not None:
+            transcript = format_transcript(messages, self._max_message_tokens)
+            try:
+                text = await self._summarizer(summary, transcript, self._summary_tokens * 3 // 4)
+                if text.strip():
+                    return truncate_to_tokens(text.strip(), self._summary_tokens)
+            except Exception as e:
+                logger.warning("Summarizer failed, using local summary: %s", e)
+        return local_summary(summary, messages, self._summary_tokens)
+
+    async def drain(self) -> None:
+        """Wait for pending summary updates."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def close(self) -> None:
+        """Cancel pending summary updates (they are redone on the next build)."""
+        for task in self._tasks.values():
+            task.cancel()
+        await self.drain()
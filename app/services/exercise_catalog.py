@@ -0,0 +1,277 @@
+"""
+Local exercise catalog with inverted indexes.
+
+Each exercise records its primary muscle, movement pattern, required
+equipment and class (heavy compound / compound / isolation). Indexes by
+equipment, muscle and pattern answer "what can this user do" and "what can
+replace this exercise" without an LLM; the offline routine synthesizer is
+built on top of them.
+"""
+
+import unicodedata
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# Exercise classes (same buckets as the rest rules in the initial prompt)
+HEAVY = "principal"
+COMPOUND = "compuesto"
+ISOLATION = "aislamiento"
+
+BODYWEIGHT = "peso corporal"
+ALL_EQUIPMENT: FrozenSet[str] = frozenset({
+    "barra", "mancuernas", "banco", "maquina", "polea", "barra de dominadas",
+    "paralelas", "bandas", "kettlebell", BODYWEIGHT,
+})
+
+_EQUIPMENT_LABELS = {
+    "barra": "barra",
+    "mancuernas": "mancuernas",
+    "banco": "banco",
+    "maquina": "máquina",
+    "polea": "polea",
+    "barra de dominadas": "barra de dominadas",
+    "paralelas": "paralelas",
+    "bandas": "bandas elásticas",
+    "kettlebell": "kettlebell",
+    BODYWEIGHT: "peso corporal",
+}
+
+
+class CatalogExercise(NamedTuple):
+    name: str
+    muscle: str
+    pattern: str
+    equipment: Tuple[str, ...]  # all required
+    kind: str
+    joint_stress: Tuple[str, ...] = ()
+
+    @property
+    def equipment_label(self) -> str:
+        labels = [_EQUIPMENT_LABELS[e] for e in self.equipment]
+        text = labels[0] if len(labels) == 1 else ", ".join(labels[:-1]) + " y " + labels[-1]
+        return text[0].upper() + text[1:]
+
+
+_EXERCISES: List[CatalogExercise] = [
+    # Chest
+    CatalogExercise("Press de banca", "pecho", "empuje horizontal", ("barra", "banco"), HEAVY, ("hombro",)),
+    CatalogExercise("Press de banca con mancuernas", "pecho", "empuje horizontal", ("mancuernas", "banco"), COMPOUND),
+    CatalogExercise("Press inclinado con barra", "pecho", "empuje horizontal", ("barra", "banco"), COMPOUND, ("hombro",)),
+    CatalogExercise("Press inclinado con mancuernas", "pecho", "empuje horizontal", ("mancuernas", "banco"), COMPOUND),
+    CatalogExercise("Press de pecho en máquina", "pecho", "empuje horizontal", ("maquina",), COMPOUND),
+    CatalogExercise("Fondos en paralelas", "pecho", "empuje horizontal", ("paralelas",), COMPOUND, ("hombro",)),
+    CatalogExercise("Flexiones", "pecho", "empuje horizontal", (BODYWEIGHT,), COMPOUND),
+    CatalogExercise("Flexiones declinadas", "pecho", "empuje horizontal", (BODYWEIGHT,), COMPOUND, ("hombro",)),
+    CatalogExercise("Aperturas con mancuernas", "pecho", "aislamiento", ("mancuernas", "banco"), ISOLATION, ("hombro",)),
+    CatalogExercise("Cruces en polea", "pecho", "aislamiento", ("polea",), ISOLATION),
+    CatalogExercise("Aperturas con bandas", "pecho", "aislamiento", ("bandas",), ISOLATION),
+    # Back
+    CatalogExercise("Peso muerto", "espalda", "bisagra", ("barra",), HEAVY, ("espalda baja",)),
+    CatalogExercise("Dominadas", "espalda", "tiron vertical", ("barra de dominadas",), COMPOUND),
+    CatalogExercise("Jalón al pecho", "espalda", "tiron vertical", ("polea",), COMPOUND),
+    CatalogExercise("Jalón con banda", "espalda", "tiron vertical", ("bandas",), COMPOUND),
+    CatalogExercise("Remo con barra", "espalda", "tiron horizontal", ("barra",), COMPOUND, ("espalda baja",)),
+    CatalogExercise("Remo con mancuerna", "espalda", "tiron horizontal", ("mancuernas", "banco"), COMPOUND),
+    CatalogExercise("Remo en polea baja", "espalda", "tiron horizontal", ("polea",), COMPOUND),
+    CatalogExercise("Remo en máquina", "espalda", "tiron horizontal", ("maquina",), COMPOUND),
+    CatalogExercise("Remo con banda", "espalda", "tiron horizontal", ("bandas",), COMPOUND),
+    CatalogExercise("Remo invertido", "espalda", "tiron horizontal", (BODYWEIGHT,), COMPOUND),
+    CatalogExercise("Pullover en polea", "espalda", "aislamiento", ("polea",), ISOLATION),
+    CatalogExercise("Superman", "espalda", "aislamiento", (BODYWEIGHT,), ISOLATION),
+    CatalogExercise("Pullover con mancuerna", "espalda", "aislamiento", ("mancuernas", "banco"), ISOLATION, ("hombro",)),
+    # Shoulders
+    CatalogExercise("Press militar", "hombros", "empuje vertical", ("barra",), HEAVY, ("hombro", "espalda baja")),
+    CatalogExercise("Press de hombros con mancuernas", "hombros", "empuje vertical", ("mancuernas",), COMPOUND, ("hombro",)),
+    CatalogExercise("Press de hombros en máquina", "hombros", "empuje vertical", ("maquina",), COMPOUND, ("hombro",)),
+    CatalogExercise("Press de hombros con kettlebell", "hombros", "empuje vertical", ("kettlebell",), COMPOUND, ("hombro",)),
+    CatalogExercise("Flexiones pica", "hombros", "empuje vertical", (BODYWEIGHT,), COMPOUND, ("hombro",)),
+    CatalogExercise("Elevaciones laterales", "hombros", "aislamiento", ("mancuernas",), ISOLATION),
+    CatalogExercise("Elevaciones laterales en polea", "hombros", "aislamiento", ("polea",), ISOLATION),
+    CatalogExercise("Elevaciones laterales con banda", "hombros", "aislamiento", ("bandas",), ISOLATION),
+    CatalogExercise("Face pull", "hombros", "aislamiento", ("polea",), ISOLATION),
+    CatalogExercise("Pájaros con mancuernas", "hombros", "aislamiento", ("mancuernas",), ISOLATION),
+    # Legs
+    CatalogExercise("Sentadilla", "cuadriceps", "sentadilla", ("barra",), HEAVY, ("rodilla", "espalda baja")),
+    CatalogExercise("Prensa de piernas", "cuadriceps", "sentadilla", ("maquina",), COMPOUND, ("rodilla",)),
+    CatalogExercise("Sentadilla goblet", "cuadriceps", "sentadilla", ("mancuernas",), COMPOUND, ("rodilla",)),
+    CatalogExercise("Sentadilla goblet con kettlebell", "cuadriceps", "sentadilla", ("kettlebell",), COMPOUND, ("rodilla",)),
+    CatalogExercise("Sentadilla con peso corporal", "cuadriceps", "sentadilla", (BODYWEIGHT,), COMPOUND, ("rodilla",)),
+    CatalogExercise("Sentadilla búlgara", "cuadriceps", "zancada", ("mancuernas", "banco"), COMPOUND, ("rodilla",)),
+    CatalogExercise("Zancadas con mancuernas", "cuadriceps", "zancada", ("mancuernas",), COMPOUND, ("rodilla",)),
+    CatalogExercise("Zancadas", "cuadriceps", "zancada", (BODYWEIGHT,), COMPOUND, ("rodilla",)),
+    CatalogExercise("Extensiones de cuádriceps", "cuadriceps", "aislamiento", ("maquina",), ISOLATION, ("rodilla",)),
+    CatalogExercise("Peso muerto rumano", "isquiotibiales", "bisagra", ("barra",), COMPOUND, ("espalda baja",)),
+    CatalogExercise("Peso muerto rumano con mancuernas", "isquiotibiales", "bisagra", ("mancuernas",), COMPOUND, ("espalda baja",)),
+    CatalogExercise("Hip thrust", "gluteos", "bisagra", ("barra", "banco"), COMPOUND),
+    CatalogExercise("Swing con kettlebell", "gluteos", "bisagra", ("kettlebell",), COMPOUND, ("espalda baja",)),
+    CatalogExercise("Puente de glúteos", "gluteos", "bisagra", (BODYWEIGHT,), COMPOUND),
+    CatalogExercise("Curl femoral", "isquiotibiales", "aislamiento", ("maquina",), ISOLATION),
+    CatalogExercise("Curl femoral con banda", "isquiotibiales", "aislamiento", ("bandas",), ISOLATION),
+    CatalogExercise("Patada de glúteo en polea", "gluteos", "aislamiento", ("polea",), ISOLATION),
+    CatalogExercise("Elevación de talones en máquina", "gemelos", "aislamiento", ("maquina",), ISOLATION),
+    CatalogExercise("Elevación de talones", "gemelos", "aislamiento", (BODYWEIGHT,), ISOLATION),
+    # Arms
+    CatalogExercise("Curl de bíceps con barra", "biceps", "aislamiento", ("barra",), ISOLATION),
+    CatalogExercise("Curl de bíceps", "biceps", "aislamiento", ("mancuernas",), ISOLATION),
+    CatalogExercise("Curl martillo", "biceps", "aislamiento", ("mancuernas",), ISOLATION),
+    CatalogExercise("Curl en polea", "biceps", "aislamiento", ("polea",), ISOLATION),
+    CatalogExercise("Curl con banda", "biceps", "aislamiento", ("bandas",), ISOLATION),
+    CatalogExercise("Press francés", "triceps", "aislamiento", ("barra", "banco"), ISOLATION, ("codo",)),
+    CatalogExercise("Extensiones de tríceps en polea", "triceps", "aislamiento", ("polea",), ISOLATION),
+    CatalogExercise("Extensión de tríceps sobre la cabeza", "triceps", "aislamiento", ("mancuernas",), ISOLATION, ("codo",)),
+    CatalogExercise("Extensiones de tríceps con banda", "triceps", "aislamiento", ("bandas",), ISOLATION),
+    CatalogExercise("Flexiones diamante", "triceps", "aislamiento", (BODYWEIGHT,), ISOLATION),
+    CatalogExercise("Fondos en banco", "triceps", "aislamiento", ("banco",), ISOLATION, ("hombro",)),
+    # Core
+    CatalogExercise("Plancha", "core", "aislamiento", (BODYWEIGHT,), ISOLATION),
+    CatalogExercise("Elevaciones de piernas colgado", "core", "aislamiento", ("barra de dominadas",), ISOLATION),
+    CatalogExercise("Crunch en polea", "core", "aislamiento", ("polea",), ISOLATION),
+    CatalogExercise("Dead bug", "core", "aislamiento", (BODYWEIGHT,), ISOLATION),
+    CatalogExercise("Plancha lateral", "core", "aislamiento", (BODYWEIGHT,), ISOLATION),
+]
+
+# (keyword, equipment tags) — longer phrases first so "barra de dominadas"
+# does not also count as a barbell.
+_EQUIPMENT_KEYWORDS: List[Tuple[str, FrozenSet[str]]] = [
+    ("gimnasio", ALL_EQUIPMENT),
+    ("gym", ALL_EQUIPMENT),
+    ("completo", ALL_EQUIPMENT),
+    ("barra de dominadas", frozenset({"barra de dominadas"})),
+    ("dominadas", frozenset({"barra de dominadas"})),
+    ("mancuerna", frozenset({"mancuernas"})),
+    ("pesas", frozenset({"mancuernas", "barra"})),
+    ("barra", frozenset({"barra"})),
+    ("banco", frozenset({"banco"})),
+    ("maquina", frozenset({"maquina"})),
+    ("polea", frozenset({"polea"})),
+    ("banda", frozenset({"bandas"})),
+    ("elastic", frozenset({"bandas"})),
+    ("kettlebell", frozenset({"kettlebell"})),
+    ("pesa rusa", frozenset({"kettlebell"})),
+    ("paralelas", frozenset({"paralelas"})),
+]
+
+
+def fold_text(text: str) -> str:
+    """Lowercase, strip accents and collapse whitespace (for name matching)."""
+    text = unicodedata.normalize("NFKD", text)
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).lower().split())
+
+
+def parse_equipment(text: str) -> FrozenSet[str]:
+    """
+    Map free-text equipment ("mancuernas y banco", "gimnasio completo") to
+    catalog tags. Empty text means a full gym; text with no known equipment
+    ("en casa", "ninguno") means bodyweight only.
+    """
+    folded = fold_text(text or "")
+    if not folded:
+        return ALL_EQUIPMENT
+    tags: Set[str] = {BODYWEIGHT}
+    for keyword, equipment in _EQUIPMENT_KEYWORDS:
+        if keyword in folded:
+            tags |= equipment
+            folded = folded.replace(keyword, " ")
+    return frozenset(tags)
+
+
+class ExerciseCatalog:
+    """Exercise list plus inverted indexes by equipment, muscle and pattern."""
+
+    def __init__(self, exercises: Iterable[CatalogExercise]):
+        self.exercises: List[CatalogExercise] = list(exercises)
+        self._by_equipment: Dict[str, Set[int]] = {}
+        self._by_muscle: Dict[str, Set[int]] = {}
+        self._by_pattern: Dict[str, Set[int]] = {}
+        self._by_name: Dict[str, int] = {}
+
+        for i, exercise in enumerate(self.exercises):
+            for tag in exercise.equipment:
+                self._by_equipment.setdefault(tag, set()).add(i)
+            self._by_muscle.setdefault(exercise.muscle, set()).add(i)
+            self._by_pattern.setdefault(exercise.pattern, set()).add(i)
+            self._by_name[fold_text(exercise.name)] = i
+
+    # --- Lookups ---
+
+    def lookup(self, name: str) -> Optional[CatalogExercise]:
+        """
+        Exact (accent/case-insensitive) match; else the longest catalog name
+        contained in ``name``; else the shortest name starting with it
+        ("prensa" -> "Prensa de piernas").
+        """
+        folded = fold_text(name)
+        index = self._by_name.get(folded)
+        if index is not None:
+            return self.exercises[index]
+        contained = [n for n in self._by_name if n in folded]
+        if contained:
+            return self.exercises[self._by_name[max(contained, key=len)]]
+        prefixed = [n for n in self._by_name if folded and n.startswith(folded + " ")]
+        if prefixed:
+            return self.exercises[self._by_name[min(prefixed, key=len)]]
+        return None
+
+    def _available(self, equipment: Optional[FrozenSet[str]]) -> Set[int]:
+        """Indexes of exercises whose required equipment is all in ``equipment``."""
+        if equipment is None:
+            return set(range(len(self.exercises)))
+        missing = set()
+        for tag, indexes in self._by_equipment.items():
+            if tag not in equipment:
+                missing |= indexes
+        return set(range(len(self.exercises))) - missing
+
+    def find(
+        self,
+        target: str,
+        kind: Optional[str] = None,
+        equipment: Optional[FrozenSet[str]] = None,
+        avoid_joints: FrozenSet[str] = frozenset(),
+    ) -> List[CatalogExercise]:
+        """
+        Exercises for a movement pattern or muscle (``target``), optionally
+        restricted by class, available equipment and joints to spare.
+        Results keep catalog order (preferred variants first).
+        """
+        indexes = self._by_pattern.get(target) or self._by_muscle.get(target) or set()
+        indexes = indexes & self._available(equipment)
+        return [
+            self.exercises[i]
+            for i in sorted(indexes)
+            if (kind is None or self.exercises[i].kind == kind)
+            and not avoid_joints.intersection(self.exercises[i].joint_stress)
+        ]
+
+    def substitutes(
+        self,
+        name: str,
+        equipment: Optional[FrozenSet[str]] = None,
+        limit: int = 5,
+    ) -> List[CatalogExercise]:
+        """
+        Replacement candidates for an exercise: same pattern and muscle first,
+        then the same muscle, filtered by available equipment.
+        """
+        original = self.lookup(name)
+        if original is None:
+            return []
+        available = self._available(equipment)
+
+        def rank(i: int) -> Tuple[int, int]:
+            candidate = self.exercises[i]
+            same_pattern = candidate.pattern == original.pattern
+            same_kind = candidate.kind == original.kind
+            return (0 if same_pattern else 1) + (0 if same_kind else 1), i
+
+        candidates = (self._by_muscle.get(original.muscle, set()) | self._by_pattern.get(original.pattern, set()))
+        if original.pattern == "aislamiento":
+            candidates = self._by_muscle.get(original.muscle, set())
+        candidates = (candidates & available) - {self._by_name[fold_text(original.name)]}
+        return [self.exercises[i] for i in sorted(candidates, key=rank)[:limit]]
+
+
+@lru_cache
+def get_exercise_catalog() -> ExerciseCatalog:
+    """Process-wide catalog (indexes are built once)."""
+    return ExerciseCatalog(_EXERCISES)
@@ -0,0 +1,77 @@
+"""
+Process-wide Groq client with a tuned HTTP connection pool.
+
+All AI services share one ``AsyncGroq`` instance so warm keep-alive (and, when
+the ``h2`` package is installed, HTTP/2) connections are reused across calls
+instead of paying a TCP+TLS handshake per service.
+"""
+
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from groq import AsyncGroq
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+logger = get_logger("services.groq_client")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@lru_cache
+def get_groq_client() -> Optional[AsyncGroq]:
+    """Shared AsyncGroq client (None when GROQ_API_KEY is not configured)."""
+    settings = get_settings()
+    if not settings.ai_configured:
+        return None
+
+    timeout = httpx.Timeout(
+        connect=settings.GROQ_CONNECT_TIMEOUT,
+        read=settings.GROQ_READ_TIMEOUT,
+        write=settings.GROQ_READ_TIMEOUT,
+        pool=settings.GROQ_CONNECT_TIMEOUT,
+    )
+    http2 = settings.GROQ_HTTP2 and _http2_available()
+    http_client = httpx.AsyncClient(
+        http2=http2,
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=settings.GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GROQ_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.GROQ_KEEPALIVE_EXPIRY,
+        ),
+    )
+    logger.info(
+        "Groq HTTP pool: max_connections=%d keepalive=%d http2=%s",
+        settings.GROQ_MAX_CONNECTIONS, settings.GROQ_MAX_KEEPALIVE_CONNECTIONS, http2,
+    )
+
+    # Retries are handled by the shared scheduler (honors Retry-After)
+    if settings.GROQ_BASE_URL:
+        logger.info("Groq base URL overridden: %s", settings.GROQ_BASE_URL)
+    return AsyncGroq(
+        api_key=settings.GROQ_API_KEY,
+        base_url=settings.GROQ_BASE_URL or None,
+        timeout=timeout,
+        max_retries=0,
+        http_client=http_client,
+    )
+
+
+async def close_groq_client() -> None:
+    """Close the shared client's connection pool (called on app shutdown)."""
+    if get_groq_client.cache_info().currsize == 0:
+        return
+    client = get_groq_client()
+    get_groq_client.cache_clear()
+    if client is not None:
+        await client.close()
+        logger.info("Groq HTTP pool closed")
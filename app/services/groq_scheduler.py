@@ -0,0 +1,331 @@
+"""
+Shared outbound scheduler for Groq API calls.
+
+Every AI service goes through one process-wide scheduler that enforces:
+- per-model requests-per-minute and tokens-per-minute token buckets,
+- a bounded number of concurrent upstream calls,
+- priority classes (interactive chat > initial generation > background jobs),
+- ``Retry-After`` on 429 responses, pausing the whole model instead of
+  letting every caller retry on its own.
+"""
+
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import groq
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.core.metrics import LLMCall
+
+logger = get_logger("services.groq_scheduler")
+
+T = TypeVar("T")
+
+# Rough completion budget used when a request does not set max_tokens.
+DEFAULT_COMPLETION_TOKENS = 1500
+# Approximate token cost of one image in a vision request.
+IMAGE_TOKENS = 1200
+
+
+class Priority(IntEnum):
+    """Lower value = served first."""
+
+    INTERACTIVE = 0
+    INITIAL = 1
+    BACKGROUND = 2
+
+
+def estimate_request_tokens(request_kwargs: Dict[str, Any]) -> int:
+    """Cheap local estimate (≈4 chars per token) of prompt + completion tokens."""
+    chars = 0
+    images = 0
+    for message in request_kwargs.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    chars += len(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    images += 1
+    completion = request_kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    return chars // 4 + images * IMAGE_TOKENS + completion
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Parse Retry-After (seconds or HTTP date) from a Groq error response."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Continuous-refill token bucket; a capacity of 0 means unlimited."""
+
+    def __init__(self, capacity: float, per_seconds: float = 60.0):
+        self.capacity = capacity
+        self._rate = capacity / per_seconds if capacity else 0.0
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)."""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self._tokens >= amount else (amount - self._tokens) / self._rate
+
+    def consume(self, amount: float, now: float) -> None:
+        if self.capacity:
+            self._refill(now)
+            self._tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        if self.capacity:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class _ModelLimits:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+
+    def delay_for(self, tokens: int, now: float) -> float:
+        return max(
+            self.paused_until - now,
+            self.requests.delay_for(1, now),
+            self.tokens.delay_for(tokens, now),
+        )
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "model", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: Priority, seq: int, model: str, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.model = model
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class GroqScheduler:
+    """Priority queue + rate limiting + concurrency bound in front of Groq."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        default_rpm: int = 0,
+        default_tpm: int = 0,
+        model_limits: Optional[Dict[str, Dict[str, int]]] = None,
+        max_retries: int = 3,
+    ):
+        self._max_concurrency = max_concurrency
+        self._default_rpm = default_rpm
+        self._default_tpm = default_tpm
+        self._model_limits_config = model_limits or {}
+        self._max_retries = max_retries
+        self._limits: Dict[str, _ModelLimits] = {}
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.dispatched = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.total_queue_seconds = 0.0
+
+    # --- Limits ---
+
+    def _model(self, model: str) -> _ModelLimits:
+        limits = self._limits.get(model)
+        if limits is None:
+            config = self._model_limits_config.get(model, {})
+            limits = _ModelLimits(
+                rpm=config.get("rpm", self._default_rpm),
+                tpm=config.get("tpm", self._default_tpm),
+            )
+            self._limits[model] = limits
+        return limits
+
+    def pause_model(self, model: str, seconds: float) -> None:
+        """Stop dispatching requests for a model (e.g. after a 429)."""
+        limits = self._model(model)
+        limits.paused_until = max(limits.paused_until, time.monotonic() + seconds)
+
+    # --- Queue ---
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: Priority = Priority.INITIAL, tokens: int = DEFAULT_COMPLETION_TOKENS):
+        """Wait for a dispatch slot (priority + rate limits) and hold it for the block."""
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), model, tokens, loop.create_future())
+        self._queue.append(waiter)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release()  # Slot was granted just before the cancellation
+            else:
+                self._queue.remove(waiter)
+            raise
+
+        self.total_queue_seconds += time.monotonic() - waiter.enqueued_at
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant slots to queued waiters in priority order while limits allow."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = time.monotonic()
+        blocked_models = set()
+        next_delay = None
+        for waiter in sorted(self._queue):
+            if self._active >= self._max_concurrency:
+                return
+            if waiter.future.done() or waiter.model in blocked_models:
+                continue
+            limits = self._model(waiter.model)
+            delay = limits.delay_for(waiter.tokens, now)
+            if delay > 0:
+                # Keep priority order within a model; other models may proceed.
+                blocked_models.add(waiter.model)
+                next_delay = delay if next_delay is None else min(next_delay, delay)
+                continue
+            limits.requests.consume(1, now)
+            limits.tokens.consume(waiter.tokens, now)
+            self._queue.remove(waiter)
+            self._active += 1
+            self.dispatched += 1
+            waiter.future.set_result(None)
+
+        if next_delay is not None:
+            self._timer = asyncio.get_running_loop().call_later(next_delay, self._dispatch)
+
+    # --- Execution ---
+
+    async def run(
+        self,
+        model: str,
+        call: Callable[[], Awaitable[T]],
+        priority: Priority = Priority.INITIAL,
+        tokens: int = DEFAULT_COMPLETION_TOKENS,
+        metrics: Optional[LLMCall] = None,
+        timeout: Optional[float] = None,
+        retryable: Optional[Callable[[], bool]] = None,
+    ) -> T:
+        """
+        Run ``call`` inside a slot, retrying rate-limit, 5xx and connection errors.
+
+        429 responses pause the model for the ``Retry-After`` duration so that
+        queued callers wait instead of hammering the API. Queue time and
+        retries are added to ``metrics`` when given. ``timeout`` bounds each
+        upstream attempt once its slot is granted, never the time spent queued;
+        ``asyncio.TimeoutError`` is raised when it expires (not retried).
+        ``retryable`` is checked before each retry; streams return False once
+        they have delivered output, so a mid-stream failure is raised instead
+        of replaying the stream into callbacks that already saw part of it.
+        """
+        attempt = 0
+        while True:
+            try:
+                queued_at = time.monotonic()
+                async with self.slot(model, priority, tokens):
+                    if metrics is not None:
+                        metrics.slot_granted(time.monotonic() - queued_at)
+                    result = await (asyncio.wait_for(call(), timeout) if timeout else call())
+                self._refund_unused(model, tokens, result)
+                return result
+            except groq.RateLimitError as e:
+                self.rate_limited += 1
+                delay = _retry_after_seconds(e)
+                delay = delay if delay is not None else 2 ** attempt
+                self.pause_model(model, delay)
+                if attempt >= self._max_retries or (retryable is not None and not retryable()):
+                    raise
+                logger.warning("Groq rate limit for %s — retrying in %.1fs", model, delay)
+            except (groq.InternalServerError, groq.APIConnectionError) as e:
+                if attempt >= self._max_retries or (retryable is not None and not retryable()):
+                    raise
+                delay = min(2 ** attempt, 10)
+                logger.warning("Groq call failed (%s) — retrying in %.1fs", e.__class__.__name__, delay)
+                await asyncio.sleep(delay)
+            attempt += 1
+            self.retries += 1
+            if metrics is not None:
+                metrics.retries += 1
+
+    def _refund_unused(self, model: str, estimated: int, result: Any) -> None:
+        usage = getattr(result, "usage", None)
+        total = getattr(usage, "total_tokens", None)
+        if isinstance(total, int) and total < estimated:
+            self._model(model).tokens.refund(estimated - total)
+
+    # --- Metrics ---
+
+    def metrics(self) -> dict:
+        by_priority = {p.name.lower(): 0 for p in Priority}
+        for waiter in self._queue:
+            by_priority[Priority(waiter.priority).name.lower()] += 1
+        return {
+            "queue_depth": len(self._queue),
+            "queue_depth_by_priority": by_priority,
+            "active": self._active,
+            "max_concurrency": self._max_concurrency,
+            "dispatched": self.dispatched,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "avg_queue_seconds": round(self.total_queue_seconds / self.dispatched, 4) if self.dispatched else 0.0,
+        }
+
+
+@lru_cache
+def get_groq_scheduler() -> GroqScheduler:
+    """Process-wide scheduler shared by every AI service."""
+    settings = get_settings()
+    return GroqScheduler(
+        max_concurrency=settings.GROQ_MAX_CONCURRENCY,
+        default_rpm=settings.GROQ_RPM_LIMIT,
+        default_tpm=settings.GROQ_TPM_LIMIT,
+        model_limits=settings.GROQ_MODEL_LIMITS,
+        max_retries=settings.GROQ_MAX_RETRIES,
+    )
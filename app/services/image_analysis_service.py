@@ -3,38 +3,57 @@ Service for analyzing exercise images using the Groq API with Llama Vision model
 Shares Groq configuration with ai_service via centralized config.
 """
 
-import base64
-from io import BytesIO
-
-from typing import Optional
-
-from groq import AsyncGroq
+import asyncio
+import os
+from typing import List, Optional, Sequence
 
 from app.core.config import get_settings
 from app.core.logging import get_logger
+from app.core.metrics import record_cache_lookup, track_llm_call
+from app.services.groq_client import get_groq_client
+from app.services.groq_scheduler import Priority, estimate_request_tokens, get_groq_scheduler
+from app.services.image_cache import ImageAnalysisCache, context_key
+from app.services.image_preprocessing import (
+    PIL_AVAILABLE,
+    ImagePreprocessor,
+    PayloadTooLarge,
+    PreparedImage,
+    decode_data_url,
+)
+from app.services.single_flight import SingleFlight, request_fingerprint
 
 logger = get_logger("services.image_analysis")
 
-# Lazy PIL import
-PIL_AVAILABLE = False
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
+if not PIL_AVAILABLE:
     logger.warning("Pillow not installed — image analysis disabled")
 
 
 class ImageAnalyzer:
     """Analyzes exercise images and suggests variations via Groq AI (Llama Vision)."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        cache: Optional[ImageAnalysisCache] = None,
+    ):
         settings = get_settings()
         self._configured = settings.ai_configured
+        self._cache = cache
         self._max_image_size = settings.max_image_size_bytes
+        self._clip_keyframes = settings.CLIP_KEYFRAMES
+        self._max_images = settings.VISION_MAX_IMAGES
+        self._preprocessor = preprocessor or ImagePreprocessor(
+            max_edge=settings.IMAGE_MAX_EDGE,
+            output_format=settings.IMAGE_OUTPUT_FORMAT,
+            quality=settings.IMAGE_OUTPUT_QUALITY,
+            workers=settings.IMAGE_PREPROCESS_WORKERS,
+        )
+        self._single_flight = SingleFlight()
+        self._scheduler = get_groq_scheduler()
 
         if self._configured:
             try:
-                self._client = AsyncGroq(api_key=settings.GROQ_API_KEY)
+                self._client = get_groq_client()
                 self._model = settings.GROQ_VISION_MODEL
                 logger.info("Image analyzer configured with model %s", self._model)
             except Exception as e:
@@ -46,12 +65,19 @@ class ImageAnalyzer:
 
     # --- Image Validation ---
 
-    def _validate_and_prepare_image(self, image_data) -> Optional[str]:
+    async def _validate_and_prepare_image(self, image_data, clip: bool = False) -> Optional[PreparedImage]:
         """
-        Validate image data and return a base64 data URL ready for the API.
+        Validate image data and return it downscaled and re-encoded for the API.
+
+        Decoding, EXIF orientation, resizing and re-encoding run in the
+        preprocessing pool, off the event loop. With ``clip``, the data is a
+        multi-frame clip and the result is its keyframe contact sheet. A
+        path (``os.PathLike``) is opened by the worker itself, so a spooled
+        upload is never loaded into this process.
 
         Returns:
-            base64 data URL string or error message string.
+            The prepared image (data URL + perceptual hash), or None if the
+            image is invalid or too large.
         """
         if not PIL_AVAILABLE:
             return None
@@ -61,34 +87,88 @@ class ImageAnalyzer:
 
         try:
             if isinstance(image_data, str) and image_data.startswith("data:image"):
-                # Already a data URL — validate the image bytes
-                image_bytes = base64.b64decode(image_data.split(",")[1])
-                if len(image_bytes) > self._max_image_size:
-                    return None
-                # Validate with PIL
-                img = Image.open(BytesIO(image_bytes))
-                img.verify()
-                return image_data  # Return original data URL
+                # Size is checked from the base64 length before anything is decoded
+                image_bytes = decode_data_url(image_data, self._max_image_size)
             elif isinstance(image_data, bytes):
                 image_bytes = image_data
+            elif isinstance(image_data, os.PathLike):
+                image_bytes = os.fspath(image_data)
             else:
                 image_bytes = bytes(image_data)
+        except PayloadTooLarge as e:
+            logger.warning("Image rejected: %s", e)
+            return None
+        except (TypeError, ValueError) as e:
+            logger.error("Image validation failed: %s", e)
+            return None
 
-            if len(image_bytes) > self._max_image_size:
-                return None
-
-            # Validate with PIL
-            img = Image.open(BytesIO(image_bytes))
-            img.verify()
-
-            # Convert to base64 data URL
-            b64 = base64.b64encode(image_bytes).decode("utf-8")
-            return f"data:image/jpeg;base64,{b64}"
+        size = len(image_bytes) if isinstance(image_bytes, bytes) else os.path.getsize(image_bytes)
+        if size > self._max_image_size:
+            logger.warning("Image rejected: %d bytes exceeds the limit", size)
+            return None
 
-        except Exception as e:
+        try:
+            if clip:
+                return await self._preprocessor.prepare_clip(image_bytes, self._clip_keyframes)
+            return await self._preprocessor.prepare(image_bytes)
+        except ValueError as e:
             logger.error("Image validation failed: %s", e)
             return None
 
+    async def _complete(self, operation: str, **request_kwargs):
+        """
+        Chat completion through the shared scheduler, coalesced with identical
+        requests (same image + prompt) already in flight.
+        """
+        key = request_fingerprint(request_kwargs)
+        record_cache_lookup("single_flight", self._single_flight.is_pending(key))
+
+        async def call():
+            with track_llm_call(operation, request_kwargs["model"]) as metrics:
+                response = await self._scheduler.run(
+                    request_kwargs["model"],
+                    lambda: self._client.chat.completions.create(**request_kwargs),
+                    priority=Priority.INTERACTIVE,
+                    tokens=estimate_request_tokens(request_kwargs),
+                    metrics=metrics,
+                )
+                metrics.record_usage(getattr(response, "usage", None))
+                return response
+
+        return await self._single_flight.do(key, call)
+
+    async def _vision_completion(
+        self, operation: str, images: Sequence[PreparedImage], prompt: str, context: str
+    ) -> str:
+        """
+        Vision call with all ``images`` in one user message. Single-image
+        calls are answered from the perceptual-hash cache when a
+        near-identical image was already analyzed in the same context.
+        """
+        cacheable = self._cache is not None and len(images) == 1
+        if cacheable:
+            cached = await self._cache.get(images[0].dhash, context)
+            record_cache_lookup("image_analysis", cached is not None)
+            if cached is not None:
+                return cached
+
+        content = [{"type": "text", "text": prompt}]
+        content += [{"type": "image_url", "image_url": {"url": image.data_url()}} for image in images]
+        response = await self._complete(
+            operation,
+            model=self._model,
+            messages=[{"role": "user", "content": content}],
+            temperature=0.7,
+        )
+        result = response.choices[0].message.content.strip()
+        if cacheable and result:
+            await self._cache.set(images[0].dhash, context, result)
+        return result
+
+    def close(self) -> None:
+        """Release the preprocessing workers."""
+        self._preprocessor.close()
+
     # --- Public API ---
 
     async def analyze_exercise_image(self, image_data, exercise_name: str = None) -> str:
@@ -99,8 +179,8 @@ class ImageAnalyzer:
         if not self._configured:
             return "Lo siento, la funcionalidad de análisis de imágenes está deshabilitada (API de IA no configurada)."
 
-        image_url = self._validate_and_prepare_image(image_data)
-        if image_url is None:
+        image = await self._validate_and_prepare_image(image_data)
+        if image is None:
             return "No se pudo procesar la imagen. El formato no es válido, está corrupta o es demasiado grande."
 
         if exercise_name:
@@ -125,25 +205,100 @@ Por favor:
 Responde en español de forma clara y concisa."""
 
         try:
-            response = await self._client.chat.completions.create(
-                model=self._model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": image_url}},
-                        ],
-                    }
-                ],
-                temperature=0.7,
+            return await self._vision_completion(
+                "image_analysis", [image], prompt, context_key("analysis", exercise_name)
             )
-            return response.choices[0].message.content.strip()
 
         except Exception as e:
             logger.error("Image analysis failed: %s", e, exc_info=True)
             return f"No se pudo analizar la imagen: {e}"
 
+    async def analyze_exercise_images(
+        self, images: List, exercise_name: str = None, views: Optional[List[Optional[str]]] = None
+    ) -> str:
+        """
+        Analyze several photos of the same exercise (e.g. front/side/back) in one vision request.
+
+        ``views`` optionally names the angle of each photo.
+        """
+        if not PIL_AVAILABLE:
+            return "Lo siento, la funcionalidad de análisis de imágenes está deshabilitada (Pillow no instalado)."
+
+        if not self._configured:
+            return "Lo siento, la funcionalidad de análisis de imágenes está deshabilitada (API de IA no configurada)."
+
+        if not images:
+            return "No se proporcionaron imágenes."
+        if len(images) > self._max_images:
+            return f"Puedes enviar como máximo {self._max_images} imágenes por análisis."
+        if len(images) == 1:
+            return await self.analyze_exercise_image(images[0], exercise_name)
+
+        prepared = await asyncio.gather(*(self._validate_and_prepare_image(image) for image in images))
+        invalid = [str(number) for number, image in enumerate(prepared, start=1) if image is None]
+        if invalid:
+            return (
+                f"No se pudieron procesar las imágenes {', '.join(invalid)}. "
+                "El formato no es válido, están corruptas o son demasiado grandes."
+            )
+
+        views = list(views or [])[:len(images)]
+        views += [None] * (len(images) - len(views))
+        photos = "\n".join(
+            f"- Foto {number}: {view or 'ángulo no indicado'}" for number, view in enumerate(views, start=1)
+        )
+        exercise = f"el ejercicio: {exercise_name}" if exercise_name else "un ejercicio (identifícalo)"
+        prompt = f"""Te envío {len(images)} fotos de la misma persona realizando {exercise}, tomadas desde distintos ángulos:
+{photos}
+
+Combina la información de todas las fotos en un único análisis:
+1. Una evaluación de su postura y técnica, indicando qué foto muestra cada detalle
+2. Errores que solo se aprecian desde un ángulo concreto
+3. Puntos específicos de mejora y consejos para corregirlos
+4. Posibles riesgos de lesión basados en la técnica mostrada
+
+Responde en español de forma clara y concisa."""
+
+        try:
+            return await self._vision_completion(
+                "multi_image_analysis", prepared, prompt, context_key("multi", exercise_name)
+            )
+
+        except Exception as e:
+            logger.error("Multi-image analysis failed: %s", e, exc_info=True)
+            return f"No se pudieron analizar las imágenes: {e}"
+
+    async def analyze_exercise_clip(self, clip_data, exercise_name: str = None) -> str:
+        """Analyze a short multi-frame clip (GIF/WebP/MJPEG) of a repetition in one vision call."""
+        if not PIL_AVAILABLE:
+            return "Lo siento, la funcionalidad de análisis de imágenes está deshabilitada (Pillow no instalado)."
+
+        if not self._configured:
+            return "Lo siento, la funcionalidad de análisis de imágenes está deshabilitada (API de IA no configurada)."
+
+        sheet = await self._validate_and_prepare_image(clip_data, clip=True)
+        if sheet is None:
+            return "No se pudo procesar el clip. El formato no es válido (usa GIF, WebP animado o MJPEG), está corrupto o es demasiado grande."
+
+        exercise = f"el ejercicio: {exercise_name}" if exercise_name else "un ejercicio (identifícalo)"
+        prompt = f"""Esta imagen es una secuencia de {sheet.frames} fotogramas clave de una repetición de {exercise}.
+Los fotogramas están numerados en orden temporal (de izquierda a derecha y de arriba abajo), con el segundo del clip en que aparecen.
+
+Por favor, analiza el movimiento completo:
+1. Evalúa la técnica en cada fase (inicio, fase excéntrica, punto más bajo/alto, fase concéntrica)
+2. Señala en qué fotogramas hay errores de postura, citando su número
+3. Comenta el rango de movimiento y el control del tempo
+4. Da consejos concretos para corregir los errores y posibles riesgos de lesión
+
+Responde en español de forma clara y concisa."""
+
+        try:
+            return await self._vision_completion("clip_analysis", [sheet], prompt, context_key("clip", exercise_name))
+
+        except Exception as e:
+            logger.error("Clip analysis failed: %s", e, exc_info=True)
+            return f"No se pudo analizar el clip: {e}"
+
     async def suggest_exercise_variations(self, image_data, difficulty_level: str = None) -> str:
         """Analyze an exercise image and suggest variations."""
         if not PIL_AVAILABLE:
@@ -152,8 +307,8 @@ Responde en español de forma clara y concisa."""
         if not self._configured:
             return "Lo siento, la funcionalidad de análisis de imágenes está deshabilitada (API de IA no configurada)."
 
-        image_url = self._validate_and_prepare_image(image_data)
-        if image_url is None:
+        image = await self._validate_and_prepare_image(image_data)
+        if image is None:
             return "No se pudo procesar la imagen. El formato no es válido, está corrupta o es demasiado grande."
 
         if difficulty_level:
@@ -178,20 +333,9 @@ Para cada variación, incluye:
 Responde en español de forma clara y concisa."""
 
         try:
-            response = await self._client.chat.completions.create(
-                model=self._model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": image_url}},
-                        ],
-                    }
-                ],
-                temperature=0.7,
+            return await self._vision_completion(
+                "exercise_variations", [image], prompt, context_key("variations", difficulty_level=difficulty_level)
             )
-            return response.choices[0].message.content.strip()
 
         except Exception as e:
             logger.error("Exercise variation suggestion failed: %s", e, exc_info=True)
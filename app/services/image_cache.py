@@ -0,0 +1,148 @@
+"""
+Perceptual-hash cache for exercise image analysis.
+
+Users re-upload the same photo (or a near-identical frame) to ask again.
+Results are keyed on the image's 64-bit dHash plus the request context
+(action, exercise name, difficulty); a lookup matches any stored image of
+the same context within a Hamming-distance threshold, so recompressed,
+rescaled or re-shot copies hit without a vision call.
+
+Tier 1 is a fixed-size NumPy index in process with LRU slot eviction;
+tier 2 is the database, shared by all gunicorn workers and bounded by
+evicting the least recently used rows.
+"""
+
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.logging import get_logger
+from app.repositories import image_cache_repository
+
+logger = get_logger("services.image_cache")
+
+# Set bits per byte value, for a vectorized popcount over uint64 hashes.
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hamming_distances(hashes: np.ndarray, image_hash: int) -> np.ndarray:
+    """Bit distance from ``image_hash`` to each uint64 in ``hashes``."""
+    xor = np.bitwise_xor(hashes.astype(np.uint64), np.uint64(image_hash))
+    return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def context_key(action: str, exercise_name: Optional[str] = None, difficulty_level: Optional[str] = None) -> str:
+    """Normalized request context: case, accents and whitespace do not matter."""
+    parts = []
+    for value in (action, exercise_name, difficulty_level):
+        value = unicodedata.normalize("NFKD", value or "")
+        value = "".join(c for c in value if not unicodedata.combining(c))
+        parts.append(" ".join(value.casefold().split()))
+    return "|".join(parts)
+
+
+class ImageAnalysisCache:
+    """Nearest-hash cache of vision results, in memory and in the database."""
+
+    def __init__(self, max_entries: int = 512, max_distance: int = 6, use_db: bool = True):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._use_db = use_db
+        self._hashes = np.zeros(max_entries, dtype=np.uint64)
+        self._contexts = np.zeros(max_entries, dtype=np.int64)
+        self._occupied = np.zeros(max_entries, dtype=bool)
+        self._results: List[Optional[str]] = [None] * max_entries
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _context_id(context: str) -> int:
+        return int(hashlib.sha256(context.encode("utf-8")).hexdigest()[:15], 16)
+
+    def _nearest(self, context_id: int, image_hash: int) -> Optional[Tuple[int, int]]:
+        """(slot, distance) of the closest in-memory entry for the context."""
+        slots = np.flatnonzero(self._occupied & (self._contexts == context_id))
+        if slots.size == 0:
+            return None
+        distances = hamming_distances(self._hashes[slots], image_hash)
+        best = int(np.argmin(distances))
+        return int(slots[best]), int(distances[best])
+
+    async def get(self, image_hash: int, context: str) -> Optional[str]:
+        """Result for a near-identical image in the same context, or None."""
+        match = self._nearest(self._context_id(context), image_hash)
+        if match is not None and match[1] <= self.max_distance:
+            slot, distance = match
+            self._lru.move_to_end(slot)
+            self.memory_hits += 1
+            logger.info("Image cache hit (distance %d) for %s", distance, context)
+            return self._results[slot]
+
+        if self._use_db:
+            try:
+                result = await self._get_from_db(image_hash, context)
+            except Exception as e:
+                logger.warning("Image cache DB lookup failed: %s", e)
+                result = None
+            if result is not None:
+                self._remember(image_hash, context, result)
+                self.db_hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    async def _get_from_db(self, image_hash: int, context: str) -> Optional[str]:
+        rows = await image_cache_repository.get_hashes(context, self.max_entries)
+        if not rows:
+            return None
+        hashes = np.array([int(h, 16) for _, h in rows], dtype=np.uint64)
+        distances = hamming_distances(hashes, image_hash)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            return None
+        logger.info("Image cache DB hit (distance %d) for %s", distances[best], context)
+        return await image_cache_repository.use_entry(rows[best][0])
+
+    async def set(self, image_hash: int, context: str, result: str) -> None:
+        """Store a result in both tiers."""
+        self._remember(image_hash, context, result)
+
+        if self._use_db:
+            try:
+                await image_cache_repository.save_entry(context, f"{image_hash:016x}", result, self.max_entries)
+            except Exception as e:
+                logger.warning("Image cache DB store failed: %s", e)
+
+    def _remember(self, image_hash: int, context: str, result: str) -> None:
+        context_id = self._context_id(context)
+        match = self._nearest(context_id, image_hash)
+        if match is not None and match[1] == 0:
+            slot = match[0]  # Same image again: refresh its slot
+        elif len(self._lru) < self.max_entries:
+            slot = int(np.flatnonzero(~self._occupied)[0])
+        else:
+            slot, _ = self._lru.popitem(last=False)
+
+        self._hashes[slot] = image_hash
+        self._contexts[slot] = context_id
+        self._occupied[slot] = True
+        self._results[slot] = result
+        self._lru[slot] = None
+        self._lru.move_to_end(slot)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring."""
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else 0.0,
+            "size": len(self._lru),
+        }
@@ -0,0 +1,429 @@
+"""
+Image preprocessing before vision upload.
+
+Uploaded photos are decoded, rotated according to their EXIF orientation,
+downscaled so the longest edge fits the vision model, stripped of metadata
+(EXIF, GPS, ICC) and re-encoded as JPEG or WebP. A phone photo of several
+megabytes becomes a payload of a few hundred kilobytes with the right MIME
+type, so base64 encoding, upload and vision latency all shrink.
+
+Decoding and resampling are CPU-bound and hold the GIL, so they run in a
+process pool (``ImagePreprocessor``) instead of on the event loop.
+``prepare_image`` is a plain module-level function so it can be pickled
+into the worker processes. It also computes the image's perceptual hash
+(dHash) while the decoded pixels are at hand, for the analysis cache.
+
+Short clips (animated GIF/WebP, or concatenated JPEG frames as sent by
+MJPEG cameras) go through ``prepare_clip``: the most distinct keyframes of
+the movement are picked by frame difference and tiled into one numbered
+contact sheet, so a single vision request covers the whole repetition.
+
+Both accept raw bytes or the path of a file on disk: large HTTP uploads
+are spooled to a temporary file and only its path crosses into the worker
+process, instead of the whole payload being pickled through the pool.
+"""
+
+import asyncio
+import base64
+import binascii
+import math
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from app.core.logging import get_logger
+from app.core.metrics import IMAGE_BYTES, IMAGE_PREPROCESS_SECONDS
+
+logger = get_logger("services.image_preprocessing")
+
+# Lazy PIL import (the analyzer reports the feature as disabled without it)
+PIL_AVAILABLE = False
+try:
+    from PIL import Image, ImageDraw, ImageOps, ImageSequence
+    PIL_AVAILABLE = True
+except ImportError:
+    pass
+
+OUTPUT_FORMATS = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# Raw image bytes, or the path of a file holding them.
+ImageSource = Union[bytes, str, os.PathLike]
+
+# Frames decoded from a clip at most (longer clips are sampled evenly).
+MAX_CLIP_FRAMES = 120
+# Side of the grayscale thumbnails compared to score frame differences.
+DIFF_SIZE = 48
+# JPEG markers without a length field: TEM and RST0-7 (SOI/EOI are handled apart).
+_STANDALONE_MARKERS = frozenset({0x01, *range(0xD0, 0xD8)})
+# base64 characters decoded per step (a multiple of 4).
+DECODE_CHUNK_CHARS = 256 * 1024
+_WHITESPACE = re.compile(r"\s")
+
+
+class PayloadTooLarge(ValueError):
+    """The decoded image would exceed the size limit."""
+
+
+def base64_decoded_size(payload: str, start: int = 0) -> int:
+    """Exact decoded length of ``payload[start:]`` (unpadded, whitespace-free base64)."""
+    length = len(payload) - start
+    padding = 0
+    if length and payload.endswith("=="):
+        padding = 2
+    elif length and payload.endswith("="):
+        padding = 1
+    return length // 4 * 3 + {0: 0, 2: 1, 3: 2}.get(length % 4, 0) - padding
+
+
+def decode_data_url(data_url: str, max_size: int) -> bytes:
+    """
+    Decode a base64 ``data:`` URL, enforcing ``max_size`` before decoding.
+
+    The decoded size is computed from the base64 length, so an oversized
+    payload is rejected without allocating its bytes. Valid payloads are
+    decoded in fixed-size chunks straight into the output buffer, without
+    first copying the base64 part out of the URL.
+
+    Raises ``PayloadTooLarge`` or ``ValueError`` (malformed URL / base64).
+    """
+    comma = data_url.find(",")
+    if comma == -1 or ";base64" not in data_url[:comma]:
+        raise ValueError("Not a base64 data URL")
+    start = comma + 1
+    if _WHITESPACE.search(data_url, start):
+        # Line-wrapped base64 (rare): chunk boundaries need a clean string
+        data_url, start = _WHITESPACE.sub("", data_url[start:]), 0
+
+    size = base64_decoded_size(data_url, start)
+    if size > max_size:
+        raise PayloadTooLarge(f"Image is {size} bytes, limit is {max_size}")
+
+    out = BytesIO()
+    try:
+        for offset in range(start, len(data_url), DECODE_CHUNK_CHARS):
+            out.write(base64.b64decode(data_url[offset:offset + DECODE_CHUNK_CHARS], validate=True))
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64: {e}") from e
+    return out.getvalue()
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_size: int
+    dhash: int  # 64-bit difference hash of the oriented image
+    frames: int = 1  # keyframes tiled into the image (clips)
+
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def _flatten(img: "Image.Image", keep_alpha: bool) -> "Image.Image":
+    """Convert to RGB (or RGBA when the output format keeps transparency)."""
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+    if not has_alpha:
+        return img if img.mode == "RGB" else img.convert("RGB")
+    img = img.convert("RGBA")
+    if keep_alpha:
+        return img
+    background = Image.new("RGB", img.size, (255, 255, 255))
+    background.paste(img, mask=img.getchannel("A"))
+    return background
+
+
+def dhash(img: "Image.Image", size: int = 8) -> int:
+    """
+    Difference hash: sign of horizontal brightness gradients on a
+    (size + 1) x size grayscale thumbnail, packed into a size*size-bit int.
+    Robust to rescaling, recompression and small exposure changes.
+    """
+    small = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _encode(img: "Image.Image", output_format: str, quality: int) -> bytes:
+    out = BytesIO()
+    # No exif/icc_profile arguments: metadata is not carried over
+    if output_format == "JPEG":
+        img.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        img.save(out, format="WEBP", quality=quality, method=4)
+    return out.getvalue()
+
+
+def _source_size(source: ImageSource) -> int:
+    return len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
+
+def prepare_image(
+    image_bytes: ImageSource, max_edge: int = 1024, output_format: str = "JPEG", quality: int = 85
+) -> PreparedImage:
+    """
+    Decode, orient, downscale and re-encode one image (runs in a worker process).
+
+    Raises ``ValueError`` when the bytes are not a decodable image.
+    """
+    output_format = output_format.upper()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+    try:
+        img = Image.open(BytesIO(image_bytes) if isinstance(image_bytes, bytes) else image_bytes)
+        # JPEG can decode directly at a reduced scale, far cheaper than a full decode + resize
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        image_hash = dhash(img)
+        img = _flatten(img, keep_alpha=output_format == "WEBP")
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid image: {e}") from e
+
+    return PreparedImage(
+        _encode(img, output_format, quality), OUTPUT_FORMATS[output_format],
+        img.width, img.height, _source_size(image_bytes), image_hash,
+    )
+
+
+# --- Clips ---
+
+
+def _jpeg_spans(data: bytes) -> Iterator[Tuple[int, int]]:
+    """
+    ``(start, end)`` of each complete JPEG in back-to-back JPEG data (MJPEG).
+
+    Walks the marker segments instead of searching for an EOI/SOI byte pair,
+    which also occurs inside EXIF thumbnails and other segment payloads.
+    Stops at the first truncated or malformed image.
+    """
+    size = len(data)
+    pos = 0
+    while data.startswith(b"\xff\xd8", pos):
+        start, pos = pos, pos + 2
+        while True:
+            if pos + 2 > size or data[pos] != 0xFF:
+                return
+            marker = data[pos + 1]
+            if marker == 0xFF:  # Fill byte before a marker
+                pos += 1
+                continue
+            if marker == 0xD9:  # EOI
+                pos += 2
+                yield start, pos
+                break
+            if marker in _STANDALONE_MARKERS:
+                pos += 2
+                continue
+            if pos + 4 > size:
+                return
+            pos += 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+            if marker == 0xDA:  # SOS: skip entropy-coded data up to the next real marker
+                while True:
+                    pos = data.find(b"\xff", pos)
+                    if pos < 0 or pos + 1 >= size:
+                        return
+                    if data[pos + 1] == 0x00 or 0xD0 <= data[pos + 1] <= 0xD7:
+                        pos += 2  # Stuffed byte or restart marker
+                        continue
+                    break
+
+
+def _clip_frame(frame: "Image.Image", max_edge: int) -> "Image.Image":
+    """Orient, flatten to RGB and downscale one sampled frame."""
+    frame = _flatten(ImageOps.exif_transpose(frame), keep_alpha=False)
+    frame.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    return frame
+
+
+def _decode_frames(clip_bytes: bytes, max_edge: int) -> Tuple[List["Image.Image"], List[float]]:
+    """
+    RGB frames (at most MAX_CLIP_FRAMES, downscaled to ``max_edge``) and their start times in seconds.
+
+    Each sampled frame is downscaled as soon as it is decoded, so only
+    ``max_edge``-sized copies are kept. The container is identified by
+    Pillow: a JPEG is split into its concatenated images (MJPEG, no timing
+    information); GIF, WebP and other sequences are iterated frame by frame.
+    """
+    clip = Image.open(BytesIO(clip_bytes))
+    frames: List["Image.Image"] = []
+    times: List[float] = []
+
+    if clip.format == "JPEG":
+        spans = list(_jpeg_spans(clip_bytes)) or [(0, len(clip_bytes))]
+        stride = max(1, math.ceil(len(spans) / MAX_CLIP_FRAMES))
+        for start, end in spans[::stride]:
+            frame = Image.open(BytesIO(clip_bytes[start:end]))
+            frame.draft("RGB", (max_edge, max_edge))
+            frames.append(_clip_frame(frame, max_edge))
+        return frames, times
+
+    total = getattr(clip, "n_frames", 1)
+    stride = max(1, math.ceil(total / MAX_CLIP_FRAMES))
+    elapsed = 0.0
+    for index, frame in enumerate(ImageSequence.Iterator(clip)):
+        if index % stride == 0:
+            frames.append(_clip_frame(frame, max_edge))
+            times.append(elapsed)
+        elapsed += frame.info.get("duration", 0) / 1000
+    return frames, times if any(times) else []
+
+
+def select_keyframes(frames: List["Image.Image"], count: int) -> List[int]:
+    """
+    Indices (in time order) of the ``count`` most distinct frames.
+
+    Frames are compared as small grayscale arrays by mean absolute
+    difference. The first frame (start position) is always kept; each next
+    pick is the frame farthest from every frame already picked, which lands
+    on the turning points of the movement rather than on near-duplicates.
+    """
+    if len(frames) <= count:
+        return list(range(len(frames)))
+    stack = np.stack([
+        np.asarray(frame.convert("L").resize((DIFF_SIZE, DIFF_SIZE), Image.BILINEAR), dtype=np.float32).ravel()
+        for frame in frames
+    ])
+    picked = [0]
+    nearest = np.abs(stack - stack[0]).mean(axis=1)  # distance to the closest picked frame
+    for _ in range(count - 1):
+        best = int(np.argmax(nearest))
+        if nearest[best] == 0:
+            break  # The remaining frames are duplicates
+        picked.append(best)
+        nearest = np.minimum(nearest, np.abs(stack - stack[best]).mean(axis=1))
+    return sorted(picked)
+
+
+def contact_sheet(frames: List["Image.Image"], labels: List[str], max_edge: int) -> "Image.Image":
+    """Tile frames in a grid whose longest edge is ``max_edge``, each with its label."""
+    columns = math.ceil(math.sqrt(len(frames)))
+    rows = math.ceil(len(frames) / columns)
+    aspect = frames[0].width / frames[0].height
+    tile_w, tile_h = (
+        (max_edge // columns, int(max_edge // columns / aspect))
+        if columns * aspect >= rows
+        else (int(max_edge // rows * aspect), max_edge // rows)
+    )
+    sheet = Image.new("RGB", (tile_w * columns, tile_h * rows), (0, 0, 0))
+    draw = ImageDraw.Draw(sheet)
+    for index, (frame, label) in enumerate(zip(frames, labels)):
+        x, y = (index % columns) * tile_w, (index // columns) * tile_h
+        sheet.paste(ImageOps.pad(frame, (tile_w, tile_h)), (x, y))
+        left, top, right, bottom = draw.textbbox((x + 6, y + 6), label)
+        draw.rectangle((left - 4, top - 3, right + 4, bottom + 3), fill=(0, 0, 0))
+        draw.text((x + 6, y + 6), label, fill=(255, 255, 0))
+    return sheet
+
+
+def prepare_clip(
+    clip_bytes: ImageSource, keyframes: int = 6, max_edge: int = 1024, output_format: str = "JPEG", quality: int = 85
+) -> PreparedImage:
+    """
+    Decode a multi-frame clip and return a labeled contact sheet of its keyframes (runs in a worker process).
+
+    Raises ``ValueError`` when the bytes are not a decodable image sequence.
+    """
+    output_format = output_format.upper()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+    try:
+        if not isinstance(clip_bytes, bytes):
+            with open(clip_bytes, "rb") as clip_file:
+                clip_bytes = clip_file.read()
+        frames, times = _decode_frames(clip_bytes, max_edge)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid clip: {e}") from e
+    if not frames:
+        raise ValueError("Invalid clip: no frames")
+
+    picked = select_keyframes(frames, keyframes)
+    labels = [
+        f"{number} · {times[index]:.1f}s" if times else str(number)
+        for number, index in enumerate(picked, start=1)
+    ]
+    sheet = contact_sheet([frames[i] for i in picked], labels, max_edge)
+    return PreparedImage(
+        _encode(sheet, output_format, quality), OUTPUT_FORMATS[output_format],
+        sheet.width, sheet.height, len(clip_bytes), dhash(sheet), len(picked),
+    )
+
+
+class ImagePreprocessor:
+    """
+    Runs ``prepare_image`` off the event loop.
+
+    With ``workers > 0`` a process pool is created on first use (``spawn``
+    context, so workers do not inherit the server's threads and sockets);
+    with ``workers=0`` the default thread pool is used instead, for
+    environments where child processes are not available.
+    """
+
+    def __init__(self, max_edge: int = 1024, output_format: str = "JPEG", quality: int = 85, workers: int = 2):
+        if output_format.upper() not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self._max_edge = max_edge
+        self._format = output_format.upper()
+        self._quality = quality
+        self._workers = workers
+        self._pool: Optional[Executor] = None
+
+    def _executor(self) -> Optional[Executor]:
+        if self._workers <= 0:
+            return None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info("Image preprocessing pool started with %d workers", self._workers)
+        return self._pool
+
+    async def prepare(self, image_bytes: ImageSource) -> PreparedImage:
+        """Preprocess one image; raises ``ValueError`` for undecodable input."""
+        return await self._run(prepare_image, image_bytes, self._max_edge, self._format, self._quality)
+
+    async def prepare_clip(self, clip_bytes: ImageSource, keyframes: int = 6) -> PreparedImage:
+        """Keyframe contact sheet of a multi-frame clip; raises ``ValueError`` for undecodable input."""
+        return await self._run(prepare_clip, clip_bytes, keyframes, self._max_edge, self._format, self._quality)
+
+    async def _run(self, function, data: ImageSource, *args) -> PreparedImage:
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            prepared = await loop.run_in_executor(self._executor(), function, data, *args)
+            outcome = "ok"
+        except ValueError:
+            outcome = "invalid"
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge image): start a fresh pool for later calls
+            logger.error("Image preprocessing pool broke; restarting it")
+            self._pool = None
+            raise ValueError("Image preprocessing worker crashed")
+        finally:
+            IMAGE_PREPROCESS_SECONDS.observe(time.monotonic() - started, outcome=outcome)
+
+        IMAGE_BYTES.observe(prepared.original_size, stage="original")
+        IMAGE_BYTES.observe(len(prepared.data), stage="prepared")
+        logger.debug(
+            "Image prepared: %d -> %d bytes (%dx%d %s)",
+            prepared.original_size, len(prepared.data), prepared.width, prepared.height, prepared.mime_type,
+        )
+        return prepared
+
+    def close(self) -> None:
+        """Shut the worker processes down (called from the app lifespan)."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,214 @@
+"""
+Asynchronous routine generation jobs.
+
+Submitting a job stores it in the database and returns its ID immediately;
+an in-process pool of worker tasks generates and saves the routine. Job state
+is persisted, so jobs left queued or interrupted by a restart are picked up
+again on startup, and workers claim jobs atomically so two gunicorn workers
+never run the same one; running jobs get a heartbeat so slow ones are not
+mistaken for orphans and run twice. Jobs are generated at background priority
+without the offline catalog fallback, so a job either gets a Groq routine or
+fails visibly. Completion is observable by polling the job or by awaiting
+``wait`` (used by the WebSocket notification endpoint).
+"""
+
+import asyncio
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.logging import get_logger
+from app.repositories import job_repository, routine_repository
+from app.schemas.routines import RoutineRequest
+from app.services.ai_service import RoutineGenerator
+from app.services.bulk_routines import initial_chat_messages
+from app.services.groq_scheduler import Priority
+
+logger = get_logger("services.job_queue")
+
+
+class RoutineJobQueue:
+    """Database-backed job queue with an in-process worker pool."""
+
+    def __init__(
+        self,
+        generator: RoutineGenerator,
+        workers: int = 4,
+        stale_seconds: int = 300,
+        max_attempts: int = 3,
+        poll_interval: float = 1.0,
+    ):
+        self._generator = generator
+        self._worker_count = workers
+        self._stale_seconds = stale_seconds
+        self._max_attempts = max_attempts
+        self._poll_interval = poll_interval
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._running: Set[str] = set()
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}  # wait() calls sharing each event
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        """Recover pending jobs from the database and start the workers."""
+        if self.started:
+            return
+        recovered = await self._recover()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"routine-job-worker-{i}")
+            for i in range(self._worker_count)
+        ]
+        self._workers.append(asyncio.create_task(self._sweeper(), name="routine-job-sweeper"))
+        self._workers.append(asyncio.create_task(self._heartbeat(), name="routine-job-heartbeat"))
+        logger.info("Job queue started: %d workers, %d recovered jobs", self._worker_count, recovered)
+
+    async def _recover(self) -> int:
+        """Enqueue queued/stale jobs from the database (claims make duplicates harmless)."""
+        try:
+            pending = await job_repository.recover_pending_jobs(self._stale_seconds, self._max_attempts)
+        except Exception as e:
+            logger.error("Could not recover pending jobs: %s", e)
+            return 0
+        for job_id in pending:
+            if job_id not in self._running:
+                self._queue.put_nowait(job_id)
+        return len(pending)
+
+    async def _sweeper(self) -> None:
+        """Periodically pick up jobs requeued or orphaned by other worker processes."""
+        while True:
+            await asyncio.sleep(self._stale_seconds / 2)
+            if self._queue.empty():
+                await self._recover()
+
+    async def _heartbeat(self) -> None:
+        """Refresh running jobs well within ``stale_seconds`` so recovery leaves them alone."""
+        while True:
+            await asyncio.sleep(self._stale_seconds / 3)
+            try:
+                await job_repository.touch_jobs(list(self._running))
+            except Exception as e:
+                logger.warning("Job heartbeat failed: %s", e)
+
+    async def stop(self) -> None:
+        """Stop the workers and put interrupted jobs back in the queue."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        try:
+            await job_repository.requeue_jobs(list(self._running), self._max_attempts)
+        except Exception as e:
+            logger.error("Could not requeue interrupted jobs: %s", e)
+        self._running.clear()
+
+    # --- Public API ---
+
+    async def submit(self, request: RoutineRequest) -> str:
+        """Persist a new job and schedule it; returns the job ID."""
+        job_id = uuid.uuid4().hex
+        await job_repository.create_job(job_id, request.model_dump_json())
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await job_repository.get_job(job_id)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Wait until a job finishes and return its state (None if unknown).
+
+        Jobs run by this process wake the waiter directly; jobs run by another
+        worker process are detected by polling the database.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
+        event = self._events.setdefault(job_id, asyncio.Event())
+        self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+
+        try:
+            while True:
+                job = await job_repository.get_job(job_id)
+                if job is None or job["status"] in job_repository.TERMINAL_STATUSES:
+                    return job
+                wait_for = self._poll_interval
+                if deadline is not None:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        return job
+                    wait_for = min(wait_for, remaining)
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=wait_for)
+                    event.clear()  # Re-read the job; keep polling if it is somehow not finished
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # The last waiter drops the event, also on timeouts for jobs run elsewhere
+            waiters = self._waiters.pop(job_id) - 1
+            if waiters:
+                self._waiters[job_id] = waiters
+            elif self._events.get(job_id) is event:
+                del self._events[job_id]
+
+    def stats(self) -> dict:
+        return {"workers": self._worker_count if self.started else 0,
+                "queued": self._queue.qsize(), "running": len(self._running)}
+
+    # --- Workers ---
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job %s crashed: %s", job_id, e, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        request_data = await job_repository.claim_job(job_id)
+        if request_data is None:
+            return  # Claimed by another worker process
+
+        self._running.add(job_id)
+        interrupted = False
+        try:
+            routine_id, error = await self._generate(job_id, request_data)
+            await job_repository.finish_job(job_id, routine_id=routine_id, error=error)
+            logger.info("Job %s %s", job_id, "failed" if error else f"completed (routine {routine_id})")
+        except asyncio.CancelledError:
+            interrupted = True  # Left running; stop() requeues it
+            raise
+        finally:
+            if not interrupted:
+                # Also when finish_job fails: the row stays running without a
+                # heartbeat and is recovered once it goes stale.
+                self._running.discard(job_id)
+                event = self._events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+
+    async def _generate(self, job_id: str, request_data: str) -> Tuple[Optional[int], Optional[str]]:
+        """Generate and save the routine; returns (routine_id, error)."""
+        try:
+            request = RoutineRequest.model_validate_json(request_data)
+            routine = await self._generator.create_initial_routine(
+                request, priority=Priority.BACKGROUND, offline_fallback=False
+            )
+            [routine_id] = await routine_repository.save_routines_batch(
+                [routine], [initial_chat_messages(request)]
+            )
+            return routine_id, None
+        except ValueError as e:
+            return None, str(e)
+        except Exception as e:
+            logger.error("Job %s failed: %s", job_id, e, exc_info=True)
+            return None, "Error interno al generar la rutina"
@@ -0,0 +1,175 @@
+"""
+Single-pass JSON extraction and repair for LLM output.
+
+``extract_json_object`` finds the outermost JSON object in a model response
+(bare, fenced in markdown or wrapped in prose) in a single left-to-right pass
+over the candidate opening braces, and recovers common defects locally instead of paying
+for a regeneration:
+
+- trailing commas before ``}`` / ``]``,
+- strings cut off by the end of the response,
+- objects and arrays truncated mid-element (the incomplete element is
+  dropped and the open containers are closed).
+
+Complete objects, including trailing-comma fixes, are delimited by the C
+decoder (``raw_decode``); only truncated ones go through the Python scan,
+which walks whole strings and structural characters as single regex tokens.
+
+A truncation repair loses data (a cut string, dropped elements), so
+``extract_json`` reports it: callers must not cache such a result or apply
+it as if it were the whole answer.
+"""
+
+import json
+import re
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.core.logging import get_logger
+
+logger = get_logger("services.json_repair")
+
+# A whole string (group 1 is its closing quote, empty if cut off) or a structural char.
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*("?)|[{}\[\],]', re.S)
+_CLOSERS = {"{": "}", "[": "]"}
+_DECODER = json.JSONDecoder(strict=False)  # strict=False: raw newlines inside strings
+
+# Bounds on the work spent on a single response.
+MAX_CANDIDATES = 5
+MAX_TRUNCATION_CUTS = 8
+MAX_COMMA_FIXES = 16
+
+Accept = Optional[Callable[[dict], bool]]
+
+
+class ExtractedJSON(NamedTuple):
+    value: dict  # {} when no object could be recovered
+    repaired: bool  # the response was truncated and closed or trimmed
+
+
+class _Scan(NamedTuple):
+    end: int  # index after the closing brace, or len(text) when truncated
+    open_containers: str  # containers still open at ``end`` ("" when complete)
+    in_string: bool  # the text ended inside a string
+    cuts: List[Tuple[int, str]]  # (comma position, containers open there)
+
+    @property
+    def complete(self) -> bool:
+        return not self.open_containers and not self.in_string
+
+
+def _scan(text: str, start: int) -> _Scan:
+    """Match the object opening at ``text[start]``, skipping string contents."""
+    stack = ""  # immutable, so each cut keeps a snapshot for free
+    cuts: List[Tuple[int, str]] = []
+    for match in _TOKEN.finditer(text, start):
+        index = match.start()
+        char = text[index]
+        if char == '"':
+            if not match.group(1):
+                return _Scan(len(text), stack, True, cuts)
+        elif char == ",":
+            cuts.append((index, stack))
+        elif char in "{[":
+            stack += char
+        else:
+            stack = stack[:-1]  # A mismatched closer still closes the innermost container
+            if not stack:
+                return _Scan(index + 1, "", False, cuts)
+    return _Scan(len(text), stack, False, cuts)
+
+
+def _closers(containers: str) -> str:
+    return "".join(_CLOSERS[c] for c in reversed(containers))
+
+
+def _decode_prefix(text: str, start: int = 0) -> Optional[Any]:
+    """
+    Decode the JSON value starting at ``start``, ignoring whatever follows it.
+
+    Trailing commas are dropped where the decoder reports them (a closer where
+    a value or key was expected), so commas inside strings are never touched
+    and each fix costs one more C decode.
+    """
+    for _ in range(MAX_COMMA_FIXES):
+        try:
+            return _DECODER.raw_decode(text, start)[0]
+        except json.JSONDecodeError as e:
+            head = text[:e.pos].rstrip()
+            if e.pos >= len(text) or text[e.pos] not in "}]" or not head.endswith(","):
+                return None
+            text = head[:-1] + text[e.pos:]
+    return None
+
+
+def _truncation_repairs(fragment: str, scan: _Scan) -> Iterator[str]:
+    """Closed versions of a truncated object, from least to most trimmed."""
+    # Close the open string and containers as they are...
+    head = fragment
+    if scan.in_string:
+        head = (head[:-1] if head.endswith("\\") else head) + '"'
+    yield head + _closers(scan.open_containers)
+    # ...or drop the incomplete last element(s), back to a previous comma.
+    for position, containers in reversed(scan.cuts[-MAX_TRUNCATION_CUTS:]):
+        yield fragment[:position] + _closers(containers)
+
+
+def _object_at(text: str, start: int, accept: Accept) -> Tuple[Optional[dict], int, bool]:
+    """
+    Recover the object opening at ``text[start]``.
+
+    Returns the object (None if unrecoverable), where to look for the next
+    candidate and whether it was repaired from a truncated response. With
+    ``accept``, truncation repairs continue until one passes it; the first
+    parsable object is returned if none does.
+    """
+    # Complete objects: the C decoder finds where they end.
+    value = _decode_prefix(text, start)
+    if isinstance(value, dict):
+        return value, start, False
+
+    # Malformed or truncated: locate it with the string-aware scan.
+    scan = _scan(text, start)
+    if scan.complete:
+        return None, scan.end, False  # Balanced but not JSON (e.g. prose "{nombre}")
+
+    first = None
+    for candidate in _truncation_repairs(text[start:scan.end], scan):
+        value = _decode_prefix(candidate)
+        if not isinstance(value, dict):
+            continue
+        if accept is None or accept(value):
+            logger.warning("Repaired truncated JSON response (%d chars)", scan.end - start)
+            return value, start, True
+        if first is None:
+            first = value
+    return first, start + 1, first is not None
+
+
+def extract_json(text: str, accept: Accept = None) -> ExtractedJSON:
+    """
+    Return the outermost JSON object in ``text``, repaired if necessary.
+
+    ``accept`` checks the expected shape (e.g. that a truncated routine still
+    validates), so a repair that only drops an incomplete trailing element
+    wins over one that keeps it half-filled. ``repaired`` tells whether the
+    object was rebuilt from a truncated response.
+    """
+    if not text:
+        return ExtractedJSON({}, False)
+
+    start = text.find("{")
+    for _ in range(MAX_CANDIDATES):
+        if start == -1:
+            break
+        value, resume, repaired = _object_at(text, start, accept)
+        if value is not None:
+            return ExtractedJSON(value, repaired)
+        start = text.find("{", max(resume, start + 1))
+
+    logger.error("JSON extraction failed — text: %s", text[:200])
+    return ExtractedJSON({}, False)
+
+
+def extract_json_object(text: str, accept: Accept = None) -> dict:
+    """``extract_json`` without the repair flag; ``{}`` when no object can be recovered."""
+    return extract_json(text, accept).value
@@ -0,0 +1,212 @@
+"""
+Incremental JSON parser for streamed LLM completions.
+
+Chunks are fed as they arrive; the parser tracks the path of the value being
+generated and emits events without re-scanning what it already consumed:
+
+- ``value`` events carry a fully parsed object/array as soon as its closing
+  bracket arrives (e.g. each ``days[i]`` of a routine).
+- ``string_delta`` events carry newly decoded text of a string value that is
+  still being generated (e.g. the "explanation" field).
+
+Paths are tuples of object keys and array indices; ``"*"`` in a watched path
+matches any key or index.
+"""
+
+import json
+import re
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+PathElement = Union[str, int]
+Path = Tuple[PathElement, ...]
+
+_STRUCTURAL = re.compile(r'[{}\[\]",:]')
+_STRING_STOP = re.compile(r'["\\]')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JSONEvent(NamedTuple):
+    kind: str  # "value" | "string_delta"
+    path: Path
+    value: Any
+
+
+class _Frame:
+    """An open object or array on the parser stack."""
+
+    __slots__ = ("is_object", "path", "key", "index", "expect_key", "start")
+
+    def __init__(self, is_object: bool, path: Path, start: Optional[int]):
+        self.is_object = is_object
+        self.path = path
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = is_object
+        self.start = start
+
+    def child_path(self) -> Path:
+        return self.path + ((self.key,) if self.is_object else (self.index,))
+
+
+def _matches(path: Path, patterns: Iterable[Path]) -> bool:
+    for pattern in patterns:
+        if len(pattern) == len(path) and all(p == "*" or p == e for p, e in zip(pattern, path)):
+            return True
+    return False
+
+
+class IncrementalJSONParser:
+    """Single-pass, resumable scanner over a growing JSON text."""
+
+    def __init__(self, value_paths: Iterable[Path] = (), string_paths: Iterable[Path] = ()):
+        self._value_paths = [tuple(p) for p in value_paths]
+        self._string_paths = [tuple(p) for p in string_paths]
+        self.buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._started = False
+        # String state
+        self._in_string = False
+        self._string_is_key = False
+        self._string_tracked: Optional[Path] = None
+        self._string_start = 0
+        self._pending_escape = ""
+        self._high_surrogate = ""
+
+    def feed(self, chunk: str) -> List[JSONEvent]:
+        """Consume a chunk and return the events it completes."""
+        self.buffer += chunk
+        events: List[JSONEvent] = []
+        text = self.buffer
+
+        while self._pos < len(text):
+            if self._in_string:
+                if not self._scan_string(text, events):
+                    break
+                continue
+
+            if not self._started:
+                # Skip any preamble (e.g. markdown fences) until the first object.
+                start = text.find("{", self._pos)
+                if start < 0:
+                    self._pos = len(text)
+                    break
+                self._pos = start
+                self._started = True
+
+            match = _STRUCTURAL.search(text, self._pos)
+            if not match:
+                self._pos = len(text)
+                break
+            char = match.group()
+            self._pos = match.end()
+            top = self._stack[-1] if self._stack else None
+
+            if char == '"':
+                self._open_string(top)
+            elif char in "{[":
+                path = top.child_path() if top else ()
+                start = match.start() if path and _matches(path, self._value_paths) else None
+                self._stack.append(_Frame(char == "{", path, start))
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                frame = self._stack.pop()
+                if frame.start is not None:
+                    try:
+                        value = json.loads(text[frame.start:self._pos])
+                        events.append(JSONEvent("value", frame.path, value))
+                    except json.JSONDecodeError:
+                        pass
+            elif char == ":" and top is not None and top.is_object:
+                top.expect_key = False
+            elif char == "," and top is not None:
+                if top.is_object:
+                    top.expect_key = True
+                    top.key = None
+                else:
+                    top.index += 1
+
+        return events
+
+    def _open_string(self, top: Optional[_Frame]) -> None:
+        self._in_string = True
+        self._string_start = self._pos
+        self._string_is_key = bool(top and top.is_object and top.expect_key)
+        self._string_tracked = None
+        if top is not None and not self._string_is_key:
+            path = top.child_path()
+            if _matches(path, self._string_paths):
+                self._string_tracked = path
+
+    def _scan_string(self, text: str, events: List[JSONEvent]) -> bool:
+        """Advance through string content; return False if more input is needed."""
+        out: List[str] = []
+        while True:
+            if self._pending_escape:
+                # Complete an escape sequence, possibly split across chunks.
+                if self._pending_escape == "\\":
+                    if self._pos >= len(text):
+                        self._flush(out, events)
+                        return False
+                    self._pending_escape += text[self._pos]
+                    self._pos += 1
+                if self._pending_escape[1] == "u":
+                    take = text[self._pos:self._pos + 6 - len(self._pending_escape)]
+                    self._pending_escape += take
+                    self._pos += len(take)
+                    if len(self._pending_escape) < 6:
+                        self._flush(out, events)
+                        return False
+                out.append(self._join_surrogates(self._decode_escape(self._pending_escape)))
+                self._pending_escape = ""
+
+            match = _STRING_STOP.search(text, self._pos)
+            if not match:
+                out.append(text[self._pos:])
+                self._pos = len(text)
+                self._flush(out, events)
+                return False
+
+            out.append(text[self._pos:match.start()])
+            self._pos = match.end()
+            if match.group() == '"':
+                self._flush(out, events)
+                self._close_string(text)
+                return True
+            self._pending_escape = "\\"
+
+    @staticmethod
+    def _decode_escape(sequence: str) -> str:
+        if sequence.startswith("\\u"):
+            try:
+                return chr(int(sequence[2:], 16))
+            except ValueError:
+                return ""
+        return _ESCAPES.get(sequence[1], sequence[1])
+
+    def _join_surrogates(self, char: str) -> str:
+        """Combine UTF-16 surrogate pairs emitted as two \\u escapes (e.g. emoji)."""
+        high, self._high_surrogate = self._high_surrogate, ""
+        if high and "\udc00" <= char <= "\udfff":
+            return chr(0x10000 + ((ord(high) - 0xD800) << 10) + (ord(char) - 0xDC00))
+        if "\ud800" <= char <= "\udbff":
+            self._high_surrogate = char
+            return high
+        return high + char
+
+    def _flush(self, out: List[str], events: List[JSONEvent]) -> None:
+        if self._string_tracked is not None:
+            delta = "".join(out)
+            if delta:
+                events.append(JSONEvent("string_delta", self._string_tracked, delta))
+        out.clear()
+
+    def _close_string(self, text: str) -> None:
+        self._in_string = False
+        if self._string_is_key and self._stack:
+            raw = text[self._string_start:self._pos - 1]
+            try:
+                self._stack[-1].key = json.loads(f'"{raw}"')
+            except json.JSONDecodeError:
+                self._stack[-1].key = raw
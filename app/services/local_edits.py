@@ -0,0 +1,270 @@
+"""
+Deterministic local edit engine for mechanical chat requests.
+
+Messages such as "cambia el descanso a 90 seg", "pon 4 series en todo",
+"quita el jueves" or "cambia sentadilla por prensa" are parsed with anchored
+patterns and applied directly to the routine, with a templated explanation.
+Values must be in a sensible range and swapped-in exercises must resolve in
+the exercise catalog. Anything that does not match a rule completely returns
+None and goes to Groq.
+"""
+
+import re
+import unicodedata
+from typing import Callable, List, Optional, Tuple
+
+from app.core.logging import get_logger
+from app.models.models import Day, Routine
+from app.services.exercise_catalog import get_exercise_catalog
+
+logger = get_logger("services.local_edits")
+
+LocalEditResult = Tuple[Routine, str]
+
+_WEEKDAYS = ("lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo")
+_WEEKDAY = r"(?P<day>" + "|".join(_WEEKDAYS) + r")"
+_ALL = r"(?:todo|todos|todos los ejercicios|toda la rutina|la rutina|cada ejercicio)"
+_SCOPE = (
+    r"(?:\s+(?:en|para|a)\s+" + _ALL
+    + r"|\s+(?:el|del|en el|para el)\s+(?:dia\s+)?" + _WEEKDAY + r")?"
+)
+_POLITE_PREFIX = re.compile(
+    r"^(?:(?:por favor|porfa|puedes|podrias|quiero que|me gustaria que),?\s+)+"
+)
+_POLITE_SUFFIX = re.compile(r"(?:,?\s+(?:por favor|porfa|gracias))+$")
+
+# Accepted values; anything outside goes to the model.
+_SETS_RANGE = (1, 10)
+_REPS_RANGE = (1, 50)
+_REST_SECONDS_RANGE = (10, 600)
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents one character at a time (keeps offsets aligned)."""
+    return "".join(unicodedata.normalize("NFKD", c)[:1].lower() or c for c in text)
+
+
+def _normalize(text: str) -> str:
+    """Fold accents/case and collapse whitespace."""
+    return _fold(" ".join(text.split()))
+
+
+def _prepare(message: str) -> Tuple[str, str]:
+    """
+    Return (folded, display) versions of a message with the same offsets:
+    punctuation at the ends and polite phrases are stripped from both.
+    """
+    display = " ".join(message.split()).strip(" .!¡?¿,;")
+    text = _fold(display)
+    prefix = _POLITE_PREFIX.match(text)
+    start = prefix.end() if prefix else 0
+    suffix = _POLITE_SUFFIX.search(text, start)
+    end = suffix.start() if suffix else len(text)
+    return text[start:end], display[start:end]
+
+
+def _target_days(routine: Routine, weekday: Optional[str]) -> Optional[List[Day]]:
+    """Days affected by an edit: all of them, or those matching a weekday (None if absent)."""
+    if not weekday:
+        return routine.days
+    days = [d for d in routine.days if weekday in _normalize(d.day_name)]
+    return days or None
+
+
+def _scope_label(weekday: Optional[str], routine: Routine) -> str:
+    if not weekday:
+        return "en todos los ejercicios"
+    day = next(d for d in routine.days if weekday in _normalize(d.day_name))
+    return f"en los ejercicios del {day.day_name}"
+
+
+def _valid_range(low: int, high: Optional[int], bounds: Tuple[int, int]) -> bool:
+    """Both ends within ``bounds`` and not reversed ("90-60")."""
+    minimum, maximum = bounds
+    if high is None:
+        return minimum <= low <= maximum
+    return minimum <= low <= high <= maximum
+
+
+def _updated(count: int) -> str:
+    return f"({count} ejercicio actualizado)" if count == 1 else f"({count} ejercicios actualizados)"
+
+
+def _format_seconds(low: int, high: Optional[int]) -> str:
+    if high is not None:
+        return f"{low}-{high} seg"
+    return f"{low} seg"
+
+
+# --- Rules ---
+
+_REST = re.compile(
+    r"^(?:cambia|cambiar|pon|poner|ajusta|ajustar|establece|deja|sube|baja)\s+"
+    r"(?:el |los )?descansos?\s+(?:a|en|de)\s+"
+    r"(?P<low>\d{1,3})(?:\s*(?:-|a)\s*(?P<high>\d{1,3}))?\s*"
+    r"(?P<unit>s|seg|segs|segundos?|min|mins|minutos?)" + _SCOPE + r"$"
+)
+
+_SETS = re.compile(
+    r"^(?:(?:pon|poner|haz|hacer|quiero)\s+(?P<n1>\d{1,2})\s+series"
+    r"|(?:cambia|cambiar|ajusta|ajustar|deja|sube|baja)\s+(?:las\s+)?series\s+(?:a|en)\s+(?P<n2>\d{1,2}))"
+    + _SCOPE + r"$"
+)
+
+_REPS = re.compile(
+    r"^(?:cambia|cambiar|pon|poner|ajusta|ajustar|deja)\s+(?:las\s+)?(?:repeticiones|reps)\s+(?:a|en)\s+"
+    r"(?P<low>\d{1,2})(?:\s*(?:-|a)\s*(?P<high>\d{1,2}))?" + _SCOPE + r"$"
+)
+
+_REMOVE_DAY = re.compile(
+    r"^(?:quita|quitar|elimina|eliminar|borra|borrar|saca|sacar)\s+(?:el\s+)?(?:dia\s+(?:del?\s+)?)?"
+    + _WEEKDAY + r"$"
+)
+
+_SWAP = re.compile(
+    r"^(?:cambia|cambiar|reemplaza|reemplazar|sustituye|sustituir)\s+(?:el |la |los |las )?"
+    r"(?P<old>[a-z0-9 ]{3,40}?)\s+por\s+(?:el |la |los |las |un |una )?(?P<new>[a-z0-9 ]{3,40})$"
+)
+
+
+def _edit_rest(routine: Routine, match: re.Match, display: str) -> Optional[LocalEditResult]:
+    factor = 60 if match.group("unit").startswith("min") else 1
+    low, high = int(match.group("low")) * factor, _int_or_none(match.group("high"))
+    high = high * factor if high is not None else None
+    if not _valid_range(low, high, _REST_SECONDS_RANGE):
+        return None
+    days = _target_days(routine, match.group("day"))
+    if days is None:
+        return None
+    rest = _format_seconds(low, high)
+    count = 0
+    for day in days:
+        for exercise in day.exercises:
+            exercise.rest = rest
+            count += 1
+    return routine, (
+        f"¡Listo! He ajustado el descanso a {rest} {_scope_label(match.group('day'), routine)} "
+        f"{_updated(count)}. Respeta estos tiempos para mantener la intensidad de cada serie."
+    )
+
+
+def _edit_sets(routine: Routine, match: re.Match, display: str) -> Optional[LocalEditResult]:
+    sets = int(match.group("n1") or match.group("n2"))
+    if not _valid_range(sets, None, _SETS_RANGE):
+        return None
+    days = _target_days(routine, match.group("day"))
+    if days is None:
+        return None
+    count = 0
+    for day in days:
+        for exercise in day.exercises:
+            exercise.sets = sets
+            count += 1
+    return routine, (
+        f"¡Hecho! Ahora haces {sets} {'serie' if sets == 1 else 'series'} "
+        f"{_scope_label(match.group('day'), routine)} {_updated(count)}. Ajusta el peso para mantener el RIR indicado."
+    )
+
+
+def _edit_reps(routine: Routine, match: re.Match, display: str) -> Optional[LocalEditResult]:
+    low, high = int(match.group("low")), _int_or_none(match.group("high"))
+    if not _valid_range(low, high, _REPS_RANGE):
+        return None
+    days = _target_days(routine, match.group("day"))
+    if days is None:
+        return None
+    reps = f"{low}-{high}" if high is not None else str(low)
+    count = 0
+    for day in days:
+        for exercise in day.exercises:
+            exercise.reps = reps
+            count += 1
+    return routine, (
+        f"¡Listo! He cambiado las repeticiones a {reps} {_scope_label(match.group('day'), routine)} "
+        f"{_updated(count)}."
+    )
+
+
+def _edit_remove_day(routine: Routine, match: re.Match, display: str) -> Optional[LocalEditResult]:
+    weekday = match.group("day")
+    removed = [d for d in routine.days if weekday in _normalize(d.day_name)]
+    if not removed or len(removed) == len(routine.days):
+        return None
+    routine.days = [d for d in routine.days if d not in removed]
+    names = ", ".join(d.day_name for d in removed)
+    remaining = len(routine.days)
+    return routine, (
+        f"He quitado el {names} de tu rutina. Ahora entrenas {remaining} {'día' if remaining == 1 else 'días'} "
+        f"a la semana; "
+        f"aprovecha el día libre para descansar y recuperarte."
+    )
+
+
+def _edit_swap(routine: Routine, match: re.Match, display: str) -> Optional[LocalEditResult]:
+    old = match.group("old").strip()
+    catalog = get_exercise_catalog()
+    # Only exercises the catalog knows are swapped in, with their catalog name
+    # and equipment; free text ("algo más fácil", "pecho") goes to the model.
+    known = catalog.lookup(match.group("new").strip())
+    if known is None:
+        return None
+    exercises = [exercise for day in routine.days for exercise in day.exercises]
+    targets = [e for e in exercises if _normalize(e.name) == old]
+    if not targets:
+        # A partial name is only safe when it resolves, through the catalog, to
+        # the one distinct exercise it matches ("jalon" -> "Jalón al pecho");
+        # "press" matching several presses, or "pecho" inside "Press de pecho",
+        # is left to the model.
+        partial = [e for e in exercises if re.search(rf"\b{re.escape(old)}\b", _normalize(e.name))]
+        if len({_normalize(e.name) for e in partial}) != 1:
+            return None
+        resolved = catalog.lookup(old)
+        if resolved is None or resolved != catalog.lookup(partial[0].name):
+            return None
+        targets = partial
+    old_name = targets[0].name
+    new_name = known.name
+    if _normalize(old_name) == _normalize(new_name):
+        return None  # Already that exercise
+    for exercise in targets:
+        exercise.name = new_name
+        exercise.equipment = known.equipment_label
+    times = "vez" if len(targets) == 1 else "veces"
+    return routine, (
+        f"¡Cambio hecho! He sustituido {old_name} por {new_name} "
+        f"({len(targets)} {times} en la rutina), manteniendo series, repeticiones y descansos."
+    )
+
+
+def _int_or_none(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+
+_RULES: List[Tuple[re.Pattern, Callable[[Routine, re.Match, str], Optional[LocalEditResult]]]] = [
+    (_REST, _edit_rest),
+    (_SETS, _edit_sets),
+    (_REPS, _edit_reps),
+    (_REMOVE_DAY, _edit_remove_day),
+    (_SWAP, _edit_swap),
+]
+
+
+def apply_local_edit(routine: Routine, message: str) -> Optional[LocalEditResult]:
+    """
+    Apply a mechanical edit without the LLM.
+
+    Returns (modified routine, explanation), or None when the message is not
+    a high-confidence match for one of the supported edits.
+    """
+    text, display = _prepare(message)
+    if not text or len(text) > 120:
+        return None
+
+    for pattern, handler in _RULES:
+        match = pattern.match(text)
+        if match:
+            result = handler(routine.model_copy(deep=True), match, display)
+            if result is not None:
+                logger.info("Applied local edit (%s) to routine %s", handler.__name__, routine.id)
+            return result
+    return None
@@ -0,0 +1,221 @@
+"""
+Deterministic routine synthesizer built on the local exercise catalog.
+
+Produces a complete routine instantly, without Groq, following the same rules
+as the initial generation prompt: 4-6 exercises per day, Spanish weekday
+names, RIR per exercise, and rest times by exercise class (heavy compounds
+120-180 seg, secondary compounds 90-120 seg, isolation 45-60 seg). Used as a
+degraded-mode fallback and as an instant draft.
+"""
+
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from app.models.models import Day, Exercise, Routine
+from app.schemas.routines import RoutineRequest
+from app.services.exercise_catalog import (
+    COMPOUND,
+    HEAVY,
+    ISOLATION,
+    ExerciseCatalog,
+    fold_text,
+    get_exercise_catalog,
+    parse_equipment,
+)
+
+REST_BY_KIND = {HEAVY: "120-180 seg", COMPOUND: "90-120 seg", ISOLATION: "45-60 seg"}
+
+# Reps by goal and exercise class
+_REPS = {
+    "fuerza": {HEAVY: "4-6", COMPOUND: "6-8", ISOLATION: "10-12"},
+    "hipertrofia": {HEAVY: "6-8", COMPOUND: "8-12", ISOLATION: "12-15"},
+    "resistencia": {HEAVY: "8-10", COMPOUND: "10-15", ISOLATION: "15-20"},
+}
+
+# RIR by experience level and exercise class
+_RIR = {
+    "principiante": {HEAVY: "3-4", COMPOUND: "2-3", ISOLATION: "2-3"},
+    "intermedio": {HEAVY: "2-3", COMPOUND: "1-2", ISOLATION: "1-2"},
+    "avanzado": {HEAVY: "1-2", COMPOUND: "1-2", ISOLATION: "0"},
+}
+
+_SETS = {HEAVY: 4, COMPOUND: 3, ISOLATION: 3}
+MIN_EXERCISES_PER_DAY = 4
+
+# A day template is a focus label plus ordered (pattern-or-muscle, class) slots.
+Slot = Tuple[str, str]
+_TEMPLATES: Dict[str, Tuple[str, List[Slot]]] = {
+    "full": ("Cuerpo completo", [
+        ("sentadilla", HEAVY), ("empuje horizontal", COMPOUND), ("tiron vertical", COMPOUND),
+        ("bisagra", COMPOUND), ("empuje vertical", COMPOUND), ("core", ISOLATION),
+    ]),
+    "push": ("Empuje: pecho, hombros y tríceps", [
+        ("empuje horizontal", HEAVY), ("empuje vertical", COMPOUND), ("empuje horizontal", COMPOUND),
+        ("hombros", ISOLATION), ("pecho", ISOLATION), ("triceps", ISOLATION),
+    ]),
+    "pull": ("Tirón: espalda y bíceps", [
+        ("tiron vertical", COMPOUND), ("tiron horizontal", COMPOUND), ("tiron horizontal", COMPOUND),
+        ("espalda", ISOLATION), ("biceps", ISOLATION), ("biceps", ISOLATION),
+    ]),
+    "legs": ("Pierna: cuádriceps, isquiotibiales y glúteos", [
+        ("sentadilla", HEAVY), ("bisagra", COMPOUND), ("zancada", COMPOUND),
+        ("cuadriceps", ISOLATION), ("isquiotibiales", ISOLATION), ("gemelos", ISOLATION),
+    ]),
+    "upper": ("Torso: pecho, espalda y brazos", [
+        ("empuje horizontal", HEAVY), ("tiron horizontal", COMPOUND), ("empuje vertical", COMPOUND),
+        ("tiron vertical", COMPOUND), ("biceps", ISOLATION), ("triceps", ISOLATION),
+    ]),
+    "lower": ("Pierna y glúteos", [
+        ("sentadilla", HEAVY), ("bisagra", COMPOUND), ("zancada", COMPOUND),
+        ("gluteos", COMPOUND), ("isquiotibiales", ISOLATION), ("gemelos", ISOLATION),
+    ]),
+}
+
+_SPLITS: Dict[int, Tuple[str, List[str]]] = {
+    1: ("Cuerpo completo", ["full"]),
+    2: ("Cuerpo completo", ["full", "full"]),
+    3: ("Empuje/Tirón/Pierna", ["push", "pull", "legs"]),
+    4: ("Torso/Pierna", ["upper", "lower", "upper", "lower"]),
+    5: ("Híbrida", ["push", "pull", "legs", "upper", "lower"]),
+    6: ("Empuje/Tirón/Pierna", ["push", "pull", "legs", "push", "pull", "legs"]),
+    7: ("Empuje/Tirón/Pierna", ["push", "pull", "legs", "push", "pull", "legs", "full"]),
+}
+
+_WEEKDAYS: Dict[int, List[str]] = {
+    1: ["Lunes"],
+    2: ["Lunes", "Jueves"],
+    3: ["Lunes", "Miércoles", "Viernes"],
+    4: ["Lunes", "Martes", "Jueves", "Viernes"],
+    5: ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes"],
+    6: ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado"],
+    7: ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"],
+}
+
+_JOINT_KEYWORDS = {
+    "rodilla": "rodilla",
+    "menisco": "rodilla",
+    "lumbar": "espalda baja",
+    "espalda": "espalda baja",
+    "hernia": "espalda baja",
+    "hombro": "hombro",
+    "manguito": "hombro",
+    "codo": "codo",
+}
+
+
+def _goal(goals: str) -> str:
+    folded = fold_text(goals)
+    if "fuerza" in folded or "powerlifting" in folded:
+        return "fuerza"
+    if any(k in folded for k in ("resistencia", "perder", "grasa", "adelgaz", "definir", "tonific", "cardio")):
+        return "resistencia"
+    return "hipertrofia"
+
+
+def _level(experience: str) -> str:
+    folded = fold_text(experience)
+    if "avanzad" in folded:
+        return "avanzado"
+    if "intermedi" in folded:
+        return "intermedio"
+    return "principiante" if folded else "intermedio"
+
+
+def _exercises_per_day(time_per_session: str) -> int:
+    folded = fold_text(time_per_session)
+    match = re.search(r"\d+(?:[.,]\d+)?", folded)
+    if not match:
+        return 5
+    minutes = float(match.group().replace(",", "."))
+    if re.search(r"\bh(?:ora|oras|r|rs)?\b", folded) and "min" not in folded:
+        minutes *= 60
+    if minutes <= 30:
+        return 4
+    if minutes <= 45:
+        return 5
+    return 6
+
+
+def _avoid_joints(health_conditions: str) -> FrozenSet[str]:
+    folded = fold_text(health_conditions)
+    return frozenset(joint for keyword, joint in _JOINT_KEYWORDS.items() if keyword in folded)
+
+
+def _default_days(level: str) -> int:
+    return {"principiante": 3, "intermedio": 4, "avanzado": 5}[level]
+
+
+class OfflineRoutine(Routine):
+    """A routine synthesized from the catalog, so callers can tell it from a generated one."""
+
+
+def synthesize_routine(request: RoutineRequest, catalog: Optional[ExerciseCatalog] = None) -> OfflineRoutine:
+    """Build a complete routine from the request using only the local catalog."""
+    catalog = catalog or get_exercise_catalog()
+    goal = _goal(request.goals)
+    level = _level(request.experience_level)
+    equipment = parse_equipment(request.available_equipment or request.equipment)
+    avoid = _avoid_joints(request.health_conditions)
+    per_day = _exercises_per_day(request.time_per_session)
+    days_count = request.days or _default_days(level)
+
+    split_name, templates = _SPLITS[days_count]
+    if level == "principiante" and days_count == 3:
+        split_name, templates = "Cuerpo completo", ["full"] * 3
+
+    occurrences: Dict[str, int] = {}
+    days: List[Day] = []
+    for weekday, template in zip(_WEEKDAYS[days_count], templates):
+        variant = occurrences.get(template, 0)
+        occurrences[template] = variant + 1
+        focus, slots = _TEMPLATES[template]
+        exercises = _fill_day(catalog, slots, per_day, variant, goal, level, equipment, avoid)
+        days.append(Day(day_name=weekday, focus=focus, exercises=exercises))
+
+    return OfflineRoutine(
+        user_id=request.user_id,
+        routine_name=f"Rutina {split_name} de {days_count} días ({goal})",
+        days=days,
+    )
+
+
+def _fill_day(
+    catalog: ExerciseCatalog,
+    slots: List[Slot],
+    per_day: int,
+    variant: int,
+    goal: str,
+    level: str,
+    equipment: FrozenSet[str],
+    avoid: FrozenSet[str],
+) -> List[Exercise]:
+    """
+    Pick one exercise per slot, rotating variants so repeated days differ.
+    With little equipment some slots stay empty; core work fills the day up
+    to the minimum of 4 exercises.
+    """
+    chosen: List[Exercise] = []
+
+    def add(target: str, kind: str) -> bool:
+        candidates = catalog.find(target, kind, equipment, avoid) or catalog.find(target, None, equipment, avoid)
+        candidates = [c for c in candidates if all(c.name != e.name for e in chosen)]
+        if not candidates:
+            return False
+        pick = candidates[variant % len(candidates)]
+        chosen.append(Exercise(
+            name=pick.name,
+            sets=_SETS[pick.kind] - (1 if level == "principiante" and pick.kind == HEAVY else 0),
+            reps="30-45 seg" if pick.muscle == "core" else _REPS[goal][pick.kind],
+            rest=REST_BY_KIND[pick.kind],
+            rir=_RIR[level][pick.kind],
+            equipment=pick.equipment_label,
+        ))
+        return True
+
+    for target, kind in slots:
+        if len(chosen) >= per_day:
+            break
+        add(target, kind)
+    while len(chosen) < MIN_EXERCISES_PER_DAY and add("core", ISOLATION):
+        pass
+    return chosen
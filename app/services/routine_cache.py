@@ -0,0 +1,120 @@
+"""
+Two-tier cache for generated routines.
+
+Requests are keyed on a normalized fingerprint so that near-identical requests
+("Hipertrofia, 4 días" vs "hipertrofia,  4 dias") share one generation.
+Tier 1 is an in-process LRU with TTL; tier 2 is the database, shared by all
+gunicorn workers.
+"""
+
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.logging import get_logger
+from app.models.models import Routine
+from app.repositories import cache_repository
+from app.schemas.routines import RoutineRequest
+
+logger = get_logger("services.routine_cache")
+
+_LIST_SEPARATORS = re.compile(r"[,;/+\n]|\by\b|\band\b")
+
+
+def _normalize_text(value: str) -> str:
+    """Case-fold, strip accents and collapse whitespace."""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return " ".join(value.casefold().split())
+
+
+def _normalize_list(value: str) -> str:
+    """Normalize a free-text list (e.g. equipment) into a sorted, de-duplicated form."""
+    items = {_normalize_text(item) for item in _LIST_SEPARATORS.split(_normalize_text(value))}
+    return ",".join(sorted(item for item in items if item))
+
+
+def fingerprint_request(request: RoutineRequest, namespace: str = "") -> str:
+    """Stable fingerprint of the fields that influence the generated routine."""
+    normalized = {
+        "namespace": namespace,
+        "goals": _normalize_text(request.goals),
+        "days": request.days,
+        "experience_level": _normalize_text(request.experience_level),
+        "equipment": _normalize_list(request.equipment),
+        "available_equipment": _normalize_list(request.available_equipment),
+        "time_per_session": _normalize_text(request.time_per_session),
+        "health_conditions": _normalize_text(request.health_conditions),
+    }
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RoutineCache:
+    """In-process LRU (with TTL) backed by a DB tier shared across workers."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: int = 86400, use_db: bool = True):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._use_db = use_db
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def get(self, fingerprint: str) -> Optional[Routine]:
+        """Return a fresh copy of the cached routine, or None on a miss."""
+        entry = self._entries.get(fingerprint)
+        if entry is not None:
+            expires_at, routine_json = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(fingerprint)
+                self.memory_hits += 1
+                return Routine.model_validate_json(routine_json)
+            del self._entries[fingerprint]
+
+        if self._use_db:
+            try:
+                routine_json = await cache_repository.get_cached_routine(fingerprint, self._ttl)
+            except Exception as e:
+                logger.warning("Routine cache DB lookup failed: %s", e)
+                routine_json = None
+            if routine_json:
+                self._remember(fingerprint, routine_json)
+                self.db_hits += 1
+                return Routine.model_validate_json(routine_json)
+
+        self.misses += 1
+        return None
+
+    async def set(self, fingerprint: str, routine: Routine) -> None:
+        """Store a routine (without identity fields) in both tiers."""
+        routine_json = routine.model_dump_json(exclude={"id", "created_at", "updated_at"})
+        self._remember(fingerprint, routine_json)
+
+        if self._use_db:
+            try:
+                await cache_repository.save_cached_routine(fingerprint, routine_json, self._ttl)
+            except Exception as e:
+                logger.warning("Routine cache DB store failed: %s", e)
+
+    def _remember(self, fingerprint: str, routine_json: str) -> None:
+        self._entries[fingerprint] = (time.monotonic() + self._ttl, routine_json)
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring."""
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else 0.0,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,172 @@
+"""
+RFC 6902 (JSON Patch) support for routine modifications.
+
+The model returns a short list of operations against the routine document
+(e.g. ``{"op": "replace", "path": "/days/0/exercises/1/name", "value": "Prensa"}``)
+instead of the whole routine. Operations are applied and validated locally.
+"""
+
+import copy
+from typing import Any, List
+
+from pydantic import ValidationError
+
+from app.models.models import Routine
+
+_IDENTITY_FIELDS = {"id", "user_id", "created_at", "updated_at"}
+_OPS = {"add", "remove", "replace", "move", "copy", "test"}
+
+
+class RoutinePatchError(ValueError):
+    """Raised when a patch is malformed, does not apply, or yields an invalid routine."""
+
+
+def _parse_pointer(pointer: Any) -> List[str]:
+    """Split a JSON Pointer (RFC 6901) into unescaped reference tokens."""
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise RoutinePatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _list_index(container: list, token: str, allow_end: bool) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise RoutinePatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    upper = len(container) if allow_end else len(container) - 1
+    if index > upper:
+        raise RoutinePatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _get(document: Any, tokens: List[str]) -> Any:
+    node = document
+    for token in tokens:
+        if isinstance(node, list):
+            node = node[_list_index(node, token, allow_end=False)]
+        elif isinstance(node, dict):
+            if token not in node:
+                raise RoutinePatchError(f"Path not found: /{'/'.join(tokens)}")
+            node = node[token]
+        else:
+            raise RoutinePatchError(f"Path not found: /{'/'.join(tokens)}")
+    return node
+
+
+def _add(document: Any, tokens: List[str], value: Any) -> None:
+    parent = _get(document, tokens[:-1])
+    last = tokens[-1]
+    if isinstance(parent, list):
+        parent.insert(_list_index(parent, last, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[last] = value
+    else:
+        raise RoutinePatchError(f"Cannot add to a scalar at /{'/'.join(tokens)}")
+
+
+def _remove(document: Any, tokens: List[str]) -> Any:
+    parent = _get(document, tokens[:-1])
+    last = tokens[-1]
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, last, allow_end=False))
+    if isinstance(parent, dict) and last in parent:
+        return parent.pop(last)
+    raise RoutinePatchError(f"Path not found: /{'/'.join(tokens)}")
+
+
+def _replace(document: Any, tokens: List[str], value: Any) -> None:
+    parent = _get(document, tokens[:-1])
+    last = tokens[-1]
+    if isinstance(parent, list):
+        parent[_list_index(parent, last, allow_end=False)] = value
+    elif isinstance(parent, dict) and last in parent:
+        parent[last] = value
+    else:
+        raise RoutinePatchError(f"Path not found: /{'/'.join(tokens)}")
+
+
+def apply_json_patch(document: dict, operations: List[dict]) -> dict:
+    """Apply RFC 6902 operations to a copy of ``document`` and return it."""
+    if not isinstance(operations, list):
+        raise RoutinePatchError("Patch must be a list of operations")
+
+    result = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get("op") not in _OPS:
+            raise RoutinePatchError(f"Unsupported operation: {operation!r}")
+
+        op = operation["op"]
+        tokens = _parse_pointer(operation.get("path"))
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise RoutinePatchError(f"Operation '{op}' requires a value")
+
+        if op == "add":
+            _add(result, tokens, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(result, tokens)
+        elif op == "replace":
+            _replace(result, tokens, copy.deepcopy(operation["value"]))
+        elif op == "test":
+            if _get(result, tokens) != operation["value"]:
+                raise RoutinePatchError(f"Test failed at {operation['path']}")
+        else:  # move / copy
+            source = _parse_pointer(operation.get("from"))
+            if op == "move":
+                if tokens[:len(source)] == source and tokens != source:
+                    raise RoutinePatchError("Cannot move a value into one of its children")
+                _add(result, tokens, _remove(result, source))
+            else:
+                _add(result, tokens, copy.deepcopy(_get(result, source)))
+
+    return result
+
+
+def apply_routine_patch(routine: Routine, operations: List[dict]) -> Routine:
+    """
+    Apply a JSON Patch to a routine and validate the result.
+
+    Identity fields (id, user_id, timestamps) are not patchable and are
+    carried over from the original routine.
+    """
+    document = routine.model_dump(mode="json", exclude=_IDENTITY_FIELDS)
+    for operation in operations if isinstance(operations, list) else []:
+        path = operation.get("path") if isinstance(operation, dict) else None
+        if isinstance(path, str) and path.lstrip("/").split("/")[0] in _IDENTITY_FIELDS:
+            raise RoutinePatchError(f"Field is not patchable: {path}")
+
+    patched = apply_json_patch(document, operations)
+    if not isinstance(patched, dict):
+        raise RoutinePatchError("Patch must produce a routine object")
+
+    patched.update(routine.model_dump(include=_IDENTITY_FIELDS))
+    try:
+        return Routine.model_validate(patched)
+    except ValidationError as e:
+        raise RoutinePatchError(f"Patched routine is invalid: {e}") from e
+
+
+def diff_routines(before: Routine, after: Routine) -> List[dict]:
+    """
+    Day-level JSON Patch that turns ``before`` into ``after``.
+
+    Not minimal (a changed day is replaced whole), but compact enough to
+    store and replay: ``apply_routine_patch(before, diff_routines(before, after))``
+    reproduces ``after``.
+    """
+    old = before.model_dump(mode="json", exclude=_IDENTITY_FIELDS)
+    new = after.model_dump(mode="json", exclude=_IDENTITY_FIELDS)
+    operations: List[dict] = []
+
+    if old["routine_name"] != new["routine_name"]:
+        operations.append({"op": "replace", "path": "/routine_name", "value": new["routine_name"]})
+
+    old_days, new_days = old["days"], new["days"]
+    for index in range(min(len(old_days), len(new_days))):
+        if old_days[index] != new_days[index]:
+            operations.append({"op": "replace", "path": f"/days/{index}", "value": new_days[index]})
+    for day in new_days[len(old_days):]:
+        operations.append({"op": "add", "path": "/days/-", "value": day})
+    for index in range(len(old_days) - 1, len(new_days) - 1, -1):
+        operations.append({"op": "remove", "path": f"/days/{index}"})
+    return operations
@@ -0,0 +1,204 @@
+"""
+Semantic cache for chat modifications.
+
+Rephrasings of the same request on the same routine ("más pecho" /
+"quiero enfocarme más en pectorales") reuse a previous answer instead of
+calling Groq. Messages are embedded offline with a hashing vectorizer
+(canonicalized words + bigrams, signed feature hashing) into a NumPy matrix;
+lookups are a vectorized cosine top-k restricted to entries recorded for the
+same routine content. Each entry stores a JSON Patch and the explanation.
+Memory is bounded by a fixed-size matrix with LRU slot eviction.
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.core.logging import get_logger
+from app.models.models import Routine
+from app.services.routine_patch import RoutinePatchError, apply_routine_patch, diff_routines
+
+logger = get_logger("services.semantic_cache")
+
+_STOPWORDS = frozenset(
+    "a al algo con de del el en es esta este esto hacer haz la las le lo los me mi mis "
+    "para por porfa favor podrias puedes que quiero quisiera gustaria rutina se su tu un "
+    "una unos unas y ya hola gracias oye bueno vale ok".split()
+)
+
+# Canonical forms so common rephrasings map to the same tokens.
+_SYNONYMS: Dict[str, str] = {
+    # Direction
+    "aumenta": "mas", "aumentar": "mas", "incrementa": "mas", "incrementar": "mas",
+    "enfocarme": "mas", "enfocar": "mas", "enfoque": "mas", "enfocate": "mas",
+    "centrarme": "mas", "priorizar": "mas", "prioriza": "mas", "extra": "mas",
+    "reduce": "menos", "reducir": "menos", "disminuye": "menos", "disminuir": "menos",
+    "baja": "menos", "bajar": "menos",
+    "quita": "quitar", "quitale": "quitar", "elimina": "quitar", "eliminar": "quitar",
+    "borra": "quitar", "borrar": "quitar", "saca": "quitar", "sacar": "quitar",
+    "anade": "anadir", "agrega": "anadir", "agregar": "anadir", "incluye": "anadir",
+    "incluir": "anadir", "mete": "anadir", "meter": "anadir", "pon": "anadir", "poner": "anadir",
+    "cambia": "cambiar", "reemplaza": "cambiar", "reemplazar": "cambiar",
+    "sustituye": "cambiar", "sustituir": "cambiar",
+    # Muscles
+    "pectoral": "pecho", "pectorales": "pecho", "pecs": "pecho",
+    "dorsal": "espalda", "dorsales": "espalda",
+    "deltoide": "hombro", "deltoides": "hombro", "hombros": "hombro",
+    "pierna": "piernas", "cuadriceps": "piernas", "femoral": "isquios", "femorales": "isquios",
+    "isquiotibiales": "isquios", "gluteo": "gluteos", "culo": "gluteos",
+    "abdominales": "abdomen", "abs": "abdomen", "core": "abdomen",
+    "brazo": "brazos",
+    # Intensity / volume
+    "intensa": "intensidad", "intenso": "intensidad", "dura": "intensidad", "duro": "intensidad",
+    "facil": "menos_intensidad", "suave": "menos_intensidad", "ligera": "menos_intensidad",
+    "corta": "menos_tiempo", "rapida": "menos_tiempo", "larga": "mas_tiempo",
+}
+
+_TOKEN = re.compile(r"[a-z0-9ñ]+")
+_NUMBER = re.compile(r"\d+")
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def _tokens(message: str) -> List[str]:
+    """Canonical content words, with consecutive duplicates collapsed."""
+    tokens: List[str] = []
+    for word in _TOKEN.findall(_fold(message)):
+        if word in _STOPWORDS:
+            continue
+        word = _SYNONYMS.get(word, word)
+        if not tokens or tokens[-1] != word:
+            tokens.append(word)
+    return tokens
+
+
+def _feature_index(feature: str, dim: int) -> Tuple[int, float]:
+    # crc32 is stable across processes, unlike hash()
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+
+class HashingVectorizer:
+    """Offline bag-of-words + bigrams embedding via signed feature hashing."""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def embed(self, message: str) -> np.ndarray:
+        tokens = _tokens(message)
+        features = [(t, 1.0) for t in tokens]
+        features += [(f"{a} {b}", 0.5) for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in features:
+            index, sign = _feature_index(feature, self.dim)
+            vector[index] += sign * weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def routine_fingerprint(routine: Routine) -> str:
+    """Hash of the routine content (ignores identity fields and timestamps)."""
+    payload = routine.model_dump(mode="json", include={"routine_name", "days"})
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class CachedModification(NamedTuple):
+    patch: List[dict]
+    explanation: str
+    numbers: Tuple[str, ...]
+
+
+class SemanticModificationCache:
+    """Bounded, in-memory nearest-neighbour cache of modification results."""
+
+    def __init__(self, max_entries: int = 1024, threshold: float = 0.9, dim: int = 1024, top_k: int = 3):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.top_k = top_k
+        self._vectorizer = HashingVectorizer(dim)
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._routine_keys = np.zeros(max_entries, dtype=np.int64)
+        self._occupied = np.zeros(max_entries, dtype=bool)
+        self._entries: List[Optional[CachedModification]] = [None] * max_entries
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _routine_key(routine: Routine) -> int:
+        return int(routine_fingerprint(routine)[:15], 16)
+
+    def _search(self, key: int, vector: np.ndarray) -> List[Tuple[int, float]]:
+        """Top-k (slot, cosine) among entries for the same routine content."""
+        slots = np.flatnonzero(self._occupied & (self._routine_keys == key))
+        if slots.size == 0 or not vector.any():
+            return []
+        scores = self._vectors[slots] @ vector
+        k = min(self.top_k, slots.size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(slots[i]), float(scores[i])) for i in best]
+
+    def get(self, routine: Routine, message: str) -> Optional[Tuple[Routine, str]]:
+        """Return (modified routine, explanation) for a close enough earlier request."""
+        numbers = tuple(_NUMBER.findall(message))
+        for slot, score in self._search(self._routine_key(routine), self._vectorizer.embed(message)):
+            if score < self.threshold:
+                break
+            entry = self._entries[slot]
+            # "4 series" and "5 series" embed almost identically; numbers must match.
+            if entry.numbers != numbers:
+                continue
+            try:
+                modified = apply_routine_patch(routine, entry.patch)
+            except RoutinePatchError:
+                continue
+            self._lru.move_to_end(slot)
+            self.hits += 1
+            logger.info("Semantic cache hit (%.3f) for %r", score, message[:60])
+            return modified, entry.explanation
+        self.misses += 1
+        return None
+
+    def set(self, routine: Routine, message: str, modified: Routine, explanation: str) -> None:
+        vector = self._vectorizer.embed(message)
+        if not vector.any():
+            return
+        key = self._routine_key(routine)
+
+        # Replace a near-duplicate entry instead of filling another slot
+        matches = self._search(key, vector)
+        if matches and matches[0][1] >= 0.999:
+            slot = matches[0][0]
+        elif len(self._lru) < self.max_entries:
+            slot = int(np.flatnonzero(~self._occupied)[0])
+        else:
+            slot, _ = self._lru.popitem(last=False)
+
+        self._vectors[slot] = vector
+        self._routine_keys[slot] = key
+        self._occupied[slot] = True
+        self._entries[slot] = CachedModification(
+            diff_routines(routine, modified), explanation, tuple(_NUMBER.findall(message))
+        )
+        self._lru[slot] = None
+        self._lru.move_to_end(slot)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,64 @@
+"""
+Single-flight coalescing for identical in-flight AI requests.
+
+Concurrent callers that ask for the same key share one underlying asyncio
+task: the first caller starts it, later callers await the same result.
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from app.core.logging import get_logger
+
+logger = get_logger("services.single_flight")
+
+T = TypeVar("T")
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of a request payload (model, messages, options...)."""
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Share one in-flight call among all concurrent callers with the same key.
+
+    - Cancelling a waiter never cancels the shared call (``asyncio.shield``).
+    - Exceptions raised by the shared call are re-raised in every waiter.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Run ``factory()`` once per key at a time and return its result to every caller."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+            logger.debug("Coalesced duplicate in-flight request %s", key[:12])
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    def is_pending(self, key: str) -> bool:
+        """Whether a call for ``key`` is in flight (a new caller would share it)."""
+        return key in self._inflight
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,15 @@
+"""
+Gunicorn worker class for production.
+
+Gunicorn cannot pass uvicorn options on the command line, so the WebSocket
+message size limit is set here: oversized frames are refused by the
+protocol layer (close code 1009) before they are buffered in full.
+"""
+
+from uvicorn.workers import UvicornWorker
+
+from app.core.config import get_settings
+
+
+class GymAIUvicornWorker(UvicornWorker):
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "ws_max_size": get_settings().ws_max_message_bytes}
@@ -4,14 +4,20 @@ Uses repository layer and DI for services.
 """
 
 import json
+from typing import List, Optional
 
 from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 
+from app.core.config import get_settings
 from app.core.logging import get_logger
 from app.websocket.manager import ConnectionManager
 from app.services.ai_service import RoutineGenerator
+from app.services.chat_context import ChatContextAssembler
 from app.services.image_analysis_service import ImageAnalyzer
+from app.services.job_queue import RoutineJobQueue
 from app.repositories import routine_repository, chat_repository
+from app.websocket.uploads import ImageUpload, UploadError
 
 logger = get_logger("websocket.routes")
 
@@ -24,24 +30,39 @@ class WebSocketRoutes:
         manager: ConnectionManager,
         routine_generator: RoutineGenerator,
         image_analyzer: ImageAnalyzer,
+        job_queue: Optional[RoutineJobQueue] = None,
+        chat_context: Optional[ChatContextAssembler] = None,
     ):
         self.manager = manager
         self.routine_generator = routine_generator
         self.image_analyzer = image_analyzer
+        self.job_queue = job_queue
+        self.chat_context = chat_context
+        settings = get_settings()
+        self._streaming_enabled = settings.AI_STREAMING_ENABLED
+        self._job_wait_timeout = settings.JOB_WAIT_TIMEOUT
+        self._max_image_size = settings.max_image_size_bytes
+        self._upload_spool_bytes = settings.IMAGE_UPLOAD_SPOOL_BYTES
+        self._max_images = settings.VISION_MAX_IMAGES
 
     async def handle_websocket(self, websocket: WebSocket, routine_id: int):
         """Main WebSocket connection handler."""
         await self.manager.connect(websocket, routine_id)
+        upload: Optional[ImageUpload] = None  # At most one binary upload in progress per connection
         try:
             while True:
                 data = await websocket.receive()
 
-                if "text" in data:
-                    await self._handle_text_message(websocket, routine_id, data["text"])
-                elif "bytes" in data:
-                    await websocket.send_json(
-                        {"error": "Los mensajes binarios directos no están soportados. Utiliza el formato JSON."}
-                    )
+                if data.get("type") == "websocket.disconnect":
+                    raise WebSocketDisconnect(data.get("code", 1000))
+                if data.get("text") is not None:
+                    header = self._upload_header(data["text"])
+                    if header is not None:
+                        upload = await self._start_upload(websocket, upload, header)
+                    else:
+                        await self._handle_text_message(websocket, routine_id, data["text"])
+                elif data.get("bytes") is not None:
+                    upload = await self._receive_chunk(websocket, routine_id, upload, data["bytes"])
                 else:
                     await websocket.send_json({"error": "Formato de mensaje no reconocido"})
 
@@ -54,6 +75,31 @@ class WebSocketRoutes:
             except Exception:
                 pass
             self.manager.disconnect(websocket, routine_id)
+        finally:
+            if upload is not None:
+                upload.close()
+
+    async def handle_job_websocket(self, websocket: WebSocket, job_id: str):
+        """Push ``job_update`` messages for a generation job: current state, then the final one."""
+        await websocket.accept()
+        try:
+            job = await self.job_queue.get(job_id) if self.job_queue else None
+            if job is None:
+                await websocket.send_json({"error": "Trabajo no encontrado"})
+                return
+            await websocket.send_json(jsonable_encoder({"type": "job_update", **job}))
+
+            if job["status"] not in ("completed", "failed"):
+                job = await self.job_queue.wait(job_id, timeout=self._job_wait_timeout)
+                await websocket.send_json(jsonable_encoder({"type": "job_update", **job}))
+        except WebSocketDisconnect:
+            return
+        except Exception as e:
+            logger.error("Job WebSocket error (job_id=%s): %s", job_id, e)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
 
     async def _handle_text_message(self, websocket: WebSocket, routine_id: int, message: str):
         """Process a text message received via WebSocket."""
@@ -78,13 +124,21 @@ class WebSocketRoutes:
                 await websocket.send_json({"error": "Rutina no encontrada"})
                 return
 
+            # Conversation so far (before this message), within the token budget
+            history = ""
+            if self.chat_context is not None:
+                history = (await self.chat_context.build(routine_id)).render()
+
             # Save user message
             await chat_repository.save_chat_message(routine_id, "user", message)
 
-            # Process with AI
-            modified_routine = await self.routine_generator.modify_routine(current_routine, message)
-            explanation = await self.routine_generator.explain_routine_changes(
-                current_routine, modified_routine, message
+            # Process with AI (single combined completion, streamed if enabled)
+            on_delta = on_day = None
+            if self._streaming_enabled:
+                on_delta = self._explanation_broadcaster(routine_id)
+                on_day = self._day_broadcaster(routine_id)
+            modified_routine, explanation = await self.routine_generator.modify_and_explain(
+                current_routine, message, on_delta=on_delta, on_day=on_day, history=history
             )
 
             # Persist changes
@@ -102,19 +156,139 @@ class WebSocketRoutes:
             logger.error("Error processing text message: %s", e)
             await websocket.send_json({"error": f"No se pudo procesar el mensaje: {e}"})
 
-    async def _handle_image_analysis(self, websocket: WebSocket, routine_id: int, data: dict):
-        """Handle an image analysis request."""
+    def _explanation_broadcaster(self, routine_id: int):
+        """Build a callback that forwards explanation tokens as explanation_delta frames."""
+        async def broadcast_delta(delta: str):
+            await self.manager.broadcast(routine_id, {
+                "type": "explanation_delta",
+                "delta": delta,
+            })
+        return broadcast_delta
+
+    def _day_broadcaster(self, routine_id: int):
+        """Build a callback that pushes each regenerated day as a routine_day frame."""
+        async def broadcast_day(index: int, day):
+            await self.manager.broadcast(routine_id, {
+                "type": "routine_day",
+                "index": index,
+                "day": day.model_dump(),
+            })
+        return broadcast_day
+
+    # --- Binary image uploads ---
+
+    @staticmethod
+    def _upload_header(message: str) -> Optional[dict]:
+        """The parsed frame if it starts a binary image upload, else None."""
+        if '"image_upload"' not in message:
+            return None
+        try:
+            data = json.loads(message)
+        except json.JSONDecodeError:
+            return None
+        return data if isinstance(data, dict) and data.get("type") == "image_upload" else None
+
+    async def _start_upload(
+        self, websocket: WebSocket, current: Optional[ImageUpload], header: dict
+    ) -> Optional[ImageUpload]:
+        """Validate a header frame; a new header abandons any unfinished upload."""
+        if current is not None:
+            current.close()
+            await self._send_upload_error(websocket, current.upload_id, "Subida interrumpida por una nueva imagen")
+        try:
+            return ImageUpload.from_header(
+                header, self._max_image_size, self._upload_spool_bytes, self._max_images
+            )
+        except UploadError as e:
+            await self._send_upload_error(websocket, header.get("upload_id"), str(e))
+            return None
+
+    async def _receive_chunk(
+        self, websocket: WebSocket, routine_id: int, upload: Optional[ImageUpload], chunk: bytes
+    ) -> Optional[ImageUpload]:
+        """Spool one binary chunk; analyze the image once it is complete."""
+        if upload is None:
+            await websocket.send_json(
+                {"error": "No hay ninguna subida de imagen en curso. Envía primero la cabecera image_upload."}
+            )
+            return None
         try:
-            image_data = data.get("image_data")
-            exercise_name = data.get("exercise_name")
-            action = data.get("action", "analyze_form")
+            complete = upload.write(chunk)
+        except UploadError as e:
+            upload.close()
+            await self._send_upload_error(websocket, upload.upload_id, str(e))
+            return None
+        if not complete:
+            return upload
+
+        if upload.part_sizes is not None:
+            images = upload.read_parts()
+            upload.close()
+            await self._analyze_image(
+                websocket, routine_id, images, upload.action, upload.exercise_name, views=upload.views
+            )
+            return None
+        image_bytes = upload.read()
+        upload.close()
+        await self._analyze_image(websocket, routine_id, image_bytes, upload.action, upload.exercise_name)
+        return None
+
+    @staticmethod
+    async def _send_upload_error(websocket: WebSocket, upload_id, message: str):
+        await websocket.send_json({"type": "upload_error", "upload_id": upload_id, "error": message})
+
+    # --- Image analysis ---
 
-            if not image_data:
+    async def _handle_image_analysis(self, websocket: WebSocket, routine_id: int, data: dict):
+        """
+        Handle an image analysis request with base64 data URLs (JSON protocol).
+
+        ``images`` (a list of data URLs or ``{"image_data", "view"}`` objects)
+        analyzes several angles of the same exercise in one vision request;
+        ``image_data`` is a single image. The whole message must fit in one
+        frame (``WS_MAX_MESSAGE_MB``), so full-size photos should be sent as
+        a multi-image binary upload.
+        """
+        images = data.get("images")
+        if images is not None:
+            if not isinstance(images, list) or not images:
+                await websocket.send_json({"error": "La lista de imágenes está vacía o no es válida"})
+                return
+            items = [item if isinstance(item, dict) else {"image_data": item} for item in images]
+            if not all(item.get("image_data") for item in items):
                 await websocket.send_json({"error": "Datos de imagen no proporcionados"})
                 return
+            await self._analyze_image(
+                websocket, routine_id, [item["image_data"] for item in items], "analyze_form",
+                data.get("exercise_name"), views=[item.get("view") for item in items],
+            )
+            return
 
-            if action == "analyze_form":
+        image_data = data.get("image_data")
+        if not image_data:
+            await websocket.send_json({"error": "Datos de imagen no proporcionados"})
+            return
+        await self._analyze_image(
+            websocket, routine_id, image_data, data.get("action", "analyze_form"), data.get("exercise_name")
+        )
+
+    async def _analyze_image(
+        self,
+        websocket: WebSocket,
+        routine_id: int,
+        image_data,
+        action: str,
+        exercise_name: Optional[str],
+        views: Optional[List[Optional[str]]] = None,
+    ):
+        """Run the analysis (data URL, raw bytes or a list of images), store it and broadcast it."""
+        try:
+            if isinstance(image_data, list):
+                analysis = await self.image_analyzer.analyze_exercise_images(image_data, exercise_name, views)
+            elif action == "analyze_form":
                 analysis = await self.image_analyzer.analyze_exercise_image(image_data, exercise_name)
+            elif action == "analyze_clip":
+                analysis = await self.image_analyzer.analyze_exercise_clip(image_data, exercise_name)
             else:
                 analysis = await self.image_analyzer.suggest_exercise_variations(image_data)
 
@@ -4,6 +4,8 @@ Development entrypoint.
 
 import uvicorn
 
+from app.core.config import get_settings
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -11,4 +13,5 @@ if __name__ == "__main__":
         port=8000,
         reload=True,
         log_level="info",
+        ws_max_size=get_settings().ws_max_message_bytes,
     )
\ No newline at end of file
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark de la extracción de JSON de respuestas del modelo: compara la
+implementación anterior de RoutineGenerator._extract_json_from_text (varios
+intentos de json.loads + regex) con el escáner de una sola pasada de
+app/services/json_repair.py.
+
+Para cada caso muestra µs por llamada y si se recuperó un objeto.
+
+Uso: python scripts/bench_json_extraction.py [--number 2000]
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import timeit
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.routines import RoutineRequest
+from app.services.json_repair import extract_json_object
+from app.services.offline_routines import synthesize_routine
+
+
+def legacy_extract_json_from_text(text: str) -> dict:
+    """Implementación anterior (sin logging), como referencia."""
+    try:
+        return json.loads(text.strip())
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        json_pattern = r"```(?:json)?\s*([\s\S]*?)\s*```"
+        json_matches = re.findall(json_pattern, text)
+        if json_matches:
+            return json.loads(json_matches[0].strip())
+    except Exception:
+        pass
+
+    try:
+        start = text.index("{")
+        end = text.rindex("}") + 1
+        return json.loads(text[start:end])
+    except Exception:
+        return {}
+
+
+def build_cases() -> dict:
+    routine = synthesize_routine(RoutineRequest(goals="hipertrofia", days=5))
+    clean = routine.model_dump_json(include={"routine_name", "days"})
+    pretty = json.dumps(json.loads(clean), ensure_ascii=False, indent=2)
+    cut = clean.index('{"day_name"', clean.index('{"day_name"') + 1) + 60
+    return {
+        "JSON limpio": clean,
+        "Bloque ```json```": f"Aquí tienes tu rutina:\n```json\n{pretty}\n```\n¡Mucho éxito!",
+        "Texto alrededor": f"Claro, esta es la rutina {pretty} Espero que te ayude.",
+        "Llaves en el texto": f"Formato {{nombre}}: {clean} (fin)",
+        "Comas finales": pretty.replace('"\n    }', '",\n    }').replace("}\n  ]", "},\n  ]"),
+        "Truncado": clean[:cut],
+        "Sin JSON": "Lo siento, no puedo generar la rutina ahora mismo." * 5,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extracción de JSON")
+    parser.add_argument("--number", type=int, default=2000, help="Llamadas por medición")
+    args = parser.parse_args()
+
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+
+    print(f"{'Caso':<20} {'Anterior µs':>12} {'OK':>4} {'Nuevo µs':>10} {'OK':>4} {'Mejora':>8}")
+    print("-" * 64)
+    for name, text in build_cases().items():
+        results = []
+        for function in (legacy_extract_json_from_text, extract_json_object):
+            seconds = min(timeit.repeat(lambda: function(text), number=args.number, repeat=3))
+            results.append((seconds / args.number * 1e6, bool(function(text))))
+        (old_us, old_ok), (new_us, new_ok) = results
+        print(f"{name:<20} {old_us:>12.1f} {'✅' if old_ok else '❌':>3} {new_us:>10.1f} "
+              f"{'✅' if new_ok else '❌':>3} {old_us / new_us:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
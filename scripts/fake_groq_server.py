@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Servidor local compatible con la API de Groq/OpenAI para pruebas de carga y
+desarrollo sin conexión. RoutineGenerator e ImageAnalyzer lo usan con
+GROQ_BASE_URL (ver app/core/config.py).
+
+Modos:
+  synthetic  Respuestas generadas localmente: rutinas del sintetizador offline,
+             patches vacíos, la rutina recibida sin cambios y texto de ejemplo.
+  record     Reenvía cada petición a Groq real y guarda la respuesta como
+             fixture (<huella de la petición>.json).
+  replay     Sirve las fixtures grabadas de forma determinista (404 si falta).
+
+Simula latencia (fixed, uniform, normal, lognormal, exponential), velocidad de
+generación en tokens/seg, límite de peticiones por minuto, errores 429/5xx
+inyectados y streaming SSE.
+
+Uso:
+  python scripts/fake_groq_server.py --port 8100 --latency lognormal \\
+      --latency-mean 0.8 --latency-std 0.4 --tokens-per-second 250 --rate-429 0.05
+  GROQ_BASE_URL=http://localhost:8100 GROQ_API_KEY=fake python run.py
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.schemas.routines import RoutineRequest
+from app.services.offline_routines import synthesize_routine
+from app.services.single_flight import request_fingerprint
+
+MODES = ("synthetic", "record", "replay")
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+# Campos que no cambian el contenido de la respuesta (no forman parte de la huella)
+_VOLATILE_FIELDS = {"stream", "stream_options", "user"}
+
+_EXPLANATION = (
+    "He ajustado tu rutina según lo que pediste, manteniendo el equilibrio entre "
+    "volumen e intensidad para que sigas progresando de forma segura. ¡A entrenar!"
+)
+_IMAGE_ANALYSIS = (
+    "La imagen muestra equipamiento de gimnasio. Ejercicios sugeridos: press de banca, "
+    "remo con mancuernas y sentadilla goblet. Mantén la espalda neutra y controla el movimiento."
+)
+
+_EMBEDDED_JSON = re.compile(r"```json\s*(\{.*?\})\s*```", re.S)
+_PROMPT_FIELDS = {
+    "goals": re.compile(r"^Objetivos: (.*)$", re.M),
+    "experience_level": re.compile(r"^Nivel de experiencia: (.*)$", re.M),
+    "available_equipment": re.compile(r"^Equipo disponible: (.*)$", re.M),
+    "time_per_session": re.compile(r"^Tiempo por sesión: (.*)$", re.M),
+    "health_conditions": re.compile(r"^Condiciones de salud: (.*)$", re.M),
+}
+_DAYS = re.compile(r"Incluye exactamente (\d+) días")
+_UNSPECIFIED = {"No especificado", "Ninguna"}
+
+
+@dataclass
+class FakeGroqConfig:
+    """Configuración del servidor falso."""
+    mode: str = "synthetic"
+    fixtures_dir: Path = Path("tests/fixtures/groq")
+    upstream_url: str = "https://api.groq.com"
+    upstream_api_key: str = ""
+    latency: str = "fixed"
+    latency_mean: float = 0.0  # segundos hasta el primer token
+    latency_std: float = 0.0
+    tokens_per_second: float = 0.0  # 0 = sin límite
+    requests_per_minute: int = 0  # 0 = sin límite
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    retry_after: float = 1.0
+    seed: Optional[int] = None
+
+
+def sample_latency(config: FakeGroqConfig, rng: random.Random) -> float:
+    """Muestra una latencia (segundos) de la distribución configurada."""
+    mean, std = config.latency_mean, config.latency_std
+    if mean <= 0:
+        return 0.0
+    if config.latency == "uniform":
+        half_width = std * math.sqrt(3)  # misma desviación típica que la pedida
+        value = rng.uniform(mean - half_width, mean + half_width)
+    elif config.latency == "normal":
+        value = rng.gauss(mean, std)
+    elif config.latency == "lognormal":
+        sigma2 = math.log(1 + (std / mean) ** 2)
+        value = rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+    elif config.latency == "exponential":
+        value = rng.expovariate(1 / mean)
+    else:
+        value = mean
+    return max(0.0, value)
+
+
+def split_tokens(text: str) -> List[str]:
+    """Trozos de ~4 caracteres, la aproximación habitual de un token."""
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+def _prompt_text(messages: list) -> Tuple[str, int]:
+    """Texto concatenado de los mensajes y número de imágenes adjuntas."""
+    parts, images = [], 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    parts.append(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    images += 1
+    return "\n".join(parts), images
+
+
+def _synthetic_routine(prompt: str) -> dict:
+    fields = {}
+    for name, pattern in _PROMPT_FIELDS.items():
+        match = pattern.search(prompt)
+        if match and match.group(1).strip() not in _UNSPECIFIED:
+            fields[name] = match.group(1).strip()
+    days = _DAYS.search(prompt)
+    request = RoutineRequest(
+        goals=fields.pop("goals", "ganar fuerza"),
+        days=int(days.group(1)) if days else None,
+        **fields,
+    )
+    return synthesize_routine(request).model_dump(mode="json", include={"routine_name", "days"})
+
+
+def synthetic_content(body: dict) -> str:
+    """Respuesta plausible para los prompts que envía la aplicación."""
+    prompt, images = _prompt_text(body.get("messages", []))
+    if images:
+        return _IMAGE_ANALYSIS
+
+    embedded = _EMBEDDED_JSON.search(prompt)
+    current = None
+    if embedded:
+        current = json.loads(embedded.group(1))
+        for key in ("id", "user_id", "created_at", "updated_at"):
+            current.pop(key, None)
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+
+    if current is not None and '"patch"' in prompt:
+        return json.dumps({"explanation": _EXPLANATION, "patch": []}, ensure_ascii=False)
+    if current is not None and '"explanation"' in prompt:
+        return json.dumps({"explanation": _EXPLANATION, "routine": current}, ensure_ascii=False)
+    if current is not None and json_mode:
+        return json.dumps(current, ensure_ascii=False)
+    if '"routine_name"' in prompt:
+        return json.dumps(_synthetic_routine(prompt), ensure_ascii=False)
+    return _EXPLANATION
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> dict:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _error(status_code: int, message: str, code: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": "api_error", "code": code}},
+        headers=headers,
+    )
+
+
+class FakeGroqServer:
+    """Estado del servidor: RNG, ventana de peticiones por minuto y contadores."""
+
+    def __init__(self, config: FakeGroqConfig, upstream: Optional[httpx.AsyncClient] = None):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.upstream = upstream
+        self.fixtures_dir = Path(config.fixtures_dir)
+        self._window: deque = deque()
+        self.stats = {"requests": 0, "streamed": 0, "rate_limited": 0, "server_errors": 0,
+                      "recorded": 0, "replayed": 0, "missing_fixtures": 0}
+
+    # --- Fallos inyectados ---
+
+    def injected_failure(self) -> Optional[JSONResponse]:
+        config = self.config
+        now = time.monotonic()
+        if config.requests_per_minute:
+            while self._window and now - self._window[0] >= 60:
+                self._window.popleft()
+            if len(self._window) >= config.requests_per_minute:
+                self.stats["rate_limited"] += 1
+                retry_after = 60 - (now - self._window[0])
+                return self._rate_limited(retry_after)
+            self._window.append(now)
+
+        roll = self.rng.random()
+        if roll < config.rate_429:
+            self.stats["rate_limited"] += 1
+            return self._rate_limited(config.retry_after)
+        if roll < config.rate_429 + config.rate_5xx:
+            self.stats["server_errors"] += 1
+            status_code = self.rng.choice((500, 502, 503))
+            return _error(status_code, "Injected upstream failure", "internal_server_error")
+        return None
+
+    def _rate_limited(self, retry_after: float) -> JSONResponse:
+        return _error(
+            429,
+            f"Rate limit reached. Please try again in {retry_after:.2f}s.",
+            "rate_limit_exceeded",
+            headers={"retry-after": f"{max(retry_after, 0):.2f}", "x-ratelimit-remaining-requests": "0"},
+        )
+
+    # --- Fixtures ---
+
+    def fixture_path(self, fingerprint: str) -> Path:
+        return self.fixtures_dir / f"{fingerprint}.json"
+
+    async def record(self, payload: dict, fingerprint: str, authorization: str):
+        """Pide la respuesta real (sin streaming) y la guarda como fixture."""
+        api_key = self.config.upstream_api_key
+        headers = {"Authorization": f"Bearer {api_key}" if api_key else authorization}
+        client = self.upstream or httpx.AsyncClient(base_url=self.config.upstream_url, timeout=120)
+        try:
+            response = await client.post("/openai/v1/chat/completions", json=payload, headers=headers)
+        finally:
+            if client is not self.upstream:
+                await client.aclose()
+        if response.status_code != 200:
+            return JSONResponse(status_code=response.status_code, content=response.json())
+
+        data = response.json()
+        self.fixtures_dir.mkdir(parents=True, exist_ok=True)
+        self.fixture_path(fingerprint).write_text(
+            json.dumps({"request": payload, "response": data}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        self.stats["recorded"] += 1
+        return data
+
+    def replay(self, fingerprint: str) -> Optional[dict]:
+        path = self.fixture_path(fingerprint)
+        if not path.exists():
+            self.stats["missing_fixtures"] += 1
+            return None
+        self.stats["replayed"] += 1
+        return json.loads(path.read_text(encoding="utf-8"))["response"]
+
+    # --- Respuestas ---
+
+    async def stream(self, completion: dict, latency: float) -> AsyncIterator[str]:
+        """Eventos SSE con el contenido a la velocidad configurada."""
+        tokens_per_second = self.config.tokens_per_second
+        base = {"id": completion["id"], "object": "chat.completion.chunk",
+                "created": completion["created"], "model": completion["model"]}
+
+        def event(delta: dict, finish_reason: Optional[str] = None, **extra) -> str:
+            chunk = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra}
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+        await asyncio.sleep(latency)
+        yield event({"role": "assistant", "content": ""})
+
+        start = time.monotonic()
+        content = completion["choices"][0]["message"]["content"] or ""
+        for i, token in enumerate(split_tokens(content)):
+            if tokens_per_second:
+                delay = start + (i + 1) / tokens_per_second - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield event({"content": token})
+
+        yield event({}, "stop", x_groq={"id": completion["id"], "usage": completion["usage"]})
+        yield "data: [DONE]\n\n"
+
+
+def create_app(config: FakeGroqConfig, upstream: Optional[httpx.AsyncClient] = None) -> FastAPI:
+    """Aplicación FastAPI del servidor falso (``upstream`` solo se usa en modo record)."""
+    server = FakeGroqServer(config, upstream)
+    app = FastAPI(title="Fake Groq")
+    app.state.server = server
+
+    @app.post("/openai/v1/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        server.stats["requests"] += 1
+        stream = bool(body.get("stream"))
+        payload = {k: v for k, v in body.items() if k not in _VOLATILE_FIELDS}
+        fingerprint = request_fingerprint(payload)
+
+        failure = server.injected_failure()
+        if failure is not None:
+            return failure
+
+        latency = sample_latency(config, server.rng)
+        if config.mode == "record":
+            completion = await server.record(payload, fingerprint, request.headers.get("authorization", ""))
+            if isinstance(completion, JSONResponse):
+                return completion
+            latency = 0.0  # La latencia real ya se pagó
+        elif config.mode == "replay":
+            completion = server.replay(fingerprint)
+            if completion is None:
+                return _error(404, f"No fixture recorded for request {fingerprint}", "fixture_not_found")
+        else:
+            content = synthetic_content(body)
+            prompt_text, _ = _prompt_text(body.get("messages", []))
+            completion = {
+                "id": f"chatcmpl-{fingerprint[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake-model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": _usage(len(split_tokens(prompt_text)), len(split_tokens(content))),
+            }
+
+        if stream:
+            server.stats["streamed"] += 1
+            return StreamingResponse(server.stream(completion, latency), media_type="text/event-stream")
+
+        if config.tokens_per_second:
+            latency += completion["usage"]["completion_tokens"] / config.tokens_per_second
+        await asyncio.sleep(latency)
+        return completion
+
+    @app.get("/openai/v1/models")
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "fake-model", "object": "model", "owned_by": "fake-groq"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return {"mode": config.mode, **server.stats}
+
+    return app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> Tuple[argparse.Namespace, FakeGroqConfig]:
+    parser = argparse.ArgumentParser(description="Servidor local compatible con la API de Groq")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--mode", choices=MODES, default="synthetic")
+    parser.add_argument("--fixtures-dir", type=Path, default=Path("tests/fixtures/groq"))
+    parser.add_argument("--upstream-url", default="https://api.groq.com")
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-mean", type=float, default=0.0, help="Segundos hasta el primer token")
+    parser.add_argument("--latency-std", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="0 = sin límite")
+    parser.add_argument("--requests-per-minute", type=int, default=0, help="0 = sin límite")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probabilidad de responder 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Probabilidad de responder 5xx")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None, help="Semilla para resultados reproducibles")
+    args = parser.parse_args(argv)
+
+    config = FakeGroqConfig(
+        mode=args.mode,
+        fixtures_dir=args.fixtures_dir,
+        upstream_url=args.upstream_url,
+        upstream_api_key=os.getenv("GROQ_API_KEY", ""),
+        latency=args.latency,
+        latency_mean=args.latency_mean,
+        latency_std=args.latency_std,
+        tokens_per_second=args.tokens_per_second,
+        requests_per_minute=args.requests_per_minute,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    return args, config
+
+
+def main():
+    import uvicorn
+
+    args, config = parse_args()
+    print(f"🤖 Fake Groq en http://{args.host}:{args.port} (modo {config.mode})")
+    print(f"   Usa GROQ_BASE_URL=http://{args.host}:{args.port} en la aplicación")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
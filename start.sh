@@ -22,11 +22,12 @@ fi
 
 # Iniciar la aplicación con parámetros de seguridad adicionales para Gunicorn
 echo "Iniciando aplicación en el puerto $PORT con parámetros de seguridad"
-exec gunicorn -k uvicorn.workers.UvicornWorker -b 0.0.0.0:$PORT app.main:app \
+# El worker propio aplica el límite de tamaño de mensajes WebSocket (WS_MAX_MESSAGE_MB)
+exec gunicorn -k app.uvicorn_worker.GymAIUvicornWorker -b 0.0.0.0:$PORT app.main:app \
     --limit-request-line 8190 \
     --limit-request-fields 100 \
     --max-requests 1000 \
     --max-requests-jitter 50 \
-    --timeout 300 \
+    --timeout 60 \
     --graceful-timeout 30 \
     --keep-alive 5
\ No newline at end of file
@@ -9,6 +9,10 @@ from sqlalchemy.orm import sessionmaker
 # Asegurar que podamos importar desde el directorio raíz
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+# Sin límites de cuota de Groq durante las pruebas (los clientes están mockeados)
+os.environ.setdefault("GROQ_RPM_LIMIT", "0")
+os.environ.setdefault("GROQ_TPM_LIMIT", "0")
+
 from app.main import app
 from app.models.models import Routine, Day, Exercise
 from app.db.models import Base
@@ -1,3 +1,5 @@
+import groq
+import httpx
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
 from app.services.ai_service import RoutineGenerator
@@ -5,6 +7,12 @@ from app.schemas.routines import RoutineRequest
 from app.models.models import Routine
 
 
+def _rate_limit_error():
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": "0"}, request=request)
+    return groq.RateLimitError("rate limited", response=response, body=None)
+
+
 class TestAIService:
     """Pruebas para el servicio de IA (Groq)"""
 
@@ -52,7 +60,7 @@ class TestAIService:
         request = RoutineRequest(
             goals="Hipertrofia",
             equipment="Gimnasio completo",
-            days=3,
+            days=1,
             user_id=1
         )
 
@@ -119,10 +127,11 @@ class TestAIService:
 
     @pytest.mark.asyncio
     async def test_create_routine_without_configuration(self):
-        """Probar que falla si la API no está configurada"""
+        """Probar que falla si la API no está configurada y no hay modo offline"""
         generator = RoutineGenerator()
         generator._configured = False
         generator._client = None
+        generator._offline_fallback = False
 
         request = RoutineRequest(
             goals="Hipertrofia",
@@ -133,3 +142,162 @@ class TestAIService:
 
         with pytest.raises(ValueError, match="not configured"):
             await generator.create_initial_routine(request)
+
+    @pytest.mark.asyncio
+    async def test_stream_routine_explanation(self, generator):
+        """Probar que la explicación se emite token a token en modo streaming"""
+        async def fake_stream():
+            for token in ["Hemos ", "añadido ", "", "press inclinado."]:
+                yield MagicMock(choices=[MagicMock(delta=MagicMock(content=token))])
+
+        generator._client.chat.completions.create = AsyncMock(return_value=fake_stream())
+
+        deltas = [d async for d in generator.stream_routine_explanation("Más pecho")]
+
+        assert deltas == ["Hemos ", "añadido ", "press inclinado."]
+        kwargs = generator._client.chat.completions.create.call_args.kwargs
+        assert kwargs["stream"] is True
+
+    @pytest.mark.asyncio
+    async def test_modify_and_explain_single_call(self, generator, sample_routine):
+        """Probar que el modo combinado usa una sola llamada para rutina y explicación"""
+        combined = MagicMock()
+        combined.choices = [MagicMock(message=MagicMock(content="""{
+            "explanation": "Añadí press inclinado para más pecho.",
+            "routine": {"routine_name": "Rutina con más pecho", "days": []}
+        }"""))]
+        generator._client.chat.completions.create = AsyncMock(return_value=combined)
+
+        routine, explanation = await generator.modify_and_explain(sample_routine, "Más pecho")
+
+        generator._client.chat.completions.create.assert_called_once()
+        assert routine.routine_name == "Rutina con más pecho"
+        assert routine.id == sample_routine.id
+        assert explanation == "Añadí press inclinado para más pecho."
+
+    @pytest.mark.asyncio
+    async def test_modify_and_explain_streams_explanation(self, generator, sample_routine):
+        """Probar que la explicación del modo combinado se emite en streaming"""
+        pieces = ['{"explanation": "Más ', 'pecho\\n', 'hoy.", "routine": ',
+                  '{"routine_name": "Nueva", "days": []}}']
+
+        async def fake_stream():
+            for piece in pieces:
+                yield MagicMock(choices=[MagicMock(delta=MagicMock(content=piece))])
+
+        generator._client.chat.completions.create = AsyncMock(return_value=fake_stream())
+        deltas = []
+
+        async def on_delta(delta):
+            deltas.append(delta)
+
+        routine, explanation = await generator.modify_and_explain(
+            sample_routine, "Más pecho", on_delta=on_delta
+        )
+
+        assert "".join(deltas) == "Más pecho\nhoy."
+        assert explanation == "Más pecho\nhoy."
+        assert routine.routine_name == "Nueva"
+
+    @pytest.mark.asyncio
+    async def test_modify_and_explain_falls_back_to_two_calls(self, generator, sample_routine):
+        """Probar el fallback a dos llamadas cuando la respuesta combinada no es válida"""
+        routine, explanation = await generator.modify_and_explain(sample_routine, "Más pecho")
+
+        # Parche y combinada (sin "patch" ni "routine") + modify_routine + explain_routine_changes
+        assert generator._client.chat.completions.create.call_count == 4
+        assert routine.routine_name == "Rutina de prueba"
+
+    @pytest.mark.asyncio
+    async def test_create_initial_routine_streams_days(self, generator):
+        """Probar que cada día se entrega en cuanto el modelo lo completa"""
+        text = generator._client.chat.completions.create.return_value.choices[0].message.content
+
+        async def fake_stream():
+            for i in range(0, len(text), 16):
+                yield MagicMock(choices=[MagicMock(delta=MagicMock(content=text[i:i + 16]))])
+
+        generator._client.chat.completions.create = AsyncMock(return_value=fake_stream())
+        received = []
+
+        async def on_day(index, day):
+            received.append((index, day.day_name))
+
+        routine = await generator.create_initial_routine(
+            RoutineRequest(goals="Hipertrofia", days=1), on_day=on_day
+        )
+
+        assert received == [(0, "Lunes")]
+        assert routine.days[0].day_name == "Lunes"
+
+    @pytest.mark.asyncio
+    async def test_stream_is_retried_before_the_first_chunk(self, generator):
+        """Un error antes del primer fragmento se reintenta con una nueva petición"""
+        async def fake_stream():
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content="Hola"))])
+
+        generator._client.chat.completions.create = AsyncMock(side_effect=[_rate_limit_error(), fake_stream()])
+        received = []
+
+        async def on_content(content):
+            received.append(content)
+
+        await generator._stream_completion({"model": generator._model, "messages": []}, on_content)
+
+        assert received == ["Hola"]
+        assert generator._client.chat.completions.create.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stream_failure_after_content_is_not_replayed(self, generator):
+        """Un error a mitad del stream se propaga sin repetir los fragmentos ya entregados"""
+        async def broken_stream():
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content="Hola"))])
+            raise _rate_limit_error()
+
+        generator._client.chat.completions.create = AsyncMock(side_effect=lambda **kwargs: broken_stream())
+        received = []
+
+        async def on_content(content):
+            received.append(content)
+
+        with pytest.raises(groq.RateLimitError):
+            await generator._stream_completion({"model": generator._model, "messages": []}, on_content)
+
+        assert received == ["Hola"]
+        assert generator._client.chat.completions.create.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_truncated_routine_missing_days_is_an_error(self, generator, sample_routine):
+        """Una rutina cortada que pierde días no se acepta como la rutina pedida"""
+        full = sample_routine.model_dump_json(exclude={"id", "user_id", "created_at", "updated_at"})
+        second_day = full.index('{"day_name"', full.index('{"day_name"') + 1)
+        generator._client.chat.completions.create.return_value.choices[0].message.content = full[:second_day + 40]
+
+        with pytest.raises(ValueError):
+            await generator.create_initial_routine(
+                RoutineRequest(goals="Fuerza", days=2, use_cache=False), offline_fallback=False
+            )
+
+    @pytest.mark.asyncio
+    async def test_repaired_routine_is_not_cached(self, generator, sample_routine):
+        """Una rutina reparada se devuelve pero no se guarda en la caché"""
+        full = sample_routine.model_dump_json(exclude={"id", "user_id", "created_at", "updated_at"})
+        generator._client.chat.completions.create.return_value.choices[0].message.content = full[:-1]
+        generator._cache = MagicMock(get=AsyncMock(return_value=None), set=AsyncMock())
+
+        routine = await generator.create_initial_routine(RoutineRequest(goals="Fuerza", days=2))
+
+        assert len(routine.days) == 2
+        generator._cache.set.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_truncated_patch_falls_back(self, generator, sample_routine):
+        """Un parche cortado no se aplica a medias: se usa el siguiente modo"""
+        generator._client.chat.completions.create.return_value.choices[0].message.content = (
+            '{"explanation": "Tres cambios", "patch": ['
+            '{"op": "replace", "path": "/days/0/exercises/0/sets", "value": 4}, '
+            '{"op": "replace", "path": "/days/0/exercises/1/sets", "value": 4}, '
+            '{"op": "replace", "path": "/days/1/exer'
+        )
+
+        assert await generator._request_patch(sample_routine, "Más series", None) is None
@@ -82,6 +82,7 @@ class TestAPIEndpoints:
                     assert response.json()["routine_id"] == 1
                     assert "routine" in response.json()
                     assert response.json()["routine"]["routine_name"] == "Rutina de prueba API"
+                    assert response.json()["offline"] is False
         finally:
             app.dependency_overrides.clear()
 
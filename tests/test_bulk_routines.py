@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import ChatMessageModel
+from app.repositories import routine_repository
+from app.schemas.routines import RoutineRequest
+from app.services.ai_service import RoutineGenerator
+from app.services.bulk_routines import generate_routines_bulk
+from app.services.groq_scheduler import GroqScheduler, Priority
+from app.services.offline_routines import synthesize_routine
+
+
+class TestBulkRoutines:
+    """Pruebas para la generación masiva de rutinas"""
+
+    async def _collect(self, generator, requests, **kwargs):
+        return [event async for event in generate_routines_bulk(generator, requests, **kwargs)]
+
+    async def test_bounded_concurrency_and_batched_inserts(self, sample_routine):
+        """Respetar la concurrencia máxima y guardar por lotes"""
+        active = peak = 0
+
+        async def create(request, priority=None, offline_fallback=None):
+            nonlocal active, peak
+            assert priority == Priority.BACKGROUND
+            assert offline_fallback is False
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return sample_routine.model_copy(update={"user_id": request.user_id})
+
+        generator = MagicMock()
+        generator.create_initial_routine = create
+        saved_batches = []
+
+        async def save_batch(routines, messages):
+            saved_batches.append(len(routines))
+            start = sum(saved_batches[:-1])
+            return list(range(start + 1, start + 1 + len(routines)))
+
+        requests = [RoutineRequest(goals="Fuerza", user_id=i) for i in range(5)]
+        with patch.object(routine_repository, "save_routines_batch", save_batch):
+            events = await self._collect(generator, requests, concurrency=2, batch_size=2)
+
+        assert peak == 2
+        assert saved_batches == [2, 2, 1]
+        items = [e for e in events if e["type"] == "item"]
+        assert sorted(e["index"] for e in items) == list(range(5))
+        assert sorted(e["routine_id"] for e in items) == [1, 2, 3, 4, 5]
+        assert events[-1] == {"type": "summary", "total": 5, "succeeded": 5, "failed": 0}
+
+    async def test_item_errors_are_reported(self, sample_routine):
+        """Un fallo en un elemento no detiene el lote"""
+        generator = MagicMock()
+        generator.create_initial_routine = AsyncMock(side_effect=[sample_routine, ValueError("JSON inválido")])
+
+        with patch.object(routine_repository, "save_routines_batch", AsyncMock(return_value=[7])):
+            events = await self._collect(
+                generator, [RoutineRequest(goals="A"), RoutineRequest(goals="B")], concurrency=1
+            )
+
+        statuses = {e["index"]: e for e in events if e["type"] == "item"}
+        assert statuses[0]["status"] == "ok" and statuses[0]["routine_id"] == 7
+        assert statuses[1] == {"type": "item", "index": 1, "status": "error", "error": "JSON inválido"}
+        assert events[-1]["failed"] == 1
+
+    async def test_saturated_scheduler_yields_groq_routines_or_errors(self):
+        """Con el planificador saturado los elementos esperan en cola sin caer al catálogo"""
+        content = synthesize_routine(RoutineRequest(goals="Fuerza", days=2)).model_dump_json()
+        response = MagicMock(choices=[MagicMock(message=MagicMock(content=content))], usage=None)
+        calls = 0
+
+        async def create(**kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.03)
+            if calls == 4:
+                await asyncio.sleep(1)  # Este elemento supera el tiempo límite de Groq
+            return response
+
+        generator = RoutineGenerator()
+        generator._configured = True
+        generator._model = "test-model"
+        generator._offline_fallback = True
+        generator._generation_timeout = 0.1
+        generator._scheduler = GroqScheduler(max_concurrency=1)
+        generator._client = MagicMock()
+        generator._client.chat.completions.create = create
+
+        requests = [RoutineRequest(goals=f"Fuerza {i}", days=2, use_cache=False) for i in range(5)]
+        save_batch = AsyncMock(side_effect=lambda routines, messages: list(range(len(routines))))
+        with patch.object(routine_repository, "save_routines_batch", save_batch):
+            events = await self._collect(generator, requests, concurrency=5, batch_size=10)
+
+        # Cada elemento esperó en cola más que el tiempo límite y aun así llegó a Groq
+        items = [e for e in events if e["type"] == "item"]
+        assert calls == 5
+        assert sum(e["status"] == "ok" for e in items) == 4
+        assert [e["status"] for e in items if "routine_id" not in e] == ["error"]
+        assert events[-1]["failed"] == 1
+
+    async def test_save_routines_batch(self, test_db_engine, sample_routine):
+        """Insertar rutinas y mensajes iniciales en una sola transacción"""
+        session_factory = sessionmaker(test_db_engine, class_=AsyncSession, expire_on_commit=False)
+        routines = [sample_routine.model_copy(update={"id": None, "user_id": i}) for i in (1, 2, 3)]
+        messages = [[("user", "Hola"), ("assistant", "¡Listo!")]] * 3
+
+        with patch.object(routine_repository, "async_session", session_factory):
+            ids = await routine_repository.save_routines_batch(routines, messages)
+            stored = await routine_repository.get_routine(ids[1])
+
+        assert len(set(ids)) == 3
+        assert stored.user_id == 2
+        async with session_factory() as session:
+            count = await session.scalar(select(func.count()).select_from(ChatMessageModel))
+        assert count == 6
@@ -0,0 +1,117 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.repositories import chat_repository, routine_repository
+from app.services.ai_service import RoutineGenerator
+from app.services.chat_context import (
+    ChatContextAssembler,
+    estimate_tokens,
+    local_summary,
+    truncate_to_tokens,
+)
+
+
+@pytest.fixture
+def session_factory(test_db_engine):
+    """Repositorios de chat y rutinas apuntando a la base de datos de prueba"""
+    factory = sessionmaker(test_db_engine, class_=AsyncSession, expire_on_commit=False)
+    with patch.object(chat_repository, "async_session", factory), \
+            patch.object(routine_repository, "async_session", factory):
+        yield factory
+
+
+async def _conversation(routine, turns):
+    routine_id = await routine_repository.save_routine(routine.model_copy(update={"id": None}), user_id=1)
+    for i in range(turns):
+        await chat_repository.save_chat_message(routine_id, "user", f"Petición número {i}: añade más volumen de pecho")
+        await chat_repository.save_chat_message(routine_id, "assistant", f"Respuesta {i}: he añadido una serie de press")
+    return routine_id
+
+
+class TestTokenEstimation:
+    """Pruebas para el estimador local de tokens"""
+
+    def test_estimate_and_truncate(self):
+        """El estimador cuenta palabras y puntuación; el recorte respeta el presupuesto"""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("hola, mundo") == 4  # hola | , | mundo (2)
+        text = "sentadilla " * 100
+        truncated = truncate_to_tokens(text, 20)
+        assert truncated.endswith("…")
+        assert estimate_tokens(truncated) <= 21
+
+    def test_local_summary_keeps_newest_requests(self):
+        """El resumen local conserva las peticiones más recientes dentro del presupuesto"""
+        messages = [{"sender": "user", "content": f"petición {i}"} for i in range(50)]
+        summary = local_summary("", messages, max_tokens=30)
+        assert "petición 49" in summary
+        assert "petición 0" not in summary
+        assert estimate_tokens(summary) <= 30
+
+
+class TestChatContextAssembler:
+    """Pruebas para el contexto de historial con presupuesto de tokens"""
+
+    async def test_short_history_fits_entirely(self, session_factory, sample_routine):
+        """Una conversación corta entra completa y no se resume"""
+        routine_id = await _conversation(sample_routine, 2)
+        assembler = ChatContextAssembler(token_budget=600)
+
+        context = await assembler.build(routine_id)
+
+        assert context.summary == ""
+        assert len(context.messages) == 4
+        assert "Usuario: Petición número 0" in context.render()
+        assert await chat_repository.get_chat_summary(routine_id) is None
+
+    async def test_prompt_size_stays_flat(self, session_factory, sample_routine):
+        """El contexto respeta el presupuesto y lo antiguo pasa al resumen de forma incremental"""
+        routine_id = await _conversation(sample_routine, 30)
+        summarizer = AsyncMock(side_effect=lambda previous, transcript, words: f"{previous}\n- resumen".strip())
+        assembler = ChatContextAssembler(summarizer=summarizer, token_budget=120, summary_tokens=60)
+
+        context = await assembler.build(routine_id)
+        await assembler.drain()
+
+        assert context.tokens <= 120
+        assert 0 < len(context.messages) < 60
+        state = await chat_repository.get_chat_summary(routine_id)
+        assert state["last_message_id"] < context.messages[0]["id"]
+        first_calls = summarizer.await_count
+
+        # Nuevos mensajes: solo se resumen los que salen de la ventana
+        await chat_repository.save_chat_message(routine_id, "user", "Otra petición")
+        context = await assembler.build(routine_id)
+        await assembler.drain()
+
+        assert context.summary.startswith("- resumen")
+        assert context.tokens <= 120
+        assert summarizer.await_count - first_calls <= 1
+        assert context.messages[-1]["content"] == "Otra petición"
+
+    async def test_summarizer_failure_uses_local_summary(self, session_factory, sample_routine):
+        """Si Groq falla, el resumen se genera localmente"""
+        routine_id = await _conversation(sample_routine, 20)
+        assembler = ChatContextAssembler(
+            summarizer=AsyncMock(side_effect=RuntimeError("groq caído")), token_budget=80
+        )
+
+        await assembler.build(routine_id)
+        await assembler.drain()
+
+        state = await chat_repository.get_chat_summary(routine_id)
+        assert state["summary"].startswith("- Pidió: Petición número")
+        assert estimate_tokens(state["summary"]) <= 200
+
+    def test_history_is_added_to_prompts(self, sample_routine):
+        """El historial aparece en los prompts de modificación"""
+        history = "Resumen de la conversación anterior:\n- Tiene una lesión de hombro"
+        for build in (
+            RoutineGenerator._build_patch_prompt,
+            RoutineGenerator._build_combined_prompt,
+            RoutineGenerator._build_modification_prompt,
+        ):
+            assert "lesión de hombro" in build(sample_routine, "más pecho", history)
+            assert "Contexto de la conversación" not in build(sample_routine, "más pecho")
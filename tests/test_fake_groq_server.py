@@ -0,0 +1,127 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from groq import AsyncGroq
+
+from app.models.models import Routine
+from app.schemas.routines import RoutineRequest
+from app.services.ai_service import RoutineGenerator
+
+_SCRIPT = Path(__file__).resolve().parent.parent / "scripts" / "fake_groq_server.py"
+_spec = importlib.util.spec_from_file_location("fake_groq_server", _SCRIPT)
+fake_groq = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(fake_groq)
+
+
+def _chat(client, content, **extra):
+    return client.post(
+        "/openai/v1/chat/completions",
+        json={"model": "fake-model", "messages": [{"role": "user", "content": content}], **extra},
+    )
+
+
+def _asgi_groq(app) -> AsyncGroq:
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake")
+    return AsyncGroq(api_key="fake", base_url="http://fake", max_retries=0, http_client=http_client)
+
+
+class TestFakeGroqServer:
+    """Pruebas para el servidor local compatible con Groq"""
+
+    def test_synthetic_initial_routine(self):
+        """El prompt inicial devuelve una rutina válida con los días pedidos"""
+        client = TestClient(fake_groq.create_app(fake_groq.FakeGroqConfig()))
+        prompt = RoutineGenerator._build_initial_prompt(RoutineRequest(goals="hipertrofia", days=3))
+
+        response = _chat(client, prompt, response_format={"type": "json_object"})
+
+        assert response.status_code == 200
+        body = response.json()
+        routine = Routine(**json.loads(body["choices"][0]["message"]["content"]))
+        assert len(routine.days) == 3
+        assert body["usage"]["completion_tokens"] > 0
+
+    def test_streaming_matches_full_content(self):
+        """El streaming SSE reconstruye el mismo contenido y termina con [DONE]"""
+        client = TestClient(fake_groq.create_app(fake_groq.FakeGroqConfig()))
+
+        full = _chat(client, "Explica los cambios").json()["choices"][0]["message"]["content"]
+        streamed = _chat(client, "Explica los cambios", stream=True)
+
+        events = [line[len("data: "):] for line in streamed.text.splitlines() if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(e) for e in events[:-1]]
+        assert "".join(c["choices"][0]["delta"].get("content") or "" for c in chunks) == full
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+    def test_failure_injection(self):
+        """Inyectar 429 con Retry-After, 5xx y el límite por minuto"""
+        rate_limited = TestClient(fake_groq.create_app(fake_groq.FakeGroqConfig(rate_429=1.0, retry_after=2.5)))
+        response = _chat(rate_limited, "hola")
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2.50"
+        assert response.json()["error"]["code"] == "rate_limit_exceeded"
+
+        failing = TestClient(fake_groq.create_app(fake_groq.FakeGroqConfig(rate_5xx=1.0)))
+        assert _chat(failing, "hola").status_code in (500, 502, 503)
+
+        limited = TestClient(fake_groq.create_app(fake_groq.FakeGroqConfig(requests_per_minute=2)))
+        statuses = [_chat(limited, "hola").status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+
+    def test_latency_distributions_are_seeded(self):
+        """Las latencias son reproducibles con semilla y nunca negativas"""
+        import random
+
+        for distribution in fake_groq.LATENCY_DISTRIBUTIONS:
+            config = fake_groq.FakeGroqConfig(latency=distribution, latency_mean=0.5, latency_std=0.3)
+            first = [fake_groq.sample_latency(config, random.Random(7)) for _ in range(3)]
+            second = [fake_groq.sample_latency(config, random.Random(7)) for _ in range(3)]
+            assert first == second
+            assert all(value >= 0 for value in first)
+
+    def test_record_then_replay(self, tmp_path):
+        """Grabar respuestas reales como fixtures y servirlas de forma determinista"""
+        upstream_app = fake_groq.create_app(fake_groq.FakeGroqConfig())
+        upstream = httpx.AsyncClient(transport=httpx.ASGITransport(app=upstream_app), base_url="http://upstream")
+        recorder = TestClient(fake_groq.create_app(
+            fake_groq.FakeGroqConfig(mode="record", fixtures_dir=tmp_path), upstream=upstream
+        ))
+
+        recorded = _chat(recorder, "Explica los cambios").json()
+        assert len(list(tmp_path.glob("*.json"))) == 1
+
+        replayer = TestClient(fake_groq.create_app(fake_groq.FakeGroqConfig(mode="replay", fixtures_dir=tmp_path)))
+        assert _chat(replayer, "Explica los cambios").json() == recorded
+        streamed = _chat(replayer, "Explica los cambios", stream=True)
+        assert streamed.status_code == 200 and "[DONE]" in streamed.text
+
+        missing = _chat(replayer, "Otra petición")
+        assert missing.status_code == 404
+        assert missing.json()["error"]["code"] == "fixture_not_found"
+
+    async def test_routine_generator_against_fake_server(self, sample_routine):
+        """RoutineGenerator funciona de extremo a extremo contra el servidor falso"""
+        generator = RoutineGenerator()
+        generator._configured = True
+        generator._model = "fake-model"
+        generator._client = _asgi_groq(fake_groq.create_app(fake_groq.FakeGroqConfig()))
+
+        routine = await generator.create_initial_routine(RoutineRequest(goals="fuerza", days=4))
+        assert len(routine.days) == 4
+
+        deltas = []
+
+        async def on_delta(text):
+            deltas.append(text)
+
+        modified, explanation = await generator.modify_and_explain(
+            sample_routine, "Hazla más divertida", on_delta=on_delta
+        )
+        assert modified.days == sample_routine.days
+        assert explanation
+        assert "".join(deltas) == explanation
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import groq
+import httpx
+import pytest
+
+from app.services.groq_scheduler import GroqScheduler, Priority, TokenBucket
+
+
+def _rate_limit_error(retry_after="0.05"):
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return groq.RateLimitError("rate limited", response=response, body=None)
+
+
+class TestGroqScheduler:
+    """Pruebas para el planificador de llamadas salientes a Groq"""
+
+    def test_token_bucket_delay(self):
+        """El bucket calcula la espera necesaria según la tasa de recarga"""
+        bucket = TokenBucket(capacity=60)  # 1 token/seg
+        now = time.monotonic()
+        bucket.consume(60, now)
+
+        assert bucket.delay_for(1, now) == pytest.approx(1.0, rel=0.01)
+        assert TokenBucket(capacity=0).delay_for(10_000, now) == 0.0
+
+    @pytest.mark.asyncio
+    async def test_priority_order_when_saturated(self):
+        """Con la concurrencia agotada, el chat interactivo se atiende primero"""
+        scheduler = GroqScheduler(max_concurrency=1)
+        order = []
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("m", Priority.INITIAL):
+                await release.wait()
+
+        async def job(name, priority):
+            async with scheduler.slot("m", priority):
+                order.append(name)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(job("background", Priority.BACKGROUND)),
+            asyncio.create_task(job("initial", Priority.INITIAL)),
+            asyncio.create_task(job("chat", Priority.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.metrics()["queue_depth"] == 3
+
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        assert order == ["chat", "initial", "background"]
+
+    @pytest.mark.asyncio
+    async def test_requests_per_minute_limit(self):
+        """Superado el RPM, las peticiones esperan a que el bucket se recargue"""
+        scheduler = GroqScheduler(model_limits={"m": {"rpm": 600}})  # 10/seg
+        scheduler._model("m").requests.consume(600, time.monotonic())
+
+        start = time.monotonic()
+        async with scheduler.slot("m"):
+            pass
+        assert time.monotonic() - start >= 0.08
+
+    @pytest.mark.asyncio
+    async def test_retry_after_is_honored(self):
+        """Un 429 pausa el modelo durante Retry-After y se reintenta"""
+        scheduler = GroqScheduler(max_retries=2)
+        calls = []
+
+        async def call():
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise _rate_limit_error("0.1")
+            return "ok"
+
+        assert await scheduler.run("m", call) == "ok"
+        assert calls[1] - calls[0] >= 0.09
+        assert scheduler.metrics()["rate_limited"] == 1
+        assert scheduler.metrics()["retries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self):
+        """Tras agotar los reintentos se propaga el error"""
+        scheduler = GroqScheduler(max_retries=1)
+
+        async def call():
+            raise _rate_limit_error("0")
+
+        with pytest.raises(groq.RateLimitError):
+            await scheduler.run("m", call)
+
+    @pytest.mark.asyncio
+    async def test_retryable_can_stop_retries(self):
+        """Si retryable devuelve False el error se propaga sin reintentar"""
+        scheduler = GroqScheduler(max_retries=3)
+        calls = []
+
+        async def call():
+            calls.append(1)
+            raise _rate_limit_error("0")
+
+        with pytest.raises(groq.RateLimitError):
+            await scheduler.run("m", call, retryable=lambda: False)
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Cancelar una petición en cola la elimina sin perder el slot"""
+        scheduler = GroqScheduler(max_concurrency=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("m"):
+                await release.wait()
+
+        async def queued():
+            async with scheduler.slot("m"):
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(queued())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.metrics()["queue_depth"] == 0
+
+        release.set()
+        await holder
+        async with scheduler.slot("m"):
+            assert scheduler.metrics()["active"] == 1
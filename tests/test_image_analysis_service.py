@@ -1,10 +1,22 @@
 import pytest
 from unittest.mock import MagicMock, AsyncMock
+import asyncio
 import base64
 import io
-from PIL import Image
+import numpy as np
+from PIL import Image, ImageDraw
 
+from app.services import image_preprocessing
 from app.services.image_analysis_service import ImageAnalyzer
+from app.services.image_preprocessing import (
+    ImagePreprocessor,
+    PayloadTooLarge,
+    base64_decoded_size,
+    decode_data_url,
+    prepare_clip,
+    prepare_image,
+    select_keyframes,
+)
 
 
 class TestImageAnalysisService:
@@ -89,3 +101,309 @@ Recomendaciones:
 
         assert isinstance(result, str)
         assert "deshabilitada" in result.lower()
+
+
+def _image_bytes(size, mode="RGB", fmt="JPEG", orientation=None):
+    img = Image.new(mode, size, color="red" if mode == "RGB" else (255, 0, 0, 128))
+    out = io.BytesIO()
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(out, format=fmt, exif=exif)
+    else:
+        img.save(out, format=fmt)
+    return out.getvalue()
+
+
+class TestImagePreprocessing:
+    """Pruebas para el preprocesado de imágenes antes de enviarlas al modelo de visión"""
+
+    def test_downscales_and_strips_metadata(self):
+        """Una foto grande se reduce al borde máximo y pierde los metadatos EXIF"""
+        raw = _image_bytes((3000, 2000), orientation=1)
+
+        prepared = prepare_image(raw, max_edge=1024)
+
+        assert (prepared.width, prepared.height) == (1024, 683)
+        assert prepared.mime_type == "image/jpeg"
+        assert len(prepared.data) < len(raw)
+        result = Image.open(io.BytesIO(prepared.data))
+        assert result.size == (1024, 683)
+        assert not result.getexif()
+
+    def test_applies_exif_orientation(self):
+        """La orientación EXIF se aplica antes de reducir"""
+        raw = _image_bytes((400, 200), orientation=6)  # girada 90°
+
+        prepared = prepare_image(raw, max_edge=100)
+
+        assert (prepared.width, prepared.height) == (50, 100)
+
+    def test_output_formats(self):
+        """PNG con transparencia se aplana en JPEG y se conserva en WebP"""
+        raw = _image_bytes((64, 64), mode="RGBA", fmt="PNG")
+
+        jpeg = prepare_image(raw, output_format="JPEG")
+        webp = prepare_image(raw, output_format="WEBP")
+
+        assert Image.open(io.BytesIO(jpeg.data)).mode == "RGB"
+        assert webp.mime_type == "image/webp"
+        assert Image.open(io.BytesIO(webp.data)).mode == "RGBA"
+        assert webp.data_url().startswith("data:image/webp;base64,")
+
+    def test_invalid_image_raises(self):
+        """Bytes que no son una imagen producen ValueError"""
+        with pytest.raises(ValueError):
+            prepare_image(b"no soy una imagen")
+
+    async def test_process_pool(self):
+        """El preprocesado se ejecuta en procesos trabajadores y el pool se cierra"""
+        preprocessor = ImagePreprocessor(max_edge=256, workers=1)
+        try:
+            prepared = await preprocessor.prepare(_image_bytes((1000, 500)))
+            assert (prepared.width, prepared.height) == (256, 128)
+            with pytest.raises(ValueError):
+                await preprocessor.prepare(b"basura")
+        finally:
+            preprocessor.close()
+        assert preprocessor._pool is None
+
+    async def test_analyzer_sends_prepared_image(self):
+        """El analizador envía la imagen reducida con el tipo MIME correcto"""
+        analyzer = ImageAnalyzer(preprocessor=ImagePreprocessor(max_edge=128, output_format="WEBP", workers=0))
+        analyzer._configured = True
+        analyzer._model = "vision"
+        response = MagicMock(choices=[MagicMock(message=MagicMock(content="Buena técnica"))])
+        analyzer._client = AsyncMock()
+        analyzer._client.chat.completions.create = AsyncMock(return_value=response)
+        raw = _image_bytes((2000, 1000))
+        data_url = "data:image/jpeg;base64," + base64.b64encode(raw).decode()
+
+        await analyzer.analyze_exercise_image(data_url, "sentadilla")
+
+        content = analyzer._client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        url = content[1]["image_url"]["url"]
+        assert url.startswith("data:image/webp;base64,")
+        sent = Image.open(io.BytesIO(base64.b64decode(url.split(",")[1])))
+        assert sent.size == (128, 64)
+
+
+def _rep_frames(count=30, size=(320, 240)):
+    """Fotogramas sintéticos de una repetición: un bloque que baja y vuelve a subir"""
+    frames = []
+    for i in range(count):
+        img = Image.new("RGB", size, (30, 30, 30))
+        y = 20 + int(150 * abs(np.sin(i / count * np.pi)))
+        ImageDraw.Draw(img).rectangle((140, y, 180, y + 60), fill=(250, 250, 250))
+        frames.append(img)
+    return frames
+
+
+class TestClipAnalysis:
+    """Pruebas para el análisis de clips mediante fotogramas clave"""
+
+    def test_select_keyframes_skips_duplicates(self):
+        """Se eligen los fotogramas más distintos, en orden temporal"""
+        a, b, c = (Image.new("RGB", (32, 32), color) for color in ("black", "white", "gray"))
+        frames = [a, a, a, b, b, a, c, c]
+
+        assert select_keyframes(frames, 3) == [0, 3, 6]
+        assert select_keyframes(frames, 5) == [0, 3, 6]  # el resto son duplicados
+        assert select_keyframes(frames[:2], 4) == [0, 1]
+
+    def test_gif_contact_sheet(self):
+        """Un GIF animado se convierte en una hoja de contactos etiquetada"""
+        frames = _rep_frames()
+        out = io.BytesIO()
+        frames[0].save(out, format="GIF", save_all=True, append_images=frames[1:], duration=100, loop=0)
+
+        sheet = prepare_clip(out.getvalue(), keyframes=6, max_edge=600)
+
+        assert sheet.frames == 6
+        assert max(sheet.width, sheet.height) <= 600
+        assert sheet.width > sheet.height  # 3x2 fotogramas apaisados
+        assert Image.open(io.BytesIO(sheet.data)).format == "JPEG"
+
+    def test_mjpeg_frames(self):
+        """Los JPEG concatenados (MJPEG) se decodifican como fotogramas"""
+        stream = b""
+        for frame in _rep_frames(12):
+            out = io.BytesIO()
+            frame.save(out, format="JPEG")
+            stream += out.getvalue()
+
+        sheet = prepare_clip(stream, keyframes=4)
+
+        assert sheet.frames == 4
+
+    def test_mjpeg_split_ignores_marker_bytes_in_segments(self):
+        """Los bytes FFD9 FFD8 dentro de un segmento (p. ej. un comentario) no parten el fotograma"""
+        stream = b""
+        for frame in _rep_frames(5):
+            out = io.BytesIO()
+            frame.save(out, format="JPEG", comment=b"fin\xff\xd9\xff\xd8inicio")
+            stream += out.getvalue()
+
+        frames, times = image_preprocessing._decode_frames(stream, max_edge=1024)
+
+        assert len(frames) == 5
+        assert times == []
+
+    def test_frames_are_downscaled_while_sampling(self):
+        """Cada fotograma se reduce al decodificarlo; no se guardan copias a resolución completa"""
+        frames = [frame.resize((1600, 1000)) for frame in _rep_frames(8)]
+        out = io.BytesIO()
+        frames[0].save(out, format="GIF", save_all=True, append_images=frames[1:], duration=100, loop=0)
+
+        decoded, times = image_preprocessing._decode_frames(out.getvalue(), max_edge=320)
+
+        assert len(decoded) == 8
+        assert all(frame.mode == "RGB" and max(frame.size) <= 320 for frame in decoded)
+        assert times[1] == pytest.approx(0.1)
+
+    def test_invalid_clip_raises(self):
+        """Un clip que no se puede decodificar produce ValueError"""
+        with pytest.raises(ValueError):
+            prepare_clip(b"no es un clip")
+
+    async def test_clip_in_one_vision_call(self):
+        """Todo el clip se analiza con una única llamada de visión"""
+        analyzer = ImageAnalyzer(preprocessor=ImagePreprocessor(workers=0))
+        analyzer._configured = True
+        analyzer._model = "vision"
+        response = MagicMock(choices=[MagicMock(message=MagicMock(content="Buen rango de movimiento"))])
+        analyzer._client = AsyncMock()
+        analyzer._client.chat.completions.create = AsyncMock(return_value=response)
+        frames = _rep_frames()
+        out = io.BytesIO()
+        frames[0].save(out, format="WEBP", save_all=True, append_images=frames[1:], duration=80)
+
+        result = await analyzer.analyze_exercise_clip(out.getvalue(), "sentadilla")
+
+        assert result == "Buen rango de movimiento"
+        analyzer._client.chat.completions.create.assert_awaited_once()
+        content = analyzer._client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        assert "6 fotogramas clave" in content[0]["text"]
+        assert len([part for part in content if part["type"] == "image_url"]) == 1
+
+
+class TestMultiImageAnalysis:
+    """Pruebas para el análisis de varias fotos (frontal/lateral/trasera) en una petición"""
+
+    @pytest.fixture
+    def analyzer(self):
+        analyzer = ImageAnalyzer(preprocessor=ImagePreprocessor(workers=0))
+        analyzer._configured = True
+        analyzer._model = "vision"
+        response = MagicMock(choices=[MagicMock(message=MagicMock(content="Análisis combinado"))])
+        analyzer._client = AsyncMock()
+        analyzer._client.chat.completions.create = AsyncMock(return_value=response)
+        return analyzer
+
+    @staticmethod
+    def _photo(color):
+        out = io.BytesIO()
+        Image.new("RGB", (300, 200), color=color).save(out, format="JPEG")
+        return out.getvalue()
+
+    async def test_all_angles_in_one_request(self, analyzer):
+        """Todas las fotos van en una sola llamada con un prompt combinado"""
+        photos = [self._photo(color) for color in ("red", "green", "blue")]
+
+        result = await analyzer.analyze_exercise_images(photos, "sentadilla", ["frontal", "lateral"])
+
+        assert result == "Análisis combinado"
+        analyzer._client.chat.completions.create.assert_awaited_once()
+        content = analyzer._client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        assert [part["type"] for part in content] == ["text", "image_url", "image_url", "image_url"]
+        assert "Foto 2: lateral" in content[0]["text"]
+        assert "Foto 3: ángulo no indicado" in content[0]["text"]
+
+    async def test_images_are_preprocessed_concurrently(self, analyzer):
+        """El preprocesado de las fotos se lanza en paralelo"""
+        running = peak = 0
+        prepare = analyzer._preprocessor.prepare
+
+        async def tracked(image_bytes):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            try:
+                return await prepare(image_bytes)
+            finally:
+                running -= 1
+
+        analyzer._preprocessor.prepare = tracked
+        await analyzer.analyze_exercise_images([self._photo("red"), self._photo("blue")])
+
+        assert peak == 2
+
+    async def test_invalid_or_too_many_images(self, analyzer):
+        """Una foto inválida o demasiadas fotos no llegan a Groq"""
+        result = await analyzer.analyze_exercise_images([self._photo("red"), b"basura"])
+        assert "2" in result and "no se pudieron" in result.lower()
+
+        result = await analyzer.analyze_exercise_images([self._photo("red")] * 6)
+        assert "máximo" in result
+
+        analyzer._client.chat.completions.create.assert_not_awaited()
+
+
+class TestPayloadSize:
+    """Pruebas para el control de tamaño de las imágenes en base64"""
+
+    def test_decoded_size_from_length(self):
+        """El tamaño decodificado se calcula a partir de la longitud del base64"""
+        for size in range(12):
+            url = "data:image/png;base64," + base64.b64encode(b"x" * size).decode()
+            assert base64_decoded_size(url, url.index(",") + 1) == size
+
+    def test_oversized_payload_is_not_decoded(self, monkeypatch):
+        """Una carga demasiado grande se rechaza sin llegar a decodificarse"""
+        decode = MagicMock()
+        monkeypatch.setattr(image_preprocessing.base64, "b64decode", decode)
+        url = "data:image/jpeg;base64," + "A" * 4_000
+
+        with pytest.raises(PayloadTooLarge):
+            decode_data_url(url, max_size=2_999)
+        decode.assert_not_called()
+
+    def test_chunked_decoding(self, monkeypatch):
+        """La decodificación por fragmentos reproduce los bytes originales"""
+        monkeypatch.setattr(image_preprocessing, "DECODE_CHUNK_CHARS", 8)
+        raw = bytes(range(256)) * 3
+        encoded = base64.b64encode(raw).decode()
+
+        assert decode_data_url("data:image/png;base64," + encoded, len(raw)) == raw
+        wrapped = "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+        assert decode_data_url("data:image/png;base64," + wrapped, len(raw)) == raw
+        with pytest.raises(ValueError):
+            decode_data_url("data:image/png;base64,@@@@" + encoded, len(raw) + 3)
+        with pytest.raises(ValueError):
+            decode_data_url("data:image/png," + encoded, len(raw))
+
+    async def test_analyzer_rejects_large_data_url_before_preprocessing(self):
+        """El analizador responde con error y no preprocesa imágenes demasiado grandes"""
+        preprocessor = MagicMock()
+        preprocessor.prepare = AsyncMock()
+        analyzer = ImageAnalyzer(preprocessor=preprocessor)
+        analyzer._configured = True
+        analyzer._max_image_size = 1024
+
+        result = await analyzer.analyze_exercise_image("data:image/jpeg;base64," + "A" * 2_000)
+
+        assert "demasiado grande" in result
+        preprocessor.prepare.assert_not_awaited()
+
+    def test_websocket_message_limit(self):
+        """El límite de mensajes WebSocket cubre una imagen en base64 y se aplica en el worker"""
+        from app.core.config import Settings
+        from app.uvicorn_worker import GymAIUvicornWorker
+
+        settings = Settings(MAX_IMAGE_SIZE_MB=3)
+        assert 4 * 1024 * 1024 < settings.ws_max_message_bytes < 5 * 1024 * 1024
+        # Varias imágenes van por subida binaria: el límite no crece con VISION_MAX_IMAGES
+        assert Settings(MAX_IMAGE_SIZE_MB=3, VISION_MAX_IMAGES=5).ws_max_message_bytes == settings.ws_max_message_bytes
+        assert Settings(WS_MAX_MESSAGE_MB=2).ws_max_message_bytes == 2 * 1024 * 1024
+        assert GymAIUvicornWorker.CONFIG_KWARGS["ws_max_size"] > 0
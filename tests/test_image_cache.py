@@ -0,0 +1,131 @@
+import base64
+import io
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from PIL import Image, ImageDraw
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import ImageAnalysisCacheModel
+from app.repositories import image_cache_repository
+from app.services.image_analysis_service import ImageAnalyzer
+from app.services.image_cache import ImageAnalysisCache, context_key, hamming_distances
+from app.services.image_preprocessing import ImagePreprocessor, dhash
+
+
+def _scene(shift=0, size=(640, 480)):
+    """Imagen con estructura (degradado + figuras) para el hash perceptual"""
+    gradient = np.tile(np.linspace(0, 255, size[0], dtype=np.uint8), (size[1], 1))
+    img = Image.fromarray(np.stack([gradient, gradient[::-1], gradient], axis=2))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((100 + shift, 100, 260 + shift, 380), fill=(20, 20, 20))
+    draw.ellipse((380, 60, 560, 240), fill=(240, 240, 240))
+    return img
+
+
+def _jpeg(img, quality=90):
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+@pytest.fixture
+def session_factory(test_db_engine):
+    """Repositorio de la caché de imágenes apuntando a la base de datos de prueba"""
+    factory = sessionmaker(test_db_engine, class_=AsyncSession, expire_on_commit=False)
+    with patch.object(image_cache_repository, "async_session", factory):
+        yield factory
+
+
+class TestPerceptualHash:
+    """Pruebas para el hash perceptual (dHash)"""
+
+    def test_near_duplicates_are_close(self):
+        """Reescalar y recomprimir apenas cambia el hash; otra imagen sí"""
+        original = dhash(_scene())
+        resized = dhash(Image.open(io.BytesIO(_jpeg(_scene().resize((320, 240)), quality=40))))
+        different = dhash(_scene().transpose(Image.FLIP_LEFT_RIGHT))
+
+        distances = hamming_distances(np.array([resized, different], dtype=np.uint64), original)
+
+        assert distances[0] <= 6
+        assert distances[1] > 20
+
+    def test_hamming_distances(self):
+        """La distancia cuenta los bits distintos de enteros de 64 bits"""
+        hashes = np.array([0, 0b1011, 2**64 - 1], dtype=np.uint64)
+        assert hamming_distances(hashes, 0).tolist() == [0, 3, 64]
+
+    def test_context_key_is_normalized(self):
+        """El contexto ignora mayúsculas, acentos y espacios"""
+        assert context_key("analysis", "Press  Banca ") == context_key("analysis", "press banca")
+        assert context_key("analysis", "sentadilla") != context_key("variations", "sentadilla")
+
+
+class TestImageAnalysisCache:
+    """Pruebas para la caché de análisis por hash perceptual"""
+
+    async def test_memory_hit_within_distance(self):
+        """Una imagen casi idéntica en el mismo contexto reutiliza el resultado"""
+        cache = ImageAnalysisCache(max_distance=4, use_db=False)
+        await cache.set(0b1111, "analysis|sentadilla|", "Buena técnica")
+
+        assert await cache.get(0b0111, "analysis|sentadilla|") == "Buena técnica"
+        assert await cache.get(0b0111, "analysis|peso muerto|") is None
+        assert await cache.get(2**64 - 1, "analysis|sentadilla|") is None
+        assert cache.stats()["memory_hits"] == 1
+
+    async def test_memory_lru_eviction(self):
+        """Con la caché llena se desaloja la entrada menos usada"""
+        cache = ImageAnalysisCache(max_entries=2, max_distance=0, use_db=False)
+        await cache.set(1, "c", "uno")
+        await cache.set(2, "c", "dos")
+        await cache.get(1, "c")
+        await cache.set(4, "c", "cuatro")
+
+        assert await cache.get(1, "c") == "uno"
+        assert await cache.get(2, "c") is None
+        assert cache.stats()["size"] == 2
+
+    async def test_db_tier_shared_and_bounded(self, session_factory):
+        """Otra instancia encuentra el resultado en la BD y la tabla no supera el máximo"""
+        writer = ImageAnalysisCache(max_entries=3, max_distance=1)
+        for i in range(5):
+            await writer.set(0xFF << (8 * i), "analysis||", f"resultado {i}")
+
+        reader = ImageAnalysisCache(max_entries=3, max_distance=1)
+        assert await reader.get((0xFF << 32) ^ 1, "analysis||") == "resultado 4"
+        assert reader.stats()["db_hits"] == 1
+        assert await reader.get(0xFF, "analysis||") is None  # desalojada
+
+        async with session_factory() as session:
+            count = await session.scalar(select(func.count()).select_from(ImageAnalysisCacheModel))
+        assert count == 3
+
+
+class TestAnalyzerCache:
+    """Pruebas de la caché integrada en el analizador"""
+
+    async def test_reupload_skips_vision_call(self):
+        """Volver a subir la misma foto recomprimida no llama al modelo de visión"""
+        analyzer = ImageAnalyzer(
+            preprocessor=ImagePreprocessor(workers=0),
+            cache=ImageAnalysisCache(use_db=False),
+        )
+        analyzer._configured = True
+        analyzer._model = "vision"
+        response = MagicMock(choices=[MagicMock(message=MagicMock(content="Espalda recta"))])
+        analyzer._client = AsyncMock()
+        analyzer._client.chat.completions.create = AsyncMock(return_value=response)
+
+        first = await analyzer.analyze_exercise_image(_jpeg(_scene()), "Sentadilla")
+        again = await analyzer.analyze_exercise_image(_jpeg(_scene().resize((500, 375)), quality=50), "sentadilla")
+        data_url = "data:image/jpeg;base64," + base64.b64encode(_jpeg(_scene())).decode()
+        await analyzer.suggest_exercise_variations(data_url)
+
+        assert first == again == "Espalda recta"
+        # Solo el primer análisis y las variaciones (otro contexto) llegan a Groq
+        assert analyzer._client.chat.completions.create.await_count == 2
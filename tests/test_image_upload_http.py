@@ -0,0 +1,190 @@
+import io
+from pathlib import Path
+from types import SimpleNamespace
+
+import aiofiles
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.api.dependencies import get_image_analyzer
+from app.api.multipart import SpooledFile, UploadTooLarge, parse_multipart
+from app.api.routes import images
+from app.core.config import get_settings
+from app.services.image_analysis_service import ImageAnalyzer
+from app.services.image_preprocessing import ImagePreprocessor
+
+URL = "/api/routine/1/analyze_image"
+
+
+def _jpeg_bytes(size=(200, 100)):
+    out = io.BytesIO()
+    Image.new("RGB", size, color="blue").save(out, format="JPEG")
+    return out.getvalue()
+
+
+class TestSpooledFile:
+    """Pruebas para el almacenamiento temporal de las subidas"""
+
+    async def test_small_upload_stays_in_memory(self):
+        """Por debajo del umbral los datos se devuelven como bytes"""
+        spool = SpooledFile(spool_bytes=1024)
+        spool.write(b"abc")
+        spool.write(b"def")
+        await spool.finish()
+        assert not spool.rolled
+        assert spool.source() == b"abcdef"
+        await spool.close()
+
+    async def test_large_upload_spills_to_named_file(self):
+        """Por encima del umbral se escribe en un archivo con ruta, que se borra al cerrar"""
+        spool = SpooledFile(spool_bytes=1024)
+        for _ in range(4):
+            spool.write(b"x" * 512)
+            await spool.flush()
+        await spool.finish()
+        path = spool.source()
+        assert spool.rolled and isinstance(path, Path)
+        assert path.read_bytes() == b"x" * 2048
+        await spool.close()
+        assert not path.exists()
+
+    async def test_rolled_over_writes_use_aiofiles(self):
+        """Los datos que superan el umbral se escriben con aiofiles, no en el bucle de eventos"""
+        spool = SpooledFile(spool_bytes=1024)
+        spool.write(b"x" * 2048)
+        assert spool.rolled and spool._file is None  # write() solo encola los datos
+
+        with patch("app.api.multipart.aiofiles.open", wraps=aiofiles.open) as aio_open:
+            await spool.flush()
+        aio_open.assert_called_once()
+        await spool.close()
+
+    async def test_parsing_stops_at_the_limit(self):
+        """El cuerpo deja de leerse en cuanto la imagen supera el límite"""
+        chunks_read = []
+
+        async def stream():
+            yield b'--b\r\nContent-Disposition: form-data; name="image"; filename="a.jpg"\r\n\r\n'
+            for _ in range(64):
+                chunks_read.append(1)
+                yield b"x" * 1024
+
+        request = SimpleNamespace(headers={"content-type": "multipart/form-data; boundary=b"}, stream=stream)
+        with pytest.raises(UploadTooLarge):
+            await parse_multipart(request, max_file_size=4096, spool_bytes=1024)
+        assert len(chunks_read) == 5
+
+
+class TestAnalyzeImageEndpoint:
+    """Pruebas del endpoint HTTP de análisis de imágenes"""
+
+    @pytest.fixture
+    def client_and_analyzer(self):
+        analyzer = MagicMock()
+        analyzer.analyze_exercise_image = AsyncMock(return_value="Buena postura")
+        analyzer.suggest_exercise_variations = AsyncMock(return_value="Variaciones")
+        app = FastAPI()
+        app.include_router(images.router)
+        app.dependency_overrides[get_image_analyzer] = lambda: analyzer
+
+        with patch.object(images.routine_repository, "get_routine", AsyncMock(return_value=MagicMock())), \
+                patch.object(images.chat_repository, "save_chat_message", AsyncMock()) as save:
+            yield TestClient(app), analyzer, save
+
+    def test_multipart_upload_reaches_analyzer(self, client_and_analyzer):
+        """La imagen llega como bytes al analizador y el resultado se guarda en el chat"""
+        client, analyzer, save = client_and_analyzer
+        image = _jpeg_bytes()
+
+        response = client.post(
+            URL,
+            files={"image": ("foto.jpg", image, "image/jpeg")},
+            data={"action": "analyze_form", "exercise_name": "sentadilla"},
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"analysis": "Buena postura"}
+        analyzer.analyze_exercise_image.assert_awaited_once_with(image, "sentadilla")
+        save.assert_awaited_once_with(1, "assistant", "Buena postura")
+
+    def test_large_upload_is_passed_as_path(self, client_and_analyzer, monkeypatch):
+        """Una subida que supera el umbral llega como ruta y el archivo se elimina después"""
+        client, analyzer, _ = client_and_analyzer
+        monkeypatch.setattr(get_settings(), "IMAGE_UPLOAD_SPOOL_BYTES", 1024)
+        image = _jpeg_bytes((800, 600))
+        seen = {}
+
+        async def analyze(source, exercise_name):
+            seen["path"] = source
+            seen["content"] = source.read_bytes()
+            return "Buena postura"
+
+        analyzer.analyze_exercise_image = analyze
+        response = client.post(URL, files={"image": ("foto.jpg", image, "image/jpeg")})
+
+        assert response.status_code == 200
+        assert seen["content"] == image
+        assert not seen["path"].exists()
+
+    def test_oversized_stream_is_rejected(self, client_and_analyzer, monkeypatch):
+        """Sin Content-Length el límite se aplica mientras llegan los fragmentos"""
+        client, analyzer, _ = client_and_analyzer
+        monkeypatch.setattr(get_settings(), "MAX_IMAGE_SIZE_MB", 1)
+        boundary = "limite"
+
+        def body():
+            yield (
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"a.jpg\"\r\n"
+                f"Content-Type: image/jpeg\r\n\r\n"
+            ).encode()
+            for _ in range(64):
+                yield b"x" * (64 * 1024)
+            yield f"\r\n--{boundary}--\r\n".encode()
+
+        response = client.post(
+            URL, content=body(), headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        )
+
+        assert response.status_code == 413
+        assert "tamaño máximo" in response.json()["error"]
+        analyzer.analyze_exercise_image.assert_not_awaited()
+
+    @pytest.mark.parametrize("files, data, message", [
+        ({}, {"action": "analyze_form"}, "no proporcionados"),
+        ({"image": ("a.pdf", b"%PDF", "application/pdf")}, {}, "imagen"),
+        ({"image": ("a.jpg", b"x", "image/jpeg")}, {"action": "borrar"}, "Acción"),
+    ])
+    def test_invalid_forms(self, client_and_analyzer, files, data, message):
+        """Formularios sin imagen, con otro tipo de archivo o acción desconocida se rechazan"""
+        client, analyzer, _ = client_and_analyzer
+        response = client.post(URL, files=files or {"otro": ("a.txt", b"x", "text/plain")}, data=data)
+
+        assert response.status_code == 400
+        assert message in response.json()["error"]
+        analyzer.analyze_exercise_image.assert_not_awaited()
+
+    def test_json_body_is_rejected(self, client_and_analyzer):
+        """Un cuerpo que no es multipart devuelve 400"""
+        client, _, _ = client_and_analyzer
+        response = client.post(URL, json={"image_data": "data:image/jpeg;base64,AAA"})
+        assert response.status_code == 400
+
+
+class TestAnalyzerPathSource:
+    """Pruebas del analizador con imágenes en disco"""
+
+    async def test_worker_opens_the_file(self, tmp_path):
+        """El preprocesado abre la ruta directamente y conserva el tamaño original"""
+        image = _jpeg_bytes((1600, 1200))
+        path = tmp_path / "foto.jpg"
+        path.write_bytes(image)
+        analyzer = ImageAnalyzer(preprocessor=ImagePreprocessor(max_edge=512, workers=0))
+        analyzer._configured = True
+
+        prepared = await analyzer._validate_and_prepare_image(path)
+
+        assert prepared.original_size == len(image)
+        assert max(prepared.width, prepared.height) == 512
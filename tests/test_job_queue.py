@@ -0,0 +1,158 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import RoutineJobModel
+from app.repositories import job_repository, routine_repository
+from app.schemas.routines import RoutineRequest
+from app.services.groq_scheduler import Priority
+from app.services.job_queue import RoutineJobQueue
+
+
+@pytest.fixture
+def session_factory(test_db_engine):
+    """Repositorios de trabajos y rutinas apuntando a la base de datos de prueba"""
+    factory = sessionmaker(test_db_engine, class_=AsyncSession, expire_on_commit=False)
+    with patch.object(job_repository, "async_session", factory), \
+            patch.object(routine_repository, "async_session", factory):
+        yield factory
+
+
+class TestJobQueue:
+    """Pruebas para la cola de trabajos de generación de rutinas"""
+
+    async def test_submit_and_complete(self, session_factory, sample_routine):
+        """Un trabajo enviado se procesa y guarda la rutina"""
+        generator = MagicMock()
+        generator.create_initial_routine = AsyncMock(return_value=sample_routine.model_copy(update={"id": None}))
+        queue = RoutineJobQueue(generator, workers=2, poll_interval=0.05)
+        await queue.start()
+        try:
+            job_id = await queue.submit(RoutineRequest(goals="Fuerza", days=3))
+            job = await queue.wait(job_id, timeout=2)
+        finally:
+            await queue.stop()
+
+        assert job["status"] == "completed"
+        assert job["attempts"] == 1
+        stored = await routine_repository.get_routine(job["routine_id"])
+        assert stored.routine_name == sample_routine.routine_name
+        _, kwargs = generator.create_initial_routine.call_args
+        assert kwargs == {"priority": Priority.BACKGROUND, "offline_fallback": False}
+
+    async def test_failure_is_recorded(self, session_factory):
+        """Los errores de generación quedan guardados en el trabajo"""
+        generator = MagicMock()
+        generator.create_initial_routine = AsyncMock(side_effect=ValueError("Groq no responde"))
+        queue = RoutineJobQueue(generator, workers=1, poll_interval=0.05)
+        await queue.start()
+        try:
+            job = await queue.wait(await queue.submit(RoutineRequest(goals="Fuerza")), timeout=2)
+        finally:
+            await queue.stop()
+
+        assert job["status"] == "failed"
+        assert job["error"] == "Groq no responde"
+
+    async def test_claim_is_exclusive(self, session_factory):
+        """Solo un proceso puede reclamar un trabajo en cola"""
+        await job_repository.create_job("abc", RoutineRequest(goals="Fuerza").model_dump_json())
+
+        assert await job_repository.claim_job("abc") is not None
+        assert await job_repository.claim_job("abc") is None
+
+    async def test_recovers_interrupted_jobs_on_start(self, session_factory, sample_routine):
+        """Los trabajos interrumpidos por un reinicio se vuelven a ejecutar"""
+        await job_repository.create_job("stale", RoutineRequest(goals="Fuerza").model_dump_json())
+        await job_repository.claim_job("stale")
+        async with session_factory() as session:
+            await session.execute(
+                update(RoutineJobModel).values(updated_at=datetime.now() - timedelta(hours=1))
+            )
+            await session.commit()
+
+        generator = MagicMock()
+        generator.create_initial_routine = AsyncMock(return_value=sample_routine.model_copy(update={"id": None}))
+        queue = RoutineJobQueue(generator, workers=1, stale_seconds=60, poll_interval=0.05)
+        await queue.start()
+        try:
+            job = await queue.wait("stale", timeout=2)
+        finally:
+            await queue.stop()
+
+        assert job["status"] == "completed"
+        assert job["attempts"] == 2
+
+    async def test_heartbeat_keeps_slow_jobs_from_being_recovered(self, session_factory, sample_routine):
+        """Un trabajo lento sigue vivo y no se vuelve a ejecutar al superar stale_seconds"""
+        async def slow_create(request, **kwargs):
+            await asyncio.sleep(0.6)
+            return sample_routine.model_copy(update={"id": None})
+
+        generator = MagicMock()
+        generator.create_initial_routine = AsyncMock(side_effect=slow_create)
+        # Two queues sharing the database, as with two gunicorn workers
+        queue, other = (RoutineJobQueue(generator, workers=1, stale_seconds=0.2, poll_interval=0.05) for _ in range(2))
+        await queue.start()
+        await other.start()
+        try:
+            job = await queue.wait(await queue.submit(RoutineRequest(goals="Fuerza")), timeout=3)
+        finally:
+            await queue.stop()
+            await other.stop()
+
+        assert job["status"] == "completed"
+        assert job["attempts"] == 1
+        assert generator.create_initial_routine.await_count == 1
+
+    async def test_finish_failure_still_wakes_waiters(self, session_factory, sample_routine):
+        """Si no se puede guardar el resultado, quien espera no se queda colgado"""
+        generator = MagicMock()
+        generator.create_initial_routine = AsyncMock(return_value=sample_routine.model_copy(update={"id": None}))
+        queue = RoutineJobQueue(generator, workers=1, poll_interval=0.05)
+        await queue.start()
+        try:
+            with patch.object(job_repository, "finish_job", AsyncMock(side_effect=RuntimeError("db caída"))):
+                job_id = await queue.submit(RoutineRequest(goals="Fuerza"))
+                job = await queue.wait(job_id, timeout=0.5)
+            assert job["status"] == "running"
+            assert job_id not in queue._running
+            assert job_id not in queue._events
+        finally:
+            await queue.stop()
+
+    async def test_timed_out_wait_releases_its_event(self, session_factory):
+        """Un wait que expira sobre un trabajo de otro proceso no deja el evento registrado"""
+        await job_repository.create_job("remoto", RoutineRequest(goals="Fuerza").model_dump_json())
+        await job_repository.claim_job("remoto")
+        queue = RoutineJobQueue(MagicMock(), workers=1, poll_interval=0.02)
+
+        results = await asyncio.gather(queue.wait("remoto", timeout=0.05), queue.wait("remoto", timeout=0.1))
+
+        assert [job["status"] for job in results] == ["running", "running"]
+        assert queue._events == {} and queue._waiters == {}
+
+    async def test_requeue_respects_max_attempts(self, session_factory):
+        """Al apagar, un trabajo que agotó sus intentos se marca como fallido en vez de reencolarse"""
+        for job_id in ("nuevo", "agotado"):
+            await job_repository.create_job(job_id, RoutineRequest(goals="Fuerza").model_dump_json())
+        await job_repository.claim_job("nuevo")
+        for _ in range(3):
+            async with session_factory() as session:
+                await session.execute(
+                    update(RoutineJobModel).where(RoutineJobModel.id == "agotado").values(status="queued")
+                )
+                await session.commit()
+            await job_repository.claim_job("agotado")
+
+        await job_repository.requeue_jobs(["nuevo", "agotado"], max_attempts=3)
+
+        assert (await job_repository.get_job("nuevo"))["status"] == "queued"
+        exhausted = await job_repository.get_job("agotado")
+        assert exhausted["status"] == "failed"
+        assert exhausted["error"] == job_repository.MAX_ATTEMPTS_ERROR
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from app.models.models import Routine
+from app.services.json_repair import extract_json, extract_json_object
+
+
+class TestJsonExtraction:
+    """Pruebas para la extracción de JSON en una sola pasada"""
+
+    def test_clean_and_wrapped_objects(self):
+        """Extraer objetos limpios, en bloque de código o rodeados de texto"""
+        payload = {"routine_name": "Fuerza", "days": [{"day_name": "Lunes"}]}
+        raw = json.dumps(payload)
+
+        assert extract_json_object(raw) == payload
+        assert extract_json_object(f"```json\n{raw}\n```") == payload
+        assert extract_json_object(f"Aquí tienes tu rutina: {raw} ¡Suerte!") == payload
+
+    def test_braces_inside_strings_and_prose(self):
+        """Las llaves dentro de cadenas o en el texto previo no confunden al escáner"""
+        text = 'Usa el formato {nombre}. {"explanation": "Cambié } y { por \\"x\\"", "patch": []}'
+
+        result = extract_json_object(text)
+
+        assert result == {"explanation": 'Cambié } y { por "x"', "patch": []}
+
+    def test_invalid_text_returns_empty(self):
+        """Sin objeto recuperable se devuelve {}"""
+        assert extract_json_object("Esto no es JSON") == {}
+        assert extract_json_object("") == {}
+        assert extract_json_object("{esto tampoco}") == {}
+
+
+class TestJsonRepair:
+    """Pruebas para la reparación local de respuestas mal formadas"""
+
+    def test_trailing_commas(self):
+        """Se eliminan comas finales sin tocar las de dentro de cadenas"""
+        text = '{"days": [{"name": "a, ]", "sets": 3,},], "rest": "60",}'
+
+        assert extract_json_object(text) == {"days": [{"name": "a, ]", "sets": 3}], "rest": "60"}
+
+    def test_unterminated_string(self):
+        """Una cadena cortada se cierra junto con los contenedores abiertos"""
+        text = '{"explanation": "He añadido más volumen de pec'
+
+        assert extract_json_object(text) == {"explanation": "He añadido más volumen de pec"}
+
+    @pytest.mark.parametrize("cut", ['"sets": ', '"se', '"sets": 3, "reps": "8-1', '"sets": tr'])
+    def test_truncated_array_drops_incomplete_element(self, cut):
+        """Un array truncado conserva los elementos completos"""
+        text = '{"routine_name": "R", "days": [{"day_name": "Lunes", "exercises": []}, {"day_name": "Martes", ' + cut
+
+        result = extract_json_object(text)
+
+        assert result["routine_name"] == "R"
+        assert result["days"][0] == {"day_name": "Lunes", "exercises": []}
+
+    def test_truncated_routine_is_still_valid(self, sample_routine):
+        """Una rutina cortada a mitad de un día se recupera con los días completos"""
+        full = sample_routine.model_dump_json(exclude={"id", "user_id", "created_at", "updated_at"})
+        days_start = full.index('"days"')
+        second_day = full.index('{"day_name"', full.index('{"day_name"', days_start) + 1)
+        truncated = full[:second_day + 40]
+
+        def is_routine(data):
+            try:
+                Routine.model_validate(data)
+                return True
+            except ValidationError:
+                return False
+
+        assert "exercises" not in extract_json_object(truncated)["days"][-1]
+        routine = Routine.model_validate(extract_json_object(truncated, accept=is_routine))
+
+        assert routine.days == sample_routine.days[:1]
+        assert routine.routine_name == sample_routine.routine_name
+
+    def test_repairs_are_reported(self):
+        """Solo las respuestas truncadas se marcan como reparadas"""
+        assert extract_json('{"a": [1, 2,],}') == ({"a": [1, 2]}, False)
+        assert extract_json('{"a": [1, 2, 3') == ({"a": [1, 2, 3]}, True)
+        assert extract_json('{"a": [1, 2, {"b": ') == ({"a": [1, 2]}, True)
+        assert extract_json("sin JSON") == ({}, False)
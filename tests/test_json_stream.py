@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from app.services.json_stream import IncrementalJSONParser
+
+
+ROUTINE_RESPONSE = {
+    "explanation": "Añadí \"press\" inclinado.\nÁnimo 💪",
+    "routine": {
+        "routine_name": "Torso/Pierna",
+        "days": [
+            {"day_name": "Lunes", "focus": "Torso {superior}", "exercises": [
+                {"name": "Press, banca", "sets": 4, "reps": "6-8", "rest": "120 seg",
+                 "rir": "1-2", "equipment": "Barra [olímpica]"}
+            ]},
+            {"day_name": "Martes", "focus": "Pierna", "exercises": []},
+        ],
+    },
+}
+
+
+def _feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+class TestIncrementalJSONParser:
+    """Pruebas para el parser JSON incremental de respuestas en streaming"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 5, 64, 10_000])
+    @pytest.mark.parametrize("ensure_ascii", [True, False])
+    def test_emits_days_and_explanation_for_any_chunking(self, chunk_size, ensure_ascii):
+        """Los días y la explicación se emiten igual sin importar el troceado"""
+        text = "```json\n" + json.dumps(ROUTINE_RESPONSE, ensure_ascii=ensure_ascii) + "\n```"
+        parser = IncrementalJSONParser(
+            value_paths=[("routine", "days", "*")],
+            string_paths=[("explanation",)],
+        )
+
+        events = _feed_in_chunks(parser, text, chunk_size)
+
+        explanation = "".join(e.value for e in events if e.kind == "string_delta")
+        days = [e for e in events if e.kind == "value"]
+        assert explanation == ROUTINE_RESPONSE["explanation"]
+        assert [d.path for d in days] == [("routine", "days", 0), ("routine", "days", 1)]
+        assert [d.value for d in days] == ROUTINE_RESPONSE["routine"]["days"]
+        assert parser.buffer == text
+
+    def test_day_emitted_before_stream_ends(self):
+        """El primer día se emite en cuanto se cierra su llave"""
+        text = json.dumps({"days": [{"day_name": "Lunes"}, {"day_name": "Martes"}]})
+        cut = text.index("}") + 1
+        parser = IncrementalJSONParser(value_paths=[("days", "*")])
+
+        first = parser.feed(text[:cut])
+        rest = parser.feed(text[cut:])
+
+        assert [e.value["day_name"] for e in first] == ["Lunes"]
+        assert [e.value["day_name"] for e in rest] == ["Martes"]
+
+    def test_ignores_unwatched_paths(self):
+        """Solo se emiten las rutas observadas"""
+        text = json.dumps({"other": [{"a": 1}], "days": [{"b": 2}], "note": "x"})
+        parser = IncrementalJSONParser(value_paths=[("days", "*")])
+
+        events = parser.feed(text)
+
+        assert [(e.kind, e.path) for e in events] == [("value", ("days", 0))]
@@ -0,0 +1,102 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.models.models import Exercise
+from app.services.ai_service import RoutineGenerator
+from app.services.local_edits import apply_local_edit
+
+
+class TestLocalEdits:
+    """Pruebas para el motor de ediciones locales (sin LLM)"""
+
+    def test_change_rest_everywhere(self, sample_routine):
+        """Cambiar el descanso de todos los ejercicios"""
+        routine, explanation = apply_local_edit(sample_routine, "Cambia el descanso a 90 seg")
+
+        assert all(e.rest == "90 seg" for d in routine.days for e in d.exercises)
+        assert "90 seg" in explanation
+        assert sample_routine.days[0].exercises[0].rest == "60-90 seg"
+
+    def test_change_rest_in_minutes_for_one_day(self, sample_routine):
+        """Convertir minutos a segundos y limitar el cambio a un día"""
+        routine, _ = apply_local_edit(sample_routine, "pon el descanso en 2-3 min el miércoles, por favor")
+
+        assert all(e.rest == "120-180 seg" for e in routine.days[1].exercises)
+        assert all(e.rest == "60-90 seg" for e in routine.days[0].exercises)
+
+    def test_change_sets_and_reps(self, sample_routine):
+        """Cambiar series y repeticiones en toda la rutina"""
+        routine, _ = apply_local_edit(sample_routine, "Pon 4 series en todo")
+        assert all(e.sets == 4 for d in routine.days for e in d.exercises)
+
+        routine, _ = apply_local_edit(routine, "cambia las repeticiones a 6-8")
+        assert all(e.reps == "6-8" for d in routine.days for e in d.exercises)
+
+    def test_remove_day(self, sample_routine):
+        """Quitar un día, ignorando acentos"""
+        routine, explanation = apply_local_edit(sample_routine, "Quita el miercoles")
+
+        assert [d.day_name for d in routine.days] == ["Lunes"]
+        assert "Miércoles" in explanation
+        assert "Ahora entrenas 1 día a la semana" in explanation
+
+    def test_swap_exercise(self, sample_routine):
+        """Sustituir un ejercicio conservando series, repeticiones y descansos"""
+        routine, explanation = apply_local_edit(sample_routine, "cambia dominadas por jalón al pecho")
+
+        exercise = routine.days[1].exercises[0]
+        assert exercise.name == "Jalón al pecho"
+        assert exercise.equipment == "Polea"
+        assert exercise.sets == 3 and exercise.rest == "60-90 seg"
+        assert "Dominadas" in explanation
+
+    def test_swap_by_partial_name_resolving_to_one_exercise(self, sample_routine):
+        """Un nombre parcial se acepta si el catálogo lo resuelve al único ejercicio que coincide"""
+        sample_routine.days[1].exercises[0].name = "Jalón al pecho"
+
+        routine, _ = apply_local_edit(sample_routine, "cambia jalon por dominadas")
+
+        assert routine.days[1].exercises[0].name == "Dominadas"
+
+    def test_ambiguous_swaps_go_to_llm(self, sample_routine):
+        """Una palabra que coincide con varios ejercicios, o con parte de uno, no se edita localmente"""
+        exercises = sample_routine.days[0].exercises
+        for name in ("Press militar", "Press de pecho en máquina"):
+            exercises.append(Exercise(name=name, sets=3, reps="10", rest="60 seg", equipment="Máquina"))
+
+        assert apply_local_edit(sample_routine, "cambia press por fondos") is None
+        assert apply_local_edit(sample_routine, "cambia pecho por espalda") is None
+
+    @pytest.mark.parametrize("message", [
+        "quita el jueves",
+        "cambia sentadilla por prensa",
+        "hazla más intensa",
+        "cambia el descanso a 90 seg y pon 4 series",
+        "pon 40 series en todo",
+        "cambia dominadas por algo más fácil",
+        "cambia dominadas por pecho",
+        "cambia dominadas por dominadas",
+        "cambia las reps a 0",
+        "cambia las repeticiones a 12-8",
+        "cambia el descanso a 0 seg",
+        "cambia el descanso a 90-60 seg",
+        "pon el descanso en 20 min",
+    ])
+    def test_unparsed_messages_go_to_llm(self, sample_routine, message):
+        """Mensajes ambiguos o sin coincidencia no se editan localmente"""
+        assert apply_local_edit(sample_routine, message) is None
+
+    async def test_modify_and_explain_skips_groq(self, sample_routine):
+        """Las ediciones locales no llaman a Groq, aunque la IA no esté configurada"""
+        with patch("app.services.ai_service.get_settings") as mock_settings:
+            mock_settings.return_value.ai_configured = False
+            mock_settings.return_value.LOCAL_EDITS_ENABLED = True
+            generator = RoutineGenerator()
+        on_delta = AsyncMock()
+
+        routine, explanation = await generator.modify_and_explain(
+            sample_routine, "pon 5 series en todo", on_delta=on_delta
+        )
+
+        assert all(e.sets == 5 for d in routine.days for e in d.exercises)
+        on_delta.assert_awaited_once_with(explanation)
@@ -0,0 +1,140 @@
+import asyncio
+
+import groq
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core import metrics
+from app.core.metrics import MetricsRegistry, track_llm_call
+from app.services.ai_service import RoutineGenerator
+from app.services.groq_scheduler import GroqScheduler
+
+
+def _rate_limit_error():
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": "0.01"}, request=request)
+    return groq.RateLimitError("rate limited", response=response, body=None)
+
+
+class TestMetricsRegistry:
+    """Pruebas para el registro de métricas y su exposición"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Los buckets del histograma son acumulativos e incluyen +Inf, suma y conteo"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latencia", ("op",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, op="chat")
+
+        text = registry.render()
+        assert "# TYPE latency_seconds histogram" in text
+        assert 'latency_seconds_bucket{op="chat",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{op="chat",le="1"} 2' in text
+        assert 'latency_seconds_bucket{op="chat",le="+Inf"} 3' in text
+        assert 'latency_seconds_count{op="chat"} 3' in text
+        assert 'latency_seconds_sum{op="chat"} 5.55' in text
+
+    def test_labels_are_validated_and_escaped(self):
+        """Las etiquetas deben coincidir y sus valores se escapan"""
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "Llamadas", ("model",))
+        counter.inc(model='llama "3"')
+
+        assert 'calls_total{model="llama \\"3\\""} 1' in registry.render()
+        with pytest.raises(ValueError):
+            counter.inc(operation="x")
+        with pytest.raises(ValueError):
+            registry.counter("calls_total", "Duplicada")
+
+
+class TestLLMCallInstrumentation:
+    """Pruebas para la instrumentación de cada llamada a Groq"""
+
+    def test_outcome_and_usage_are_recorded(self):
+        """Se registran duración, tokens y el resultado de la llamada"""
+        labels = dict(operation="test_usage", model="m")
+        with track_llm_call("test_usage", "m") as call:
+            call.record_usage(MagicMock(prompt_tokens=120, completion_tokens=30))
+
+        assert metrics.LLM_CALL_SECONDS.count(outcome="ok", **labels) == 1
+        assert metrics.LLM_TOKENS.value(kind="prompt", **labels) == 120
+        assert metrics.LLM_TOKENS.value(kind="completion", **labels) == 30
+
+        with pytest.raises(groq.RateLimitError):
+            with track_llm_call("test_usage", "m"):
+                raise _rate_limit_error()
+        assert metrics.LLM_CALL_SECONDS.count(outcome="rate_limited", **labels) == 1
+
+    @pytest.mark.asyncio
+    async def test_scheduler_reports_retries_and_queue_time(self):
+        """El planificador suma reintentos y tiempo en cola a la llamada"""
+        scheduler = GroqScheduler(max_retries=2)
+        attempts = 0
+
+        async def call():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise _rate_limit_error()
+            return "ok"
+
+        with track_llm_call("test_retries", "m") as tracked:
+            assert await scheduler.run("m", call, metrics=tracked) == "ok"
+
+        assert tracked.retries == 1
+        assert tracked.queue_seconds >= 0.0
+        assert metrics.LLM_RETRIES.value(operation="test_retries", model="m") == 1
+
+    @pytest.mark.asyncio
+    async def test_ttft_excludes_queue_time(self):
+        """El tiempo hasta el primer token se mide desde que el planificador concede el slot"""
+        scheduler = GroqScheduler(max_concurrency=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("m"):
+                await release.wait()
+
+        async def call():
+            tracked.record_chunk(MagicMock(choices=[MagicMock(delta=MagicMock(content="Hola"))], x_groq=None))
+            return "ok"
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        asyncio.get_running_loop().call_later(0.2, release.set)
+        with track_llm_call("test_ttft", "m", stream=True) as tracked:
+            await scheduler.run("m", call, metrics=tracked)
+        await holder
+
+        labels = dict(operation="test_ttft", model="m")
+        assert tracked.queue_seconds >= 0.15
+        assert metrics.LLM_TTFT_SECONDS.count(**labels) == 1
+        assert metrics.LLM_TTFT_SECONDS.sum(**labels) < 0.1
+
+    @pytest.mark.asyncio
+    async def test_generator_labels_calls_by_operation(self, sample_routine):
+        """Cada prompt del generador queda etiquetado con su operación"""
+        generator = RoutineGenerator()
+        generator._configured = True
+        generator._model = "metrics-model"
+        response = MagicMock()
+        response.choices = [MagicMock(message=MagicMock(content="Más volumen de pecho."))]
+        response.usage = MagicMock(prompt_tokens=50, completion_tokens=8)
+        generator._client = MagicMock()
+        generator._client.chat.completions.create = AsyncMock(return_value=response)
+
+        await generator.explain_routine_changes(sample_routine, sample_routine, "más pecho")
+
+        labels = dict(operation="explain_changes", model="metrics-model")
+        assert metrics.LLM_CALL_SECONDS.count(outcome="ok", **labels) == 1
+        assert metrics.LLM_TOKENS.value(kind="completion", **labels) == 8
+
+    def test_metrics_endpoint(self, test_client):
+        """El endpoint /metrics expone el formato de texto de Prometheus"""
+        response = test_client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE gymai_llm_call_duration_seconds histogram" in response.text
+        assert "gymai_groq_scheduler_active" in response.text
@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.schemas.routines import RoutineRequest
+from app.services.ai_service import RoutineGenerator
+from app.services.exercise_catalog import BODYWEIGHT, get_exercise_catalog, parse_equipment
+from app.services.groq_scheduler import GroqScheduler, Priority
+from app.services.offline_routines import REST_BY_KIND, OfflineRoutine, synthesize_routine
+
+
+class TestExerciseCatalog:
+    """Pruebas para el catálogo local de ejercicios"""
+
+    def test_parse_equipment(self):
+        """Interpretar el equipamiento escrito por el usuario"""
+        assert parse_equipment("") == parse_equipment("Gimnasio completo")
+        assert parse_equipment("En casa, sin material") == {BODYWEIGHT}
+        assert parse_equipment("Barra de dominadas y mancuernas") == {
+            BODYWEIGHT, "barra de dominadas", "mancuernas"
+        }
+
+    def test_lookup_and_substitutes(self):
+        """Buscar ejercicios y sustitutos según el equipamiento disponible"""
+        catalog = get_exercise_catalog()
+        assert catalog.lookup("prensa").name == "Prensa de piernas"
+        assert catalog.lookup("SENTADILLA BULGARA").name == "Sentadilla búlgara"
+
+        substitutes = catalog.substitutes("Press de banca", parse_equipment("mancuernas y banco"))
+        assert substitutes[0].name == "Press de banca con mancuernas"
+        assert all(s.muscle == "pecho" for s in substitutes)
+        assert all(set(s.equipment) <= {"mancuernas", "banco", BODYWEIGHT} for s in substitutes)
+
+
+class TestOfflineRoutines:
+    """Pruebas para el generador de rutinas sin IA"""
+
+    def test_follows_prompt_rules(self):
+        """Respetar días, número de ejercicios, descansos y RIR"""
+        request = RoutineRequest(
+            goals="Hipertrofia", days=4, experience_level="Intermedio",
+            available_equipment="Gimnasio completo", time_per_session="60 min",
+        )
+        routine = synthesize_routine(request)
+
+        assert [d.day_name for d in routine.days] == ["Lunes", "Martes", "Jueves", "Viernes"]
+        catalog = get_exercise_catalog()
+        for day in routine.days:
+            assert 4 <= len(day.exercises) <= 6
+            for exercise in day.exercises:
+                assert exercise.rir
+                assert exercise.rest == REST_BY_KIND[catalog.lookup(exercise.name).kind]
+        assert synthesize_routine(request) == routine
+
+    def test_respects_equipment_and_health(self):
+        """Sin material ni ejercicios que carguen la rodilla"""
+        routine = synthesize_routine(RoutineRequest(
+            goals="Perder peso", days=3, available_equipment="casa",
+            health_conditions="Dolor de rodilla", time_per_session="30 min",
+        ))
+
+        catalog = get_exercise_catalog()
+        for day in routine.days:
+            assert len(day.exercises) >= 4
+            for exercise in day.exercises:
+                entry = catalog.lookup(exercise.name)
+                assert entry.equipment == (BODYWEIGHT,)
+                assert "rodilla" not in entry.joint_stress
+
+    async def test_generator_falls_back_when_not_configured(self):
+        """El generador usa el catálogo si Groq no está configurado"""
+        generator = RoutineGenerator()
+        generator._configured = False
+        generator._offline_fallback = True
+        on_day = AsyncMock()
+
+        routine = await generator.create_initial_routine(RoutineRequest(goals="Fuerza", days=2), on_day=on_day)
+
+        assert len(routine.days) == 2
+        assert on_day.await_count == 2
+        assert isinstance(routine, OfflineRoutine)
+
+    @staticmethod
+    def _generator(create, timeout):
+        generator = RoutineGenerator()
+        generator._configured = True
+        generator._model = "test-model"
+        generator._offline_fallback = True
+        generator._generation_timeout = timeout
+        generator._scheduler = GroqScheduler(max_concurrency=1)
+        generator._client = MagicMock()
+        generator._client.chat.completions.create = create
+        return generator
+
+    async def test_generator_falls_back_when_groq_is_slow(self):
+        """El generador usa el catálogo si Groq supera el tiempo límite"""
+        async def slow(**kwargs):
+            await asyncio.sleep(1)
+
+        generator = self._generator(slow, timeout=0.01)
+        routine = await generator.create_initial_routine(RoutineRequest(goals="Fuerza", days=3, use_cache=False))
+
+        assert len(routine.days) == 3
+        assert isinstance(routine, OfflineRoutine)
+
+    async def test_queue_wait_does_not_count_towards_timeout(self):
+        """Esperar en la cola del planificador no agota el tiempo límite de Groq"""
+        content = synthesize_routine(RoutineRequest(goals="Fuerza", days=2)).model_dump_json()
+        response = MagicMock(choices=[MagicMock(message=MagicMock(content=content))], usage=None)
+        generator = self._generator(AsyncMock(return_value=response), timeout=0.05)
+
+        async def hold():
+            async with generator._scheduler.slot("test-model", Priority.INTERACTIVE):
+                await asyncio.sleep(0.2)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        routine = await generator.create_initial_routine(RoutineRequest(goals="Fuerza", days=2, use_cache=False))
+        await holder
+
+        assert not isinstance(routine, OfflineRoutine)
+        generator._client.chat.completions.create.assert_awaited_once()
+
+    async def test_fallback_after_streamed_days_is_announced(self):
+        """Si Groq falla tras enviar días, se avisa antes de reenviar los del catálogo desde el índice 0"""
+        generator = self._generator(AsyncMock(), timeout=1)
+        groq_day = synthesize_routine(RoutineRequest(goals="Fuerza", days=2)).days[0]
+        events = []
+
+        async def partial(request, on_day, priority):
+            await on_day(0, groq_day)
+            raise ValueError("stream cortado")
+
+        async def on_day(index, day):
+            events.append(("day", index))
+
+        async def on_fallback():
+            events.append(("fallback",))
+
+        generator._generate_initial_routine = partial
+        await generator.create_initial_routine(
+            RoutineRequest(goals="Fuerza", days=2, use_cache=False), on_day=on_day, on_fallback=on_fallback
+        )
+
+        assert events == [("day", 0), ("fallback",), ("day", 0), ("day", 1)]
+
+    async def test_timeout_without_fallback_is_an_error(self):
+        """Sin modo offline, superar el tiempo límite es un error y no una rutina del catálogo"""
+        async def slow(**kwargs):
+            await asyncio.sleep(1)
+
+        generator = self._generator(slow, timeout=0.01)
+        with pytest.raises(ValueError):
+            await generator.create_initial_routine(
+                RoutineRequest(goals="Fuerza", use_cache=False), offline_fallback=False
+            )
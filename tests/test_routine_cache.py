@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.models.models import Routine
+from app.schemas.routines import RoutineRequest
+from app.services.ai_service import RoutineGenerator
+from app.services.routine_cache import RoutineCache, fingerprint_request
+
+
+class TestRoutineCache:
+    """Pruebas para la caché de generación de rutinas"""
+
+    def test_fingerprint_normalization(self):
+        """Peticiones casi idénticas deben producir la misma huella"""
+        a = RoutineRequest(
+            goals="Hipertrofia", days=4, experience_level="Intermedio",
+            available_equipment="Mancuernas, Barra y banco",
+        )
+        b = RoutineRequest(
+            goals="  hipertrofia ", days=4, experience_level="intermedio",
+            available_equipment="banco,barra ,  MANCUERNAS", user_id=7,
+        )
+        c = RoutineRequest(goals="Hipertrofia", days=3, experience_level="Intermedio")
+
+        assert fingerprint_request(a) == fingerprint_request(b)
+        assert fingerprint_request(a) != fingerprint_request(c)
+        assert fingerprint_request(a, "model-a") != fingerprint_request(a, "model-b")
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_and_counters(self, sample_routine):
+        """Probar la expulsión LRU y los contadores de aciertos/fallos"""
+        cache = RoutineCache(max_entries=2, use_db=False)
+        await cache.set("a", sample_routine)
+        await cache.set("b", sample_routine)
+        assert await cache.get("a") is not None
+        await cache.set("c", sample_routine)  # expulsa "b"
+
+        assert await cache.get("b") is None
+        assert await cache.get("c") is not None
+        assert cache.stats()["memory_hits"] == 2
+        assert cache.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiration(self, sample_routine):
+        """Las entradas caducadas no deben devolverse"""
+        cache = RoutineCache(ttl_seconds=0, use_db=False)
+        await cache.set("a", sample_routine)
+        assert await cache.get("a") is None
+
+    @pytest.mark.asyncio
+    async def test_generator_uses_cache(self, sample_routine):
+        """Un acierto de caché no debe llamar a Groq y respeta el opt-out"""
+        response = MagicMock()
+        response.choices = [MagicMock(message=MagicMock(content=sample_routine.model_dump_json()))]
+        generator = RoutineGenerator(cache=RoutineCache(use_db=False))
+        generator._configured = True
+        generator._client = AsyncMock()
+        generator._client.chat.completions.create = AsyncMock(return_value=response)
+        generator._model = "llama-3.3-70b-versatile"
+
+        first = await generator.create_initial_routine(RoutineRequest(goals="Fuerza", user_id=1))
+        second = await generator.create_initial_routine(RoutineRequest(goals="fuerza", user_id=2))
+        assert generator._client.chat.completions.create.call_count == 1
+        assert second.routine_name == first.routine_name
+        assert second.user_id == 2
+        assert second.id is None
+
+        await generator.create_initial_routine(RoutineRequest(goals="Fuerza", use_cache=False))
+        assert generator._client.chat.completions.create.call_count == 2
@@ -0,0 +1,107 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.routine_patch import RoutinePatchError, apply_json_patch, apply_routine_patch
+
+
+class TestRoutinePatch:
+    """Pruebas para la aplicación de parches JSON (RFC 6902) sobre rutinas"""
+
+    def test_replace_single_exercise(self, sample_routine):
+        """Sustituir un ejercicio solo cambia ese campo y conserva la identidad"""
+        patched = apply_routine_patch(sample_routine, [
+            {"op": "replace", "path": "/days/0/exercises/0/name", "value": "Press inclinado"},
+        ])
+
+        assert patched.days[0].exercises[0].name == "Press inclinado"
+        assert patched.days[0].exercises[1] == sample_routine.days[0].exercises[1]
+        assert patched.id == sample_routine.id
+        assert sample_routine.days[0].exercises[0].name == "Press de banca"
+
+    def test_add_remove_move_copy(self, sample_routine):
+        """Probar las operaciones add (con "-"), remove, move y copy"""
+        new_exercise = {
+            "name": "Aperturas", "sets": 3, "reps": "12-15",
+            "rest": "45-60 seg", "rir": "2-3", "equipment": "Mancuernas",
+        }
+        patched = apply_routine_patch(sample_routine, [
+            {"op": "add", "path": "/days/0/exercises/-", "value": new_exercise},
+            {"op": "remove", "path": "/days/1/exercises/1"},
+            {"op": "move", "from": "/days/0/exercises/2", "path": "/days/0/exercises/0"},
+            {"op": "copy", "from": "/days/0/focus", "path": "/days/1/focus"},
+        ])
+
+        assert [e.name for e in patched.days[0].exercises] == [
+            "Aperturas", "Press de banca", "Fondos en paralelas"
+        ]
+        assert len(patched.days[1].exercises) == 1
+        assert patched.days[1].focus == "Pecho y tríceps"
+
+    def test_pointer_escaping_and_test_op(self):
+        """Probar el escape de punteros (~0, ~1) y la operación test"""
+        document = {"a/b": {"m~n": 1}}
+        result = apply_json_patch(document, [
+            {"op": "test", "path": "/a~1b/m~0n", "value": 1},
+            {"op": "replace", "path": "/a~1b/m~0n", "value": 2},
+        ])
+        assert result == {"a/b": {"m~n": 2}}
+
+        with pytest.raises(RoutinePatchError):
+            apply_json_patch(document, [{"op": "test", "path": "/a~1b/m~0n", "value": 3}])
+
+    @pytest.mark.parametrize("operations", [
+        [{"op": "replace", "path": "/days/9/focus", "value": "Piernas"}],
+        [{"op": "remove", "path": "/days/0/nope"}],
+        [{"op": "replace", "path": "days/0/focus", "value": "x"}],
+        [{"op": "explode", "path": "/days"}],
+        [{"op": "replace", "path": "/id", "value": 99}],
+        [{"op": "replace", "path": "/days/0/exercises/0/sets", "value": "muchas"}],
+        {"op": "remove", "path": "/days/0"},
+    ])
+    def test_invalid_patches_are_rejected(self, sample_routine, operations):
+        """Los parches inválidos o que producen rutinas inválidas se rechazan"""
+        with pytest.raises(RoutinePatchError):
+            apply_routine_patch(sample_routine, operations)
+
+    @pytest.mark.asyncio
+    async def test_generator_falls_back_to_full_regeneration(self, sample_routine):
+        """Un parche inválido provoca la regeneración completa"""
+        from app.services.ai_service import RoutineGenerator
+
+        bad_patch = MagicMock()
+        bad_patch.choices = [MagicMock(message=MagicMock(content="""{
+            "explanation": "Cambio hecho.",
+            "patch": [{"op": "replace", "path": "/days/7/focus", "value": "Piernas"}]
+        }"""))]
+        full = MagicMock()
+        full.choices = [MagicMock(message=MagicMock(content="""{
+            "explanation": "Rutina regenerada.",
+            "routine": {"routine_name": "Completa", "days": []}
+        }"""))]
+
+        generator = RoutineGenerator()
+        generator._configured = True
+        generator._patch_mode = True
+        generator._client = AsyncMock()
+        generator._client.chat.completions.create = AsyncMock(side_effect=[bad_patch, full])
+        generator._model = "llama-3.3-70b-versatile"
+
+        routine, explanation = await generator.modify_and_explain(sample_routine, "Piernas el domingo")
+
+        assert generator._client.chat.completions.create.call_count == 2
+        assert routine.routine_name == "Completa"
+        assert explanation == "Rutina regenerada."
+
+    def test_diff_routines_roundtrip(self, sample_routine):
+        """El parche calculado entre dos rutinas reproduce la rutina destino"""
+        from app.services.routine_patch import diff_routines
+
+        target = sample_routine.model_copy(deep=True)
+        target.routine_name = "Nueva"
+        target.days[0].exercises[0].sets = 5
+        target.days.pop()
+
+        operations = diff_routines(sample_routine, target)
+
+        assert apply_routine_patch(sample_routine, operations) == target
+        assert diff_routines(sample_routine, sample_routine) == []
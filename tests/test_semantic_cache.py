@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import AsyncMock
+
+from app.services.ai_service import RoutineGenerator
+from app.services.semantic_cache import HashingVectorizer, SemanticModificationCache
+
+
+def _more_chest(routine):
+    modified = routine.model_copy(deep=True)
+    modified.days[0].exercises[0].sets = 5
+    return modified
+
+
+class TestSemanticCache:
+    """Pruebas para la caché semántica de modificaciones"""
+
+    def test_embedding_is_deterministic_and_normalized(self):
+        """El vector no depende del proceso y tiene norma 1"""
+        vectorizer = HashingVectorizer(dim=256)
+        first = vectorizer.embed("Más pecho, por favor")
+        second = vectorizer.embed("más pecho")
+
+        assert first.shape == (256,)
+        assert abs(float(first @ first) - 1.0) < 1e-5
+        assert float(first @ second) == pytest.approx(1.0)
+
+    def test_rephrased_request_hits(self, sample_routine):
+        """Una reformulación sobre la misma rutina reutiliza el resultado"""
+        cache = SemanticModificationCache(max_entries=8)
+        cache.set(sample_routine, "más pecho", _more_chest(sample_routine), "Más volumen de pecho")
+
+        hit = cache.get(sample_routine, "Quiero enfocarme más en pectorales")
+
+        assert hit is not None
+        routine, explanation = hit
+        assert routine.days[0].exercises[0].sets == 5
+        assert routine.id == sample_routine.id
+        assert explanation == "Más volumen de pecho"
+
+    @pytest.mark.parametrize("message", ["menos pecho", "más espalda", "más pecho 5 días"])
+    def test_different_requests_miss(self, sample_routine, message):
+        """Peticiones distintas (o con otros números) no reutilizan el resultado"""
+        cache = SemanticModificationCache(max_entries=8)
+        cache.set(sample_routine, "más pecho", _more_chest(sample_routine), "Más volumen de pecho")
+
+        assert cache.get(sample_routine, message) is None
+
+    def test_requires_same_routine_content(self, sample_routine):
+        """Solo coincide con entradas de la misma rutina"""
+        cache = SemanticModificationCache(max_entries=8)
+        cache.set(sample_routine, "más pecho", _more_chest(sample_routine), "Más volumen de pecho")
+
+        other = sample_routine.model_copy(deep=True)
+        other.days[1].focus = "Espalda"
+        assert cache.get(other, "más pecho") is None
+
+    def test_lru_eviction(self, sample_routine):
+        """La memoria está acotada y se expulsa la entrada menos usada"""
+        cache = SemanticModificationCache(max_entries=2)
+        modified = _more_chest(sample_routine)
+        cache.set(sample_routine, "más pecho", modified, "a")
+        cache.set(sample_routine, "más espalda", modified, "b")
+        assert cache.get(sample_routine, "más pecho") is not None
+        cache.set(sample_routine, "más piernas", modified, "c")
+
+        assert cache.stats()["entries"] == 2
+        assert cache.get(sample_routine, "más espalda") is None
+        assert cache.get(sample_routine, "más pecho") is not None
+
+    async def test_generator_skips_groq_on_hit(self, sample_routine):
+        """El generador responde desde la caché sin llamar a Groq"""
+        generator = RoutineGenerator(semantic_cache=SemanticModificationCache(max_entries=8))
+        generator._configured = True
+        generator._local_edits = False
+        generator._modify_and_explain_remote = AsyncMock(
+            return_value=(_more_chest(sample_routine), "Más volumen de pecho")
+        )
+
+        await generator.modify_and_explain(sample_routine, "más pecho")
+        routine, explanation = await generator.modify_and_explain(sample_routine, "Más pectorales")
+
+        generator._modify_and_explain_remote.assert_awaited_once()
+        assert routine.days[0].exercises[0].sets == 5
+        assert explanation == "Más volumen de pecho"
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.schemas.routines import RoutineRequest
+from app.services.ai_service import RoutineGenerator
+from app.services.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Pruebas para la coalescencia de peticiones idénticas en vuelo"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Llamadas concurrentes con la misma clave ejecutan la función una sola vez"""
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+        assert results == ["ok"] * 5
+        assert calls == 1
+        assert flight.coalesced == 4
+        assert flight.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        """Cancelar un esperador no cancela la llamada compartida"""
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return 42
+
+        first = asyncio.create_task(flight.do("k", work))
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert await second == 42
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    @pytest.mark.asyncio
+    async def test_failure_propagates_to_every_waiter(self):
+        """Los errores se propagan a todos los esperadores"""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("groq caído")
+
+        results = await asyncio.gather(
+            flight.do("k", work), flight.do("k", work), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_generator_coalesces_duplicate_submissions(self, sample_routine):
+        """Un doble envío del formulario produce una única generación en Groq"""
+        async def slow_create(**kwargs):
+            await asyncio.sleep(0.01)
+            response = MagicMock()
+            response.choices = [MagicMock(message=MagicMock(content=sample_routine.model_dump_json()))]
+            return response
+
+        generator = RoutineGenerator()
+        generator._configured = True
+        generator._client = AsyncMock()
+        generator._client.chat.completions.create = AsyncMock(side_effect=slow_create)
+        generator._model = "llama-3.3-70b-versatile"
+
+        first, second = await asyncio.gather(
+            generator.create_initial_routine(RoutineRequest(goals="Fuerza", user_id=1)),
+            generator.create_initial_routine(RoutineRequest(goals="Fuerza", user_id=2)),
+        )
+
+        assert generator._client.chat.completions.create.call_count == 1
+        assert (first.user_id, second.user_id) == (1, 2)
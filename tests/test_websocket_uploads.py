@@ -0,0 +1,161 @@
+import io
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.repositories import chat_repository
+from app.websocket.manager import ConnectionManager
+from app.websocket.routes import WebSocketRoutes
+from app.websocket.uploads import ImageUpload, UploadError
+
+MAX_SIZE = 1024 * 1024
+
+
+def _header(**overrides):
+    header = {"type": "image_upload", "upload_id": "u1", "size": 10, "mime": "image/jpeg", "action": "analyze_form"}
+    header.update(overrides)
+    return header
+
+
+def _jpeg_bytes():
+    out = io.BytesIO()
+    Image.new("RGB", (200, 100), color="blue").save(out, format="JPEG")
+    return out.getvalue()
+
+
+class TestImageUpload:
+    """Pruebas para la subida de imágenes por fragmentos"""
+
+    @pytest.mark.parametrize("overrides, message", [
+        ({"upload_id": ""}, "identificador"),
+        ({"size": 0}, "tamaño declarado"),
+        ({"size": "10"}, "tamaño declarado"),
+        ({"size": MAX_SIZE + 1}, "tamaño máximo"),
+        ({"mime": "application/pdf"}, "imagen"),
+        ({"action": "borrar"}, "Acción"),
+    ])
+    def test_invalid_headers(self, overrides, message):
+        """Las cabeceras inválidas se rechazan antes de recibir datos"""
+        with pytest.raises(UploadError, match=message):
+            ImageUpload.from_header(_header(**overrides), MAX_SIZE)
+
+    def test_size_enforced_per_chunk(self):
+        """Se rechaza el fragmento que excede el tamaño declarado"""
+        upload = ImageUpload.from_header(_header(size=10), MAX_SIZE)
+        assert upload.write(b"12345") is False
+        with pytest.raises(UploadError):
+            upload.write(b"123456")
+        assert upload.write(b"67890") is True
+        assert upload.read() == b"1234567890"
+        upload.close()
+
+    @pytest.mark.parametrize("overrides, message", [
+        ({"images": []}, "lista de imágenes"),
+        ({"images": [{"size": 4, "mime": "image/jpeg"}] * 6}, "como máximo 5"),
+        ({"images": [{"size": 4, "mime": "image/jpeg"}] * 2, "action": "suggest_variations"}, "una sola imagen"),
+        ({"images": [{"size": 4, "mime": "image/jpeg"}, {"size": 4, "mime": "text/plain"}]}, "imagen"),
+    ])
+    def test_invalid_multi_image_headers(self, overrides, message):
+        """Las subidas de varias imágenes validan el número, la acción y cada imagen"""
+        with pytest.raises(UploadError, match=message):
+            ImageUpload.from_header(_header(**overrides), MAX_SIZE, max_images=5)
+
+    def test_large_upload_spills_to_disk(self):
+        """Por encima del umbral los fragmentos se escriben en disco"""
+        upload = ImageUpload.from_header(_header(size=4096), MAX_SIZE, spool_bytes=1024)
+        for _ in range(4):
+            upload.write(b"x" * 1024)
+        assert upload._file._rolled
+        assert len(upload.read()) == 4096
+        upload.close()
+
+
+class TestBinaryUploadProtocol:
+    """Pruebas del protocolo de subida binaria por WebSocket"""
+
+    @pytest.fixture
+    def client_and_analyzer(self):
+        analyzer = MagicMock()
+        analyzer.analyze_exercise_image = AsyncMock(return_value="Buena postura")
+        analyzer.suggest_exercise_variations = AsyncMock(return_value="Variaciones")
+        routes = WebSocketRoutes(manager=ConnectionManager(), routine_generator=MagicMock(), image_analyzer=analyzer)
+        app = FastAPI()
+
+        @app.websocket("/ws/chat/{routine_id}")
+        async def endpoint(websocket: WebSocket, routine_id: int):
+            await routes.handle_websocket(websocket, routine_id)
+
+        with patch.object(chat_repository, "save_chat_message", AsyncMock()):
+            yield TestClient(app), analyzer
+
+    def test_chunked_upload_reaches_analyzer_as_bytes(self, client_and_analyzer):
+        """Los fragmentos binarios se reensamblan y llegan como bytes, sin base64"""
+        client, analyzer = client_and_analyzer
+        image = _jpeg_bytes()
+
+        with client.websocket_connect("/ws/chat/1") as ws:
+            ws.send_json(_header(size=len(image), exercise_name="sentadilla"))
+            for start in range(0, len(image), 256):
+                ws.send_bytes(image[start:start + 256])
+            response = ws.receive_json()
+
+        assert response == {"type": "image_analysis", "analysis": "Buena postura"}
+        analyzer.analyze_exercise_image.assert_awaited_once_with(image, "sentadilla")
+
+    def test_oversized_and_orphan_chunks_are_rejected(self, client_and_analyzer):
+        """Datos de más o sin cabecera producen un error y no se analizan"""
+        client, analyzer = client_and_analyzer
+
+        with client.websocket_connect("/ws/chat/1") as ws:
+            ws.send_bytes(b"sin cabecera")
+            assert "cabecera" in ws.receive_json()["error"]
+
+            ws.send_json(_header(size=4))
+            ws.send_bytes(b"12345")
+            error = ws.receive_json()
+            assert error["type"] == "upload_error" and error["upload_id"] == "u1"
+
+            ws.send_json(_header(size=MAX_SIZE * 100))
+            assert ws.receive_json()["type"] == "upload_error"
+
+        analyzer.analyze_exercise_image.assert_not_awaited()
+
+    def test_multi_image_message(self, client_and_analyzer):
+        """Un mensaje analyze_image con varias fotos produce un único análisis"""
+        client, analyzer = client_and_analyzer
+        analyzer.analyze_exercise_images = AsyncMock(return_value="Análisis combinado")
+
+        with client.websocket_connect("/ws/chat/1") as ws:
+            ws.send_json({
+                "type": "analyze_image",
+                "exercise_name": "sentadilla",
+                "images": [{"image_data": "data:image/jpeg;base64,AAA", "view": "frontal"}, "data:image/jpeg;base64,BBB"],
+            })
+            response = ws.receive_json()
+
+        assert response == {"type": "image_analysis", "analysis": "Análisis combinado"}
+        analyzer.analyze_exercise_images.assert_awaited_once_with(
+            ["data:image/jpeg;base64,AAA", "data:image/jpeg;base64,BBB"], "sentadilla", ["frontal", None]
+        )
+
+    def test_multi_image_binary_upload(self, client_and_analyzer):
+        """Varias fotos se envían como una sola subida binaria y se analizan juntas"""
+        client, analyzer = client_and_analyzer
+        analyzer.analyze_exercise_images = AsyncMock(return_value="Análisis combinado")
+        front, side = _jpeg_bytes(), _jpeg_bytes()[::-1]
+
+        with client.websocket_connect("/ws/chat/1") as ws:
+            ws.send_json(_header(size=None, exercise_name="sentadilla", images=[
+                {"size": len(front), "mime": "image/jpeg", "view": "frontal"},
+                {"size": len(side), "mime": "image/jpeg"},
+            ]))
+            payload = front + side
+            for start in range(0, len(payload), 300):
+                ws.send_bytes(payload[start:start + 300])
+            response = ws.receive_json()
+
+        assert response == {"type": "image_analysis", "analysis": "Análisis combinado"}
+        analyzer.analyze_exercise_images.assert_awaited_once_with([front, side], "sentadilla", ["frontal", None])